@@ -7,7 +7,10 @@ from pytorch_lightning.callbacks import (
     ModelCheckpoint,
 )
 
+from .dataset_epoch_callback import DatasetEpochCallback
 from .plot_callbacks import SaveMetricsPlotCallback
+from .step_time_callback import StepTimeCallback
+from .thread_pinning_callback import ThreadPinningCallback
 
 
 def get_callbacks(cfg: dict):
@@ -48,6 +51,24 @@ def get_callbacks(cfg: dict):
         )
         callbacks.append(ds_mon)
 
+    # Время шага обучения
+    if cfg.callbacks.get("step_time", {}).get("enabled", False):
+        callbacks.append(StepTimeCallback())
+
+    # Эпоха для перемешивания потоковых шардов
+    if cfg.data.get("shards", {}).get("enabled", False):
+        callbacks.append(DatasetEpochCallback())
+
+    # Потоки и ядра процессов CPU-DDP
+    dist_cfg = cfg.trainer.get("distributed", {})
+    if dist_cfg.get("enabled", False):
+        callbacks.append(
+            ThreadPinningCallback(
+                threads_per_process=dist_cfg.get("threads_per_process"),
+                pin=dist_cfg.get("pin_threads", True),
+            )
+        )
+
     if cfg.callbacks.get("metrics_plot", False):
         tb_cfg = cfg.logger.tensorboard
         save_dir = os.path.join(tb_cfg["save_dir"], tb_cfg["name"])
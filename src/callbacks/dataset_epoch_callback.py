@@ -0,0 +1,17 @@
+# src/callbacks/dataset_epoch_callback.py
+
+import pytorch_lightning as pl
+
+
+class DatasetEpochCallback(pl.Callback):
+    """
+    Передаёт номер эпохи в train-датасет с методом set_epoch (потоковые
+    шарды). Lightning сам вызывает set_epoch только у сэмплеров, а у
+    IterableDataset сэмплера нет.
+    """
+
+    def on_train_epoch_start(self, trainer, pl_module):
+        datamodule = trainer.datamodule
+        dataset = getattr(datamodule, "train_dataset", None)
+        if hasattr(dataset, "set_epoch"):
+            dataset.set_epoch(trainer.current_epoch)
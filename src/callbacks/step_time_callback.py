@@ -0,0 +1,30 @@
+# src/callbacks/step_time_callback.py
+
+import time
+
+import pytorch_lightning as pl
+import torch
+
+
+class StepTimeCallback(pl.Callback):
+    """
+    Логирует время шага обучения train_step_ms (от начала батча до конца
+    optimizer step), чтобы сравнивать режимы исполнения на одном железе.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._start = None
+
+    def _sync(self, pl_module: pl.LightningModule):
+        if pl_module.device.type == "cuda":
+            torch.cuda.synchronize(pl_module.device)
+
+    def on_train_batch_start(self, trainer, pl_module, batch, batch_idx):
+        self._sync(pl_module)
+        self._start = time.perf_counter()
+
+    def on_train_batch_end(self, trainer, pl_module, outputs, batch, batch_idx):
+        self._sync(pl_module)
+        step_ms = (time.perf_counter() - self._start) * 1000
+        pl_module.log("train_step_ms", step_ms, on_step=True, on_epoch=True)
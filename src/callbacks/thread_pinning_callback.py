@@ -0,0 +1,45 @@
+# src/callbacks/thread_pinning_callback.py
+
+import os
+from typing import List, Optional
+
+import pytorch_lightning as pl
+import torch
+
+
+def available_cores() -> List[int]:
+    """Ядра, доступные процессу (sched_getaffinity есть только в Linux)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class ThreadPinningCallback(pl.Callback):
+    """
+    Делит ядра узла между локальными процессами DDP: процесс local_rank
+    привязывается (sched_setaffinity) к своему непересекающемуся набору ядер,
+    а число потоков torch ставится равным размеру набора, чтобы процессы не
+    конкурировали за одни и те же ядра.
+    """
+
+    def __init__(self, threads_per_process: Optional[int] = None, pin: bool = True):
+        super().__init__()
+        self.threads_per_process = threads_per_process
+        self.pin = pin
+
+    def setup(self, trainer, pl_module, stage):
+        local_procs = max(1, trainer.num_devices)
+        cores = available_cores()
+
+        per_proc = max(1, len(cores) // local_procs)
+        start = (trainer.local_rank * per_proc) % len(cores)
+        own = cores[start : start + per_proc]
+
+        if self.pin and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, own)
+        threads = self.threads_per_process or len(own)
+        torch.set_num_threads(threads)
+        print(
+            f"Rank {trainer.global_rank} (local {trainer.local_rank}): "
+            f"{threads} threads, cores {own if self.pin else 'not pinned'}"
+        )
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import shutil
+from typing import Dict, List, Optional, Tuple
+
+import albumentations as A
+import numpy as np
+from numpy.lib.format import open_memmap
+from PIL import Image
+
+CACHE_VERSION = 1
+INDEX_NAME = "index.json"
+IMAGES_NAME = "images.npy"
+MASKS_NAME = "masks.npy"
+
+
+def list_items(data_path: str, phase: str) -> List[str]:
+    """Отсортированный список ID изображений сплита (без расширения)."""
+    image_dir = os.path.join(data_path, phase, "image")
+    return sorted(fname.split(".")[0] for fname in os.listdir(image_dir))
+
+
+def sample_paths(data_path: str, phase: str, item_id: str) -> Tuple[str, str]:
+    """Пути до изображения и маски по ID."""
+    image_path = os.path.join(data_path, phase, "image", f"{item_id}.jpg")
+    mask_path = os.path.join(data_path, phase, "mask", f"{item_id}.png")
+    return image_path, mask_path
+
+
+def source_fingerprint(data_path: str, phase: str, items: List[str], **params) -> str:
+    """
+    Отпечаток исходных файлов сплита: имена, размеры и mtime картинок и масок
+    плюс параметры препроцессинга. Меняется, если поменялся хотя бы один файл.
+    """
+    digest = hashlib.sha1()
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    for item_id in items:
+        for path in sample_paths(data_path, phase, item_id):
+            st = os.stat(path)
+            line = f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns}\n"
+            digest.update(line.encode())
+    return digest.hexdigest()
+
+
+def cache_split_dir(cache_root: str, phase: str, img_size: int) -> str:
+    return os.path.join(cache_root, f"{phase}_{img_size}")
+
+
+def read_cache_index(cache_dir: str) -> Optional[Dict]:
+    index_path = os.path.join(cache_dir, INDEX_NAME)
+    if not os.path.exists(index_path):
+        return None
+    with open(index_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def build_sample_cache(
+    data_path: str, phase: str, img_size: int, cache_dir: str, items: List[str]
+) -> Dict:
+    """
+    Один раз декодирует сплит в два uint8-массива .npy (картинки [N, S, S, 3]
+    и маски [N, S, S]) с уже применённым CenterCrop и пишет index.json.
+    Сборка идёт во временную папку, которая затем переименованием подменяет
+    старую; старая удаляется только после того, как новая встала на место.
+    """
+    tmp_dir = f"{cache_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    crop = A.CenterCrop(height=img_size, width=img_size)
+    n = len(items)
+    images = open_memmap(
+        os.path.join(tmp_dir, IMAGES_NAME),
+        mode="w+",
+        dtype=np.uint8,
+        shape=(n, img_size, img_size, 3),
+    )
+    masks = open_memmap(
+        os.path.join(tmp_dir, MASKS_NAME),
+        mode="w+",
+        dtype=np.uint8,
+        shape=(n, img_size, img_size),
+    )
+
+    print(f"Building sample cache for '{phase}' ({n} items) → {cache_dir}")
+    for i, item_id in enumerate(items):
+        image_path, mask_path = sample_paths(data_path, phase, item_id)
+        image = np.array(Image.open(image_path).convert("RGB"))
+        mask = np.array(Image.open(mask_path))
+        cropped = crop(image=image, mask=mask)
+        images[i] = cropped["image"]
+        masks[i] = cropped["mask"]
+    images.flush()
+    masks.flush()
+    del images, masks
+
+    index = {
+        "version": CACHE_VERSION,
+        "phase": phase,
+        "img_size": img_size,
+        "fingerprint": source_fingerprint(data_path, phase, items, img_size=img_size),
+        "items": items,
+    }
+    with open(os.path.join(tmp_dir, INDEX_NAME), "w", encoding="utf-8") as f:
+        json.dump(index, f)
+
+    # Старый кэш отодвигается в сторону, а не удаляется заранее: rmtree с
+    # ignore_errors может оставить файлы (например, .nfs* от открытых memmap),
+    # и тогда os.replace упал бы уже после того, как кэш наполовину удалён
+    old_dir = f"{cache_dir}.old-{os.getpid()}"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(cache_dir):
+        os.replace(cache_dir, old_dir)
+    os.replace(tmp_dir, cache_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return index
+
+
+def ensure_sample_cache(
+    data_path: str, phase: str, img_size: int, cache_root: str
+) -> str:
+    """
+    Возвращает папку с актуальным кэшем сплита, пересобирая его,
+    если поменялись исходные файлы или img_size.
+    """
+    cache_dir = cache_split_dir(cache_root, phase, img_size)
+    items = list_items(data_path, phase)
+    fingerprint = source_fingerprint(data_path, phase, items, img_size=img_size)
+
+    index = read_cache_index(cache_dir)
+    if (
+        index is None
+        or index.get("version") != CACHE_VERSION
+        or index.get("fingerprint") != fingerprint
+    ):
+        build_sample_cache(data_path, phase, img_size, cache_dir, items)
+    return cache_dir
+
+
+class MemmapSampleCache:
+    """
+    Чтение сэмплов из кэша, собранного build_sample_cache.
+
+    Массивы открываются лениво через np.load(mmap_mode="r") в том процессе,
+    где идёт чтение, и не попадают в pickle. Поэтому каждый воркер DataLoader
+    держит только своё отображение файла, а сами страницы общие (page cache ОС).
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        index = read_cache_index(cache_dir)
+        if index is None:
+            raise FileNotFoundError(f"Кэш не найден: {cache_dir}")
+        self.items = index["items"]
+        self.img_size = index["img_size"]
+        self._images = None
+        self._masks = None
+
+    def __len__(self):
+        return len(self.items)
+
+    def _open(self):
+        self._images = np.load(os.path.join(self.cache_dir, IMAGES_NAME), mmap_mode="r")
+        self._masks = np.load(os.path.join(self.cache_dir, MASKS_NAME), mmap_mode="r")
+
+    def __getitem__(self, index: int) -> Tuple[np.ndarray, np.ndarray]:
+        if self._images is None:
+            self._open()
+        # Копия одного сэмпла: memmap только для чтения, а ToTensor делает from_numpy
+        return np.array(self._images[index]), np.array(self._masks[index])
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_images"] = None
+        state["_masks"] = None
+        return state
@@ -0,0 +1,117 @@
+import os
+from typing import Dict, List, Tuple
+
+import hydra
+import numpy as np
+from omegaconf import DictConfig
+from PIL import Image
+
+from .cache import list_items, sample_paths, source_fingerprint
+
+CLASS_NAMES = [
+    "Background",
+    "Building",
+    "Road",
+    "Water",
+    "Tree",
+    "Vehicle",
+    "Pool",
+    "Grass",
+]
+
+
+def class_histogram_path(index_dir: str, phase: str) -> str:
+    return os.path.join(index_dir, f"{phase}_class_hist.npz")
+
+
+def build_class_histogram(
+    data_path: str, phase: str, num_classes: int, out_path: str
+) -> Tuple[List[str], np.ndarray]:
+    """
+    Один проход по маскам сплита: число пикселей каждого класса на картинку.
+    Сохраняет .npz с items [N] и counts [N, C] (int64) и отпечатком исходников.
+    """
+    items = list_items(data_path, phase)
+    counts = np.zeros((len(items), num_classes), dtype=np.int64)
+    for i, item_id in enumerate(items):
+        _, mask_path = sample_paths(data_path, phase, item_id)
+        mask = np.array(Image.open(mask_path))
+        counts[i] = np.bincount(mask.ravel(), minlength=num_classes)[:num_classes]
+
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    fingerprint = source_fingerprint(data_path, phase, items, num_classes=num_classes)
+    np.savez(out_path, items=np.array(items), counts=counts, fingerprint=fingerprint)
+    return items, counts
+
+
+def load_class_histogram(path: str) -> Tuple[List[str], np.ndarray]:
+    with np.load(path) as data:
+        return data["items"].tolist(), data["counts"]
+
+
+def ensure_class_histogram(
+    data_path: str, phase: str, num_classes: int, index_dir: str
+) -> Tuple[List[str], np.ndarray]:
+    """Загружает индекс гистограмм, пересобирая его, если поменялись маски."""
+    path = class_histogram_path(index_dir, phase)
+    items = list_items(data_path, phase)
+    fingerprint = source_fingerprint(data_path, phase, items, num_classes=num_classes)
+    if os.path.exists(path):
+        with np.load(path) as data:
+            if str(data["fingerprint"]) == fingerprint:
+                return data["items"].tolist(), data["counts"]
+    return build_class_histogram(data_path, phase, num_classes, path)
+
+
+def class_balanced_weights(counts: np.ndarray, power: float = 0.5) -> np.ndarray:
+    """
+    Веса картинок для WeightedRandomSampler.
+
+    Вес класса — (1 / частота класса) ** power (power=0 — равномерно,
+    power=1 — полная обратная частота); вес картинки — среднее весов
+    классов по её пикселям. Картинки с редкими классами выбираются чаще.
+    """
+    class_pixels = counts.sum(axis=0).astype(np.float64)
+    freq = class_pixels / max(class_pixels.sum(), 1)
+    class_weights = np.zeros_like(freq)
+    present = freq > 0
+    class_weights[present] = (1.0 / freq[present]) ** power
+
+    image_pixels = counts.sum(axis=1, keepdims=True).astype(np.float64)
+    fractions = counts / np.maximum(image_pixels, 1)
+    return fractions @ class_weights
+
+
+def dataset_statistics(counts: np.ndarray) -> Dict[str, Dict[str, float]]:
+    """Доля пикселей каждого класса и доля картинок, где класс встречается."""
+    class_pixels = counts.sum(axis=0)
+    total = max(class_pixels.sum(), 1)
+    stats = {}
+    for cls_id, name in enumerate(CLASS_NAMES[: counts.shape[1]]):
+        stats[name] = {
+            "pixel_fraction": float(class_pixels[cls_id] / total),
+            "image_fraction": float((counts[:, cls_id] > 0).mean()),
+        }
+    return stats
+
+
+@hydra.main(version_base="1.3", config_path="../../configs", config_name="config")
+def main(cfg: DictConfig):
+    """Строит индекс гистограмм классов и печатает статистику датасета."""
+    for phase in ("train", "test"):
+        _, counts = ensure_class_histogram(
+            cfg.data.data_dir,
+            phase,
+            cfg.model.num_classes,
+            cfg.data.sampler.index_dir,
+        )
+        print(f"{phase}: {counts.shape[0]} images")
+        for name, s in dataset_statistics(counts).items():
+            print(
+                f"  {name:<10} pixels {s['pixel_fraction']:7.2%}  "
+                f"images {s['image_fraction']:7.2%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,39 @@
+from typing import Optional
+
+import numpy as np
 import pytorch_lightning as pl
-from torch.utils.data import DataLoader
+import torch
+import torch.distributed as dist
+from torch.utils.data import (
+    DataLoader,
+    DistributedSampler,
+    IterableDataset,
+    WeightedRandomSampler,
+)
 
+from .cache import ensure_sample_cache
+from .class_stats import CLASS_NAMES, class_balanced_weights, ensure_class_histogram
 from .dataset import FloodNetDataset
+from .gpu_augment import BatchAugment, resize_batch
+from .progressive import ProgressiveSchedule
+from .shards import FloodNetShardDataset
+from .tiled_dataset import TiledFloodNetDataset, ensure_tile_index
+
+
+class DistributedEvalSampler(DistributedSampler):
+    """
+    Шардирование val/test по процессам без дополнения дубликатами
+    (в отличие от DistributedSampler): каждый пример попадает ровно в один
+    процесс, и сумма матриц ошибок по процессам совпадает с одиночным прогоном.
+    """
+
+    def __init__(self, dataset, num_replicas=None, rank=None):
+        super().__init__(dataset, num_replicas, rank, shuffle=False, drop_last=False)
+        self.num_samples = len(range(self.rank, len(dataset), self.num_replicas))
+        self.total_size = len(dataset)
+
+    def __iter__(self):
+        return iter(range(self.rank, len(self.dataset), self.num_replicas))
 
 
 class FloodNetDataModule(pl.LightningDataModule):
@@ -12,6 +44,15 @@ class FloodNetDataModule(pl.LightningDataModule):
         batch_size: int = 4,
         num_workers: int = 2,
         pin_memory: bool = True,
+        cache_dir: Optional[str] = None,
+        gpu_augment: Optional[dict] = None,
+        tiling: Optional[dict] = None,
+        shards: Optional[dict] = None,
+        sampler: Optional[dict] = None,
+        compact: bool = False,
+        persistent_workers: bool = False,
+        prefetch_factor: Optional[int] = None,
+        progressive: Optional[dict] = None,
     ):
         super().__init__()
         self.data_dir = data_dir
@@ -19,67 +60,218 @@ class FloodNetDataModule(pl.LightningDataModule):
         self.batch_size = batch_size
         self.num_workers = num_workers
         self.pin_memory = pin_memory
+        self.persistent_workers = persistent_workers
+        self.prefetch_factor = prefetch_factor
+        self.cache_dir = cache_dir
+        # uint8-маски вместо int64; в long и float их переводит UNetLitModule
+        self.compact = compact
+
+        # Батчевые аугментации на устройстве: воркеры отдают только сырой
+        # CenterCrop размера crop_size, кроп/флипы/ресайз до img_size — в
+        # on_after_batch_transfer
+        self.batch_augment = None
+        self.train_crop_size = img_size
+        if gpu_augment is not None and gpu_augment.get("enabled", False):
+            self.train_crop_size = gpu_augment.get("crop_size") or img_size
+            self.batch_augment = BatchAugment(
+                out_size=img_size,
+                scale=gpu_augment.get("scale", (0.25, 1.0)),
+                ratio=gpu_augment.get("ratio", (3 / 4, 4 / 3)),
+                hflip=gpu_augment.get("hflip", 0.5),
+                vflip=gpu_augment.get("vflip", 0.5),
+            )
+
+        # Тайловый режим: вместо одного CenterCrop на сцену — все окна сцены
+        # размером с кроп (train_crop_size для train, img_size для val/test)
+        self.tiling = None
+        if tiling is not None and tiling.get("enabled", False):
+            self.tiling = tiling
+
+        # Потоковое чтение из tar-шардов (см. src/data/shards.py)
+        self.shards = None
+        if shards is not None and shards.get("enabled", False):
+            self.shards = shards
+
+        # Сэмплер train: "uniform" (shuffle) или "class_balanced"
+        # (WeightedRandomSampler по индексу гистограмм классов)
+        self.sampler = None
+        if sampler is not None and sampler.get("type", "uniform") != "uniform":
+            if sampler["type"] != "class_balanced":
+                raise ValueError(f"Неизвестный тип сэмплера: {sampler['type']}")
+            if self.shards is not None:
+                raise ValueError("class_balanced сэмплер несовместим с шардами")
+            self.sampler = sampler
+
+        # Прогрессивный ресайз: датасеты отдают кропы полного размера,
+        # а ресайз до разрешения текущей стадии делается на устройстве.
+        # Батч стадии применяется при пересоздании train_dataloader
+        # (Trainer(reload_dataloaders_every_n_epochs=1))
+        self.progressive = None
+        if progressive is not None and progressive.get("enabled", False):
+            self.progressive = ProgressiveSchedule(progressive["stages"])
+        self.train_size = img_size
 
         # Самые важные датасеты заведомо инициализируем в setup()
         self.train_dataset = None
         self.val_dataset = None
 
     def prepare_data(self):
-        # Здесь можно прописать логику скачивания/распаковки данных, если надо.
-        pass
+        # Индекс окон и кэш собираем один раз в главном процессе,
+        # до запуска воркеров
+        if self.tiling is not None:
+            for phase, size in (
+                ("train", self.train_crop_size),
+                ("test", self.img_size),
+            ):
+                ensure_tile_index(
+                    self.data_dir,
+                    phase,
+                    size,
+                    self.tiling.get("overlap", 0),
+                    self.tiling["index_dir"],
+                )
+        elif self.cache_dir is not None:
+            ensure_sample_cache(
+                self.data_dir, "train", self.train_crop_size, self.cache_dir
+            )
+            ensure_sample_cache(self.data_dir, "test", self.img_size, self.cache_dir)
+
+        if self.sampler is not None:
+            ensure_class_histogram(
+                self.data_dir, "train", len(CLASS_NAMES), self.sampler["index_dir"]
+            )
 
     def setup(self, stage=None):
         # stage может быть 'fit', 'validate', 'test' или None
         # При fit создаём train/val
         if stage in (None, "fit"):
-            self.train_dataset = FloodNetDataset(
-                data_path=self.data_dir,
-                phase="train",
-                img_size=self.img_size,
-                augment=False,  # аугментации только для train
-            )
+            self.train_dataset = self._make_dataset("train", self.train_crop_size)
             # Поскольку у нас нет отдельной папки val,
             # будем валидировать на тех же 'test' данных
             # (либо сделайте split вручную)
-            self.val_dataset = FloodNetDataset(
-                data_path=self.data_dir,
-                phase="test",
-                img_size=self.img_size,
-                augment=False,
-            )
+            self.val_dataset = self._make_dataset("test", self.img_size)
 
         # Если захотим тестировать отдельно:
         if stage in ("test",):
-            self.test_dataset = FloodNetDataset(
+            self.test_dataset = self._make_dataset("test", self.img_size)
+
+    def _make_dataset(self, phase: str, img_size: int):
+        if self.shards is not None:
+            return FloodNetShardDataset(
+                shard_dir=self.shards["dir"],
+                phase=phase,
+                img_size=img_size,
+                shuffle_buffer=self.shards.get("shuffle_buffer", 0)
+                if phase == "train"
+                else 0,
+                compact=self.compact,
+                # В DDP у всех процессов должно быть одинаковое число шагов
+                balance_ranks=phase == "train",
+            )
+        if self.tiling is not None:
+            return TiledFloodNetDataset(
                 data_path=self.data_dir,
-                phase="test",
-                img_size=self.img_size,
-                augment=False,
+                phase=phase,
+                tile_size=img_size,
+                overlap=self.tiling.get("overlap", 0),
+                index_dir=self.tiling["index_dir"],
+                compact=self.compact,
             )
+        return FloodNetDataset(
+            data_path=self.data_dir,
+            phase=phase,
+            img_size=img_size,
+            augment=False,  # аугментации — в batch_augment
+            cache_dir=self.cache_dir,
+            compact=self.compact,
+        )
+
+    def on_after_batch_transfer(self, batch, dataloader_idx):
+        if self.trainer is None or not self.trainer.training:
+            return batch
+        images, masks = batch
+        if self.batch_augment is not None:
+            batch = self.batch_augment(images, masks, out_size=self.train_size)
+        elif images.shape[-1] != self.train_size:
+            batch = resize_batch(images, masks, self.train_size)
+        return batch
+
+    def _loader_kwargs(self) -> dict:
+        kwargs = dict(num_workers=self.num_workers, pin_memory=self.pin_memory)
+        # persistent_workers и prefetch_factor допустимы только с воркерами
+        if self.num_workers > 0:
+            kwargs["persistent_workers"] = self.persistent_workers
+            kwargs["prefetch_factor"] = self.prefetch_factor
+        return kwargs
+
+    def _train_sampler(self) -> WeightedRandomSampler:
+        items, counts = ensure_class_histogram(
+            self.data_dir, "train", len(CLASS_NAMES), self.sampler["index_dir"]
+        )
+        image_weights = dict(
+            zip(items, class_balanced_weights(counts, self.sampler.get("power", 0.5)))
+        )
+
+        # Окно тайлового датасета получает вес своей сцены
+        dataset = self.train_dataset
+        weights = np.array([image_weights[item] for item in dataset.items])
+        if isinstance(dataset, TiledFloodNetDataset):
+            weights = weights[dataset.windows[:, 0]]
+
+        return WeightedRandomSampler(
+            torch.as_tensor(weights, dtype=torch.double),
+            num_samples=self.sampler.get("num_samples") or len(dataset),
+            replacement=True,
+        )
 
     def train_dataloader(self):
+        batch_size = self.batch_size
+        if self.progressive is not None:
+            epoch = self.trainer.current_epoch if self.trainer is not None else 0
+            stage = self.progressive.stage(epoch)
+            self.train_size = stage.img_size
+            batch_size = stage.batch_size or self.batch_size
+            print(
+                f"Progressive resize: epoch {epoch} → "
+                f"{self.train_size}px, batch {batch_size}"
+            )
+
+        if hasattr(self.train_dataset, "set_epoch") and self.trainer is not None:
+            # При пересоздании загрузчика Lightning запускает итерацию раньше
+            # on_train_epoch_start, поэтому эпоху ставим уже здесь
+            self.train_dataset.set_epoch(self.trainer.current_epoch)
+
+        sampler = self._train_sampler() if self.sampler is not None else None
         return DataLoader(
             self.train_dataset,
-            batch_size=self.batch_size,
-            shuffle=True,
-            num_workers=self.num_workers,
-            pin_memory=self.pin_memory,
+            batch_size=batch_size,
+            # IterableDataset перемешивается сам (буфер шардов)
+            shuffle=sampler is None
+            and not isinstance(self.train_dataset, IterableDataset),
+            sampler=sampler,
+            **self._loader_kwargs(),
         )
 
-    def val_dataloader(self):
+    def _eval_loader(self, dataset) -> DataLoader:
+        # train в DDP шардирует Lightning (DistributedSampler, в том числе
+        # поверх WeightedRandomSampler); val/test — без дубликатов
+        sampler = None
+        if (
+            dist.is_available()
+            and dist.is_initialized()
+            and not isinstance(dataset, IterableDataset)
+        ):
+            sampler = DistributedEvalSampler(dataset)
         return DataLoader(
-            self.val_dataset,
+            dataset,
             batch_size=1,
             shuffle=False,
-            num_workers=self.num_workers,
-            pin_memory=self.pin_memory,
+            sampler=sampler,
+            **self._loader_kwargs(),
         )
 
+    def val_dataloader(self):
+        return self._eval_loader(self.val_dataset)
+
     def test_dataloader(self):
-        return DataLoader(
-            self.test_dataset,
-            batch_size=1,
-            shuffle=False,
-            num_workers=self.num_workers,
-            pin_memory=self.pin_memory,
-        )
+        return self._eval_loader(self.test_dataset)
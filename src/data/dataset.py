@@ -1,4 +1,5 @@
 import os
+from typing import Optional
 
 import albumentations as A
 import numpy as np
@@ -7,12 +8,20 @@ from albumentations.pytorch import ToTensorV2 as ToTensor
 from PIL import Image
 from torch.utils.data import Dataset
 
+from .cache import MemmapSampleCache, ensure_sample_cache
+
 
 class FloodNetDataset(Dataset):
     """
     Классы:
       0: Background, 1: Building, 2: Road, 3: Water,
       4: Tree, 5: Vehicle, 6: Pool, 7: Grass
+
+    Если задан cache_dir, сэмплы читаются из memory-mapped кэша
+    (см. src/data/cache.py) без повторного декодирования JPEG/PNG.
+    При compact=True маска отдаётся как uint8 вместо int64 (в 8 раз меньше
+    байт через shared memory воркеров и копирование на устройство);
+    картинка в обоих режимах uint8.
     """
 
     def __init__(
@@ -21,16 +30,29 @@ class FloodNetDataset(Dataset):
         phase: str,
         img_size: int,
         augment: bool = False,
+        cache_dir: Optional[str] = None,
+        compact: bool = False,
     ):
         super().__init__()
         self.num_classes = 8
+        self.compact = compact
         self.data_path = data_path
         self.phase = phase  # 'train' или 'test'
         self.img_size = img_size
 
-        # Список ID изображений (без расширения)
-        image_dir = os.path.join(self.data_path, self.phase, "image")
-        self.items = [fname.split(".")[0] for fname in os.listdir(image_dir)]
+        self.cache = None
+        if cache_dir is not None:
+            # В кэше лежат уже обрезанные CenterCrop сэмплы,
+            # случайный кроп по исходной картинке из них не сделать
+            if augment and phase == "train":
+                raise ValueError("Кэш сэмплов несовместим с augment=True")
+            split_dir = ensure_sample_cache(data_path, phase, img_size, cache_dir)
+            self.cache = MemmapSampleCache(split_dir)
+            self.items = self.cache.items
+        else:
+            # Список ID изображений (без расширения)
+            image_dir = os.path.join(self.data_path, self.phase, "image")
+            self.items = [fname.split(".")[0] for fname in os.listdir(image_dir)]
 
         # Определяем аугментации
         if augment and phase == "train":
@@ -52,13 +74,20 @@ class FloodNetDataset(Dataset):
         return len(self.items)
 
     def __getitem__(self, index):
-        item_id = self.items[index]
-        image_path = os.path.join(self.data_path, self.phase, "image", f"{item_id}.jpg")
-        mask_path = os.path.join(self.data_path, self.phase, "mask", f"{item_id}.png")
+        if self.cache is not None:
+            image, mask = self.cache[index]
+        else:
+            item_id = self.items[index]
+            image_path = os.path.join(
+                self.data_path, self.phase, "image", f"{item_id}.jpg"
+            )
+            mask_path = os.path.join(
+                self.data_path, self.phase, "mask", f"{item_id}.png"
+            )
 
-        # Загружаем как numpy-массивы
-        image = np.array(Image.open(image_path).convert("RGB"))
-        mask = np.array(Image.open(mask_path))
+            # Загружаем как numpy-массивы
+            image = np.array(Image.open(image_path).convert("RGB"))
+            mask = np.array(Image.open(mask_path))
 
         # Применяем аугментации / обрезку + ToTensor
         augmented = self.transform(image=image, mask=mask)
@@ -66,10 +95,12 @@ class FloodNetDataset(Dataset):
         mask = augmented["mask"]
 
         # Если mask — numpy.ndarray, приводим к torch.LongTensor
+        # (в компактном режиме — к uint8, в long переводит UNetLitModule)
+        mask_dtype = torch.uint8 if self.compact else torch.long
         if isinstance(mask, np.ndarray):
-            mask = torch.from_numpy(mask.astype(np.int64))
+            mask = torch.from_numpy(mask).to(mask_dtype)
         else:
-            mask = mask.long()
+            mask = mask.to(mask_dtype)
 
         if self.phase == "train":
             assert image.shape == (3, self.img_size, self.img_size)
@@ -1,49 +1,36 @@
-import shutil
 import subprocess
-import tarfile
 from pathlib import Path
 
-import gdown
 from omegaconf import DictConfig
 
+from .fetch import fetch_and_extract
+
+GDRIVE_URL = (
+    "https://drive.usercontent.google.com/download?id={}&export=download&confirm=t"
+)
+
 
 def download_data_from_gdrive_folder(cfg: DictConfig):
     """
-    Скачивает файлы из Google Drive, распаковывает их
-    и добавляет через DVC.
-    Параметры берутся из cfg.download и cfg.dvc.
+    Скачивает архив из Google Drive (с докачкой), распаковывает его потоково
+    и добавляет через DVC. Если данные уже на месте и архив не менялся,
+    шаг пропускается. Параметры берутся из cfg.download и cfg.dvc.
     """
     download_cfg = cfg.download
-    folder_id = download_cfg.folder_id
     dest_dir = Path(download_cfg.dest_dir)
-    tar_path = dest_dir / download_cfg.tar_name
-
-    dest_dir.mkdir(parents=True, exist_ok=True)
-
-    # Скачиваем tar.gz
-    url = f"https://drive.google.com/uc?id={folder_id}&export=download"
-    print(f"Downloading {url} → {tar_path}")
-    gdown.download(url=url, output=str(tar_path), quiet=False)
-
-    # Распаковываем
-    with tarfile.open(tar_path, mode="r:*") as tar:
-        tar.extractall(path=dest_dir)
-
-    # Перемещаем поддиректории train/test
-    extracted = dest_dir / download_cfg.tar_name.replace(".tar.gz", "")
-    for subset in download_cfg.subsets:
-        src = extracted / subset
-        dst = dest_dir / subset
-        if src.exists():
-            if dst.exists():
-                shutil.rmtree(dst)
-            src.rename(dst)
-        else:
-            print(f"Warning: subset folder not found: {src}")
-
-    # Удаляем распакованную папку
-    if extracted.exists():
-        shutil.rmtree(extracted)
+    url = download_cfg.get("url") or GDRIVE_URL.format(download_cfg.folder_id)
+
+    changed = fetch_and_extract(
+        url=url,
+        dest_dir=dest_dir,
+        tar_name=download_cfg.tar_name,
+        subsets=download_cfg.subsets,
+        manifest_path=Path(download_cfg.get("manifest") or dest_dir / "manifest.json"),
+        expected_sha256=download_cfg.get("sha256"),
+        check_remote=download_cfg.get("check_remote", True),
+    )
+    if not changed:
+        return
 
     # Добавляем данные в DVC
     for path in cfg.dvc.add_paths:
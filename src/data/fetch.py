@@ -0,0 +1,287 @@
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+CHUNK_SIZE = 1 << 20
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(path: Path) -> Optional[Dict]:
+    if not path.exists():
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def files_intact(dest_dir: Path, manifest: Dict) -> bool:
+    """Быстрая проверка по stat: все файлы манифеста на месте и нужного размера."""
+    for rel, info in manifest["files"].items():
+        path = dest_dir / rel
+        if not path.is_file() or path.stat().st_size != info["size"]:
+            return False
+    return True
+
+
+VALIDATORS = ("etag", "last_modified", "size")
+
+
+def remote_archive_info(url: str, timeout: float = 30) -> Optional[Dict]:
+    """
+    HEAD-запрос: ETag, Last-Modified и размер архива на сервере
+    (None, если сервер недоступен).
+    """
+    request = urllib.request.Request(url, method="HEAD")
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            size = response.headers.get("Content-Length")
+            return {
+                "size": int(size) if size is not None else None,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
+    except (urllib.error.URLError, OSError):
+        return None
+
+
+def remote_unchanged(manifest: Dict, remote: Optional[Dict]) -> bool:
+    """
+    Архив на сервере тот же, что при прошлой распаковке: совпадают все
+    валидаторы (ETag, Last-Modified, размер), известные и серверу, и манифесту.
+    Если сравнивать нечего (сервер недоступен или, как редиректы Google Drive,
+    не отдаёт валидаторов), верим локальным данным: манифест записан только
+    после полной распаковки и проверки sha256 архива.
+    """
+    if remote is None:
+        print("Warning: remote archive is unreachable, using local data")
+        return True
+    archive = manifest.get("archive", {})
+    pairs = [
+        (remote[key], archive.get(key))
+        for key in VALIDATORS
+        if remote.get(key) is not None and archive.get(key) is not None
+    ]
+    if not pairs:
+        print(
+            "Warning: remote archive has no ETag/Last-Modified/Content-Length, "
+            "using local data"
+        )
+        return True
+    return all(ours == theirs for ours, theirs in pairs)
+
+
+class ResumableDownload:
+    """
+    Файлоподобный поток архива для tarfile: сначала отдаёт уже скачанные
+    байты из .part-файла, затем докачивает остаток с Range-запросом,
+    дописывая его в .part. По ходу считает sha256 всего архива.
+    """
+
+    def __init__(self, url: str, part_path: Path, timeout: float = 60):
+        self.url = url
+        self.part_path = part_path
+        self.meta_path = part_path.with_name(part_path.name + ".json")
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.etag = None
+        self.last_modified = None
+
+        meta = load_manifest(self.meta_path) or {}
+        offset = self.part_path.stat().st_size if self.part_path.exists() else 0
+
+        headers = {}
+        if offset > 0:
+            headers["Range"] = f"bytes={offset}-"
+            # Если архив на сервере поменялся, сервер вернёт его целиком (200)
+            if meta.get("etag"):
+                headers["If-Range"] = meta["etag"]
+        request = urllib.request.Request(url, headers=headers)
+        self.response = urllib.request.urlopen(request, timeout=timeout)
+        self.etag = self.response.headers.get("ETag")
+        self.last_modified = self.response.headers.get("Last-Modified")
+
+        if offset > 0 and self.response.status == 206:
+            print(f"Resuming download from byte {offset}")
+            self.local = open(self.part_path, "rb")
+            self.out = open(self.part_path, "ab")
+        else:
+            self.local = None
+            self.out = open(self.part_path, "wb")
+        with open(self.meta_path, "w", encoding="utf-8") as f:
+            json.dump({"url": url, "etag": self.etag}, f)
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = CHUNK_SIZE
+        data = b""
+        if self.local is not None:
+            data = self.local.read(size)
+            if len(data) < size:
+                self.local.close()
+                self.local = None
+        if len(data) < size and self.local is None:
+            chunk = self.response.read(size - len(data))
+            self.out.write(chunk)
+            data += chunk
+        self.digest.update(data)
+        self.size += len(data)
+        return data
+
+    def drain(self):
+        """Дочитывает архив до конца (tarfile может остановиться раньше EOF)."""
+        while self.read(CHUNK_SIZE):
+            pass
+
+    def close(self):
+        if self.local is not None:
+            self.local.close()
+        self.out.close()
+        self.response.close()
+
+
+def member_target(name: str, root_name: str, subsets: Iterable[str]) -> Optional[str]:
+    """
+    Путь файла из архива относительно dest_dir: {root_name}/train/... → train/...
+    Файлы вне нужных сабсетов пропускаются (None).
+    """
+    parts = Path(name).parts
+    if parts and parts[0] == root_name:
+        parts = parts[1:]
+    if not parts or parts[0] not in subsets or ".." in parts:
+        return None
+    return Path(*parts).as_posix()
+
+
+def fetch_and_extract(
+    url: str,
+    dest_dir: Path,
+    tar_name: str,
+    subsets: Iterable[str],
+    manifest_path: Path,
+    expected_sha256: Optional[str] = None,
+    check_remote: bool = True,
+) -> bool:
+    """
+    Докачивает архив и распаковывает его потоково, по мере скачивания.
+
+    Файлы, которые уже лежат на месте с тем же sha256, не перезаписываются;
+    изменившиеся попадают в dest_dir только после проверки expected_sha256.
+    Если данные уже распакованы и архив на сервере не изменился, шаг
+    пропускается целиком. Возвращает True, если данные на диске изменились.
+    """
+    subsets = list(subsets)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest(manifest_path)
+
+    # Новая ожидаемая контрольная сумма — значит, нужен другой архив
+    expected_matches = expected_sha256 is None or (
+        manifest is not None
+        and manifest.get("archive", {}).get("sha256") == expected_sha256
+    )
+    if manifest is not None and expected_matches and files_intact(dest_dir, manifest):
+        if not check_remote or remote_unchanged(manifest, remote_archive_info(url)):
+            print(f"Data in {dest_dir} is up to date, skipping download")
+            return False
+
+    old_files = manifest["files"] if manifest is not None else {}
+    root_name = tar_name.split(".")[0]
+    part_path = dest_dir / f"{tar_name}.part"
+
+    # Изменившиеся файлы сначала пишутся в staging-папку рядом с dest_dir и
+    # переносятся в dest_dir только после проверки контрольной суммы архива:
+    # битый или подменённый архив не должен трогать рабочие данные
+    staging_dir = dest_dir.parent / f".{dest_dir.name}.staging-{os.getpid()}"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    staging_dir.mkdir(parents=True)
+
+    print(f"Downloading {url} → {part_path}")
+    stream = ResumableDownload(url, part_path)
+    files = {}
+    staged = []
+    try:
+        try:
+            with tarfile.open(fileobj=stream, mode="r|*") as tar:
+                for member in tar:
+                    rel = member_target(member.name, root_name, subsets)
+                    if rel is None or not member.isfile():
+                        continue
+                    data = tar.extractfile(member).read()
+                    sha = hashlib.sha256(data).hexdigest()
+                    files[rel] = {"size": len(data), "sha256": sha}
+
+                    target = dest_dir / rel
+                    if target.is_file():
+                        known = old_files.get(rel)
+                        if known is not None and known["size"] == target.stat().st_size:
+                            current = known["sha256"]
+                        else:
+                            current = file_sha256(target)
+                        if current == sha:
+                            continue
+
+                    staged_path = staging_dir / rel
+                    staged_path.parent.mkdir(parents=True, exist_ok=True)
+                    staged_path.write_bytes(data)
+                    staged.append(rel)
+            stream.drain()
+        finally:
+            stream.close()
+
+        archive_sha = stream.digest.hexdigest()
+        if expected_sha256 is not None and archive_sha != expected_sha256:
+            part_path.unlink(missing_ok=True)
+            raise ValueError(
+                f"Контрольная сумма архива не совпала: {archive_sha} != {expected_sha256}"
+            )
+
+        for rel in staged:
+            target = dest_dir / rel
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(staging_dir / rel, target)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    changed = bool(staged)
+
+    # Удаляем файлы сабсетов, которых больше нет в архиве
+    for subset in subsets:
+        subset_dir = dest_dir / subset
+        if not subset_dir.exists():
+            print(f"Warning: subset folder not found in archive: {subset}")
+            continue
+        for path in subset_dir.rglob("*"):
+            if path.is_file() and path.relative_to(dest_dir).as_posix() not in files:
+                path.unlink()
+                changed = True
+
+    manifest = {
+        "archive": {
+            "url": url,
+            "size": stream.size,
+            "etag": stream.etag,
+            "last_modified": stream.last_modified,
+            "sha256": archive_sha,
+        },
+        "files": files,
+    }
+    tmp_manifest = manifest_path.with_name(manifest_path.name + ".tmp")
+    with open(tmp_manifest, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_manifest, manifest_path)
+
+    part_path.unlink(missing_ok=True)
+    stream.meta_path.unlink(missing_ok=True)
+    # Старая раскладка (полная распаковка в папку архива) больше не нужна
+    shutil.rmtree(dest_dir / root_name, ignore_errors=True)
+    return changed
@@ -0,0 +1,97 @@
+import math
+from typing import Optional, Sequence, Tuple
+
+import torch
+import torch.nn.functional as F
+from torch import nn
+
+
+class BatchAugment(nn.Module):
+    """
+    Батчевые аугментации уже собранного батча на том же устройстве, где идёт
+    обучение: RandomResizedCrop + горизонтальный/вертикальный флип.
+
+    Все преобразования каждого сэмпла сводятся к одной аффинной матрице,
+    поэтому весь батч обрабатывается одним affine_grid + grid_sample:
+    картинка — билинейно, маска — nearest, с одинаковой сеткой.
+    """
+
+    def __init__(
+        self,
+        out_size: int,
+        scale: Sequence[float] = (0.25, 1.0),
+        ratio: Sequence[float] = (3 / 4, 4 / 3),
+        hflip: float = 0.5,
+        vflip: float = 0.5,
+    ):
+        super().__init__()
+        self.out_size = out_size
+        self.scale = tuple(scale)
+        self.ratio = tuple(ratio)
+        self.hflip = hflip
+        self.vflip = vflip
+
+    def sample_theta(
+        self, batch_size: int, height: int, width: int, device: torch.device
+    ) -> torch.Tensor:
+        """Случайные аффинные матрицы [B, 2, 3] в нормированных координатах."""
+        area = torch.empty(batch_size, device=device).uniform_(*self.scale)
+        log_ratio = torch.empty(batch_size, device=device).uniform_(
+            math.log(self.ratio[0]), math.log(self.ratio[1])
+        )
+        aspect = torch.exp(log_ratio)
+
+        # Доли исходной ширины/высоты, которые занимает кроп
+        crop_w = torch.sqrt(area * aspect * height / width).clamp(max=1.0)
+        crop_h = torch.sqrt(area / aspect * width / height).clamp(max=1.0)
+
+        # Центр кропа так, чтобы он целиком лежал внутри картинки
+        shift_x = (torch.rand(batch_size, device=device) * 2 - 1) * (1 - crop_w)
+        shift_y = (torch.rand(batch_size, device=device) * 2 - 1) * (1 - crop_h)
+
+        flip_x = torch.where(torch.rand(batch_size, device=device) < self.hflip, -1, 1)
+        flip_y = torch.where(torch.rand(batch_size, device=device) < self.vflip, -1, 1)
+
+        theta = torch.zeros(batch_size, 2, 3, device=device)
+        theta[:, 0, 0] = crop_w * flip_x
+        theta[:, 0, 2] = shift_x
+        theta[:, 1, 1] = crop_h * flip_y
+        theta[:, 1, 2] = shift_y
+        return theta
+
+    @torch.no_grad()
+    def forward(
+        self,
+        images: torch.Tensor,
+        masks: torch.Tensor,
+        out_size: Optional[int] = None,
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        images: [B, 3, H, W] (uint8 или float), masks: [B, H, W].
+        Возвращает float-картинки [B, 3, S, S] и маски [B, S, S] исходного dtype,
+        S = out_size (по умолчанию self.out_size).
+        """
+        B, _, H, W = images.shape
+        size = out_size or self.out_size
+        theta = self.sample_theta(B, H, W, images.device)
+        grid = F.affine_grid(theta, [B, 1, size, size], align_corners=False)
+
+        out_images = F.grid_sample(
+            images.float(), grid, mode="bilinear", align_corners=False
+        )
+        out_masks = F.grid_sample(
+            masks.unsqueeze(1).float(), grid, mode="nearest", align_corners=False
+        )
+        return out_images, out_masks.squeeze(1).to(masks.dtype)
+
+
+@torch.no_grad()
+def resize_batch(
+    images: torch.Tensor, masks: torch.Tensor, size: int
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Ресайз батча до size × size: картинка — билинейно с antialias, маска — nearest."""
+    out_images = F.interpolate(
+        images.float(), size=(size, size), mode="bilinear", antialias=True
+    )
+    out_masks = F.interpolate(masks.unsqueeze(1).float(), size=(size, size))
+    return out_images, out_masks.squeeze(1).to(masks.dtype)
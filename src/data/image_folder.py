@@ -0,0 +1,93 @@
+import glob
+import os
+import time
+from pathlib import Path
+from typing import Iterable, List, Tuple, Union
+
+import torch
+from PIL import Image
+from torch.utils.data import Dataset
+
+from ..models.runtime import load_image
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp")
+
+
+def list_images(
+    source: Union[str, Iterable[str]], suffixes: Iterable[str] = IMAGE_SUFFIXES
+) -> List[Path]:
+    """
+    Входные картинки для инференса: папка (все файлы с расширениями suffixes,
+    без рекурсии), glob-шаблон ("scenes/**/*.jpg") или список таких путей/шаблонов.
+    """
+    suffixes = tuple(suffixes)
+    sources = [source] if isinstance(source, (str, Path)) else list(source)
+    paths = []
+    for src in sources:
+        src = str(src)
+        if os.path.isdir(src):
+            paths.extend(
+                p
+                for p in sorted(Path(src).iterdir())
+                if p.is_file() and p.suffix.lower() in suffixes
+            )
+        elif glob.has_magic(src):
+            paths.extend(Path(p) for p in sorted(glob.glob(src, recursive=True)))
+        elif os.path.isfile(src):
+            paths.append(Path(src))
+        else:
+            raise ValueError(f"Не найден вход для инференса: {src}")
+    if not paths:
+        raise ValueError(f"Во входе {source} нет картинок")
+
+    stems = [p.stem for p in paths]
+    duplicates = sorted({s for s in stems if stems.count(s) > 1})
+    if duplicates:
+        # Маски сохраняются по имени файла без расширения
+        raise ValueError(f"Картинки с одинаковыми именами: {duplicates}")
+    return paths
+
+
+def check_images(
+    paths: List[Path], img_size: int
+) -> Tuple[List[Path], List[Tuple[Path, str]]]:
+    """
+    Делит картинки на пригодные для инференса и пропускаемые (меньше
+    img_size×img_size или не читаются) с причиной. Читаются только заголовки,
+    поэтому одна плохая картинка не роняет весь прогон в воркере DataLoader.
+    """
+    usable, skipped = [], []
+    for path in paths:
+        try:
+            with Image.open(path) as image:
+                width, height = image.size
+        except (OSError, ValueError) as e:
+            skipped.append((path, f"cannot read: {e}"))
+            continue
+        if height < img_size or width < img_size:
+            skipped.append((path, f"{width}×{height} is smaller than {img_size}"))
+        else:
+            usable.append(path)
+    return usable, skipped
+
+
+class ImageFileDataset(Dataset):
+    """
+    Произвольные картинки без масок: uint8 [3, S, S] с центральным кропом
+    (как test-трансформ FloodNetDataset), индекс файла и время декодирования
+    в секундах. Декодирование идёт в воркерах DataLoader, поэтому его время
+    замеряется здесь, а не в главном процессе.
+    """
+
+    def __init__(self, paths: List[Path], img_size: int):
+        self.paths = list(paths)
+        self.img_size = img_size
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, index):
+        start = time.perf_counter()
+        image = load_image(self.paths[index], self.img_size)
+        seconds = time.perf_counter() - start
+        return image, torch.tensor(index), torch.tensor(seconds, dtype=torch.float64)
@@ -0,0 +1,148 @@
+import json
+import numbers
+import os
+import shutil
+import threading
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+STORE_VERSION = 1
+INDEX_NAME = "index.json"
+
+
+def chunk_name(chunk: int) -> str:
+    return f"chunk_{chunk:05d}.bin"
+
+
+class PredictionStoreWriter:
+    """
+    Компактное хранилище масок вместо тысяч PNG: маски uint8 пишутся подряд
+    в чанки chunk_XXXXX.bin (новый чанк — после chunk_mb МБ), index.json
+    хранит для каждой маски имя, чанк, смещение и форму.
+
+    Запись идёт во временную папку, которая при close() переименованием подменяет
+    store_dir. add() потокобезопасен (вызывается из потоков MaskWriter).
+    """
+
+    def __init__(
+        self, store_dir: str, chunk_mb: float = 256, metadata: Optional[Dict] = None
+    ):
+        self.store_dir = str(store_dir)
+        self.chunk_bytes = int(chunk_mb * 2**20)
+        self.metadata = metadata or {}
+        self.tmp_dir = f"{self.store_dir}.tmp-{os.getpid()}"
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        os.makedirs(self.tmp_dir)
+
+        self.items: List[Tuple[str, int, int, List[int]]] = []
+        self._names = set()
+        self._chunk = -1
+        self._file = None
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def _next_chunk(self):
+        if self._file is not None:
+            self._file.close()
+        self._chunk += 1
+        self._file = open(os.path.join(self.tmp_dir, chunk_name(self._chunk)), "wb")
+        self._offset = 0
+
+    def add(self, name: str, mask: np.ndarray):
+        data = np.ascontiguousarray(mask, dtype=np.uint8)
+        with self._lock:
+            if name in self._names:
+                raise ValueError(f"Маска {name} уже есть в хранилище")
+            if self._file is None or (
+                self._offset and self._offset + data.nbytes > self.chunk_bytes
+            ):
+                self._next_chunk()
+            self._file.write(data.tobytes())
+            self.items.append((name, self._chunk, self._offset, list(data.shape)))
+            self._names.add(name)
+            self._offset += data.nbytes
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            index = {
+                "version": STORE_VERSION,
+                "metadata": self.metadata,
+                "items": sorted(self.items),
+            }
+            with open(os.path.join(self.tmp_dir, INDEX_NAME), "w") as f:
+                json.dump(index, f)
+            # Прежнее хранилище отодвигается в сторону и удаляется только
+            # после того, как новое встало на место: при сбое между шагами
+            # на диске остаётся целое хранилище (старое или новое)
+            old_dir = f"{self.store_dir}.old-{os.getpid()}"
+            shutil.rmtree(old_dir, ignore_errors=True)
+            if os.path.exists(self.store_dir):
+                os.replace(self.store_dir, old_dir)
+            os.replace(self.tmp_dir, self.store_dir)
+            shutil.rmtree(old_dir, ignore_errors=True)
+
+    def abort(self):
+        """Выбрасывает недописанное хранилище, прежнее store_dir не трогает."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class PredictionStore:
+    """
+    Чтение хранилища PredictionStoreWriter: чанки открываются лениво через
+    np.memmap, маска — read-only view без копирования и декодирования.
+    Как и MemmapSampleCache, отображения не попадают в pickle.
+    """
+
+    def __init__(self, store_dir: str):
+        self.store_dir = str(store_dir)
+        index_path = os.path.join(self.store_dir, INDEX_NAME)
+        if not os.path.exists(index_path):
+            raise FileNotFoundError(f"Хранилище предсказаний не найдено: {store_dir}")
+        with open(index_path) as f:
+            index = json.load(f)
+        if index.get("version") != STORE_VERSION:
+            raise ValueError(f"Неподдерживаемая версия хранилища: {store_dir}")
+        self.metadata = index["metadata"]
+        self.names = [item[0] for item in index["items"]]
+        self._entries = {item[0]: item[1:] for item in index["items"]}
+        self._chunks = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries
+
+    def _chunk(self, chunk: int) -> np.memmap:
+        if chunk not in self._chunks:
+            path = os.path.join(self.store_dir, chunk_name(chunk))
+            self._chunks[chunk] = np.memmap(path, dtype=np.uint8, mode="r")
+        return self._chunks[chunk]
+
+    def __getitem__(self, key: Union[str, int]) -> np.ndarray:
+        name = self.names[key] if isinstance(key, numbers.Integral) else key
+        chunk, offset, shape = self._entries[name]
+        size = int(np.prod(shape))
+        return self._chunk(chunk)[offset : offset + size].reshape(shape)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_chunks"] = {}
+        return state
@@ -0,0 +1,32 @@
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+
+
+@dataclass
+class ResolutionStage:
+    epoch: int
+    img_size: int
+    batch_size: Optional[int] = None
+
+
+class ProgressiveSchedule:
+    """
+    Расписание прогрессивного ресайза: с эпохи stage.epoch обучение идёт
+    на разрешении stage.img_size с батчем stage.batch_size.
+    До первой стадии действует первая стадия.
+    """
+
+    def __init__(self, stages: Iterable[dict]):
+        self.stages: List[ResolutionStage] = sorted(
+            (ResolutionStage(**dict(stage)) for stage in stages),
+            key=lambda stage: stage.epoch,
+        )
+        if not self.stages:
+            raise ValueError("Расписание progressive должно содержать стадии")
+
+    def stage(self, epoch: int) -> ResolutionStage:
+        current = self.stages[0]
+        for stage in self.stages:
+            if stage.epoch <= epoch:
+                current = stage
+        return current
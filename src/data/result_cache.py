@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+from .fetch import file_sha256
+
+RESULT_CACHE_VERSION = 1
+
+
+class ResultCache:
+    """
+    Дисковый кэш результатов инференса, адресуемый содержимым.
+
+    Ключ — sha256 от (sha256 байтов файла картинки, sha256 файла модели,
+    параметры препроцессинга), значение — маска классов uint8 в .npy.
+    Поменялась картинка, веса или препроцессинг — ключ другой, и старая
+    запись просто перестаёт использоваться, пока её не вытеснит LRU.
+
+    LRU по mtime: попадание обновляет mtime файла, evict() удаляет самые
+    давно использованные записи, пока кэш больше max_size_mb.
+    """
+
+    def __init__(
+        self, cache_dir: str, model_hash: str, preprocess: Dict, max_size_mb: float
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size_bytes = int(max_size_mb * 2**20)
+        namespace = {
+            "version": RESULT_CACHE_VERSION,
+            "model": model_hash,
+            "preprocess": preprocess,
+        }
+        self.namespace = hashlib.sha256(
+            json.dumps(namespace, sort_keys=True).encode()
+        ).hexdigest()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def key(self, image_path: Path) -> str:
+        digest = hashlib.sha256(self.namespace.encode())
+        digest.update(file_sha256(image_path).encode())
+        return digest.hexdigest()
+
+    def path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.npy"
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        path = self.path(key)
+        try:
+            mask = np.load(path)
+        except (ValueError, OSError):
+            # Нет записи или она повреждена — считаем заново
+            self.misses += 1
+            return None
+        os.utime(path)
+        self.hits += 1
+        return mask
+
+    def add(self, key: str, mask: np.ndarray):
+        """Интерфейс sink-а MaskWriter: запись атомарна, можно из разных потоков."""
+        path = self.path(key)
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(mask, dtype=np.uint8))
+        os.replace(tmp, path)
+
+    def size_bytes(self) -> int:
+        return sum(p.stat().st_size for p in self.cache_dir.glob("*/*.npy"))
+
+    def evict(self) -> int:
+        """Удаляет самые давно использованные записи сверх max_size_mb."""
+        entries = []
+        for path in self.cache_dir.glob("*/*.npy"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_size_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        self.evicted += removed
+        return removed
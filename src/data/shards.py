@@ -0,0 +1,235 @@
+import io
+import itertools
+import json
+import os
+import random
+import tarfile
+from typing import Iterator, List, Optional, Tuple
+
+import albumentations as A
+import hydra
+import numpy as np
+import torch
+import torch.distributed as dist
+from albumentations.pytorch import ToTensorV2 as ToTensor
+from omegaconf import DictConfig
+from PIL import Image
+from torch.utils.data import IterableDataset, get_worker_info
+
+from .cache import list_items, sample_paths
+
+
+def shard_index_path(shard_dir: str, phase: str) -> str:
+    return os.path.join(shard_dir, f"{phase}-index.json")
+
+
+def pack_shards(
+    data_path: str, phase: str, shard_dir: str, samples_per_shard: int = 256
+) -> List[str]:
+    """
+    Перепаковывает сплит из раскладки {phase}/image, {phase}/mask в несжатые
+    tar-шарды: {id}.jpg и {id}.png лежат подряд, поэтому пара читается
+    одним последовательным проходом без отдельных open на каждый файл.
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    items = list_items(data_path, phase)
+
+    shards, counts = [], []
+    for start in range(0, len(items), samples_per_shard):
+        chunk = items[start : start + samples_per_shard]
+        name = f"{phase}-{len(shards):05d}.tar"
+        with tarfile.open(os.path.join(shard_dir, name), mode="w") as tar:
+            for item_id in chunk:
+                image_path, mask_path = sample_paths(data_path, phase, item_id)
+                tar.add(image_path, arcname=f"{item_id}.jpg")
+                tar.add(mask_path, arcname=f"{item_id}.png")
+        shards.append(name)
+        counts.append(len(chunk))
+        print(f"Packed {name}: {len(chunk)} samples")
+
+    with open(shard_index_path(shard_dir, phase), "w", encoding="utf-8") as f:
+        json.dump({"shards": shards, "counts": counts}, f)
+    return shards
+
+
+def iter_tar_samples(path: str) -> Iterator[Tuple[str, bytes, bytes]]:
+    """Последовательно читает шард и отдаёт (id, байты jpg, байты png)."""
+    pending = {}
+    with tarfile.open(path, mode="r|") as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            stem, ext = os.path.splitext(member.name)
+            pending.setdefault(stem, {})[ext] = tar.extractfile(member).read()
+            if len(pending[stem]) == 2:
+                sample = pending.pop(stem)
+                yield stem, sample[".jpg"], sample[".png"]
+
+
+class FloodNetShardDataset(IterableDataset):
+    """
+    Потоковый датасет FloodNet из tar-шардов, собранных pack_shards.
+
+    Шарды делятся между всеми воркерами DataLoader (и процессами DDP, если
+    он запущен) без пересечений; внутри каждого потока порядок шардов
+    перемешивается, а сэмплы перемешиваются в буфере размера shuffle_buffer.
+
+    С balance_ranks в DDP каждый процесс отдаёт ровно num_samples // world_size
+    сэмплов (шарды процесса при нехватке идут по кругу), чтобы у процессов
+    было одинаковое число шагов и синхронизация градиентов не зависала.
+
+    Порядок зависит от эпохи, заданной set_epoch (как у DistributedSampler):
+    номер эпохи лежит в shared memory, поэтому его видят и persistent-воркеры,
+    которые не пересоздаются и не пересевываются между эпохами.
+    """
+
+    def __init__(
+        self,
+        shard_dir: str,
+        phase: str,
+        img_size: int,
+        shuffle_buffer: int = 0,
+        compact: bool = False,
+        balance_ranks: bool = False,
+    ):
+        super().__init__()
+        self.num_classes = 8
+        self.compact = compact
+        self.shard_dir = shard_dir
+        self.phase = phase
+        self.img_size = img_size
+        self.shuffle_buffer = shuffle_buffer
+        self.balance_ranks = balance_ranks
+        self._epoch = torch.zeros((), dtype=torch.long).share_memory_()
+
+        with open(shard_index_path(shard_dir, phase), encoding="utf-8") as f:
+            index = json.load(f)
+        self.shards = index["shards"]
+        self.num_samples = sum(index["counts"])
+
+        self.transform = A.Compose(
+            [
+                A.CenterCrop(height=self.img_size, width=self.img_size),
+                ToTensor(),
+            ]
+        )
+
+    def set_epoch(self, epoch: int):
+        self._epoch.fill_(epoch)
+
+    @property
+    def epoch(self) -> int:
+        return int(self._epoch)
+
+    def __len__(self):
+        _, world_size = self._rank()
+        if self.balance_ranks:
+            return self.num_samples // world_size
+        return self.num_samples
+
+    @staticmethod
+    def _rank() -> Tuple[int, int]:
+        if dist.is_available() and dist.is_initialized():
+            return dist.get_rank(), dist.get_world_size()
+        return 0, 1
+
+    @staticmethod
+    def _worker() -> Tuple[int, int]:
+        worker = get_worker_info()
+        return (0, 1) if worker is None else (worker.id, worker.num_workers)
+
+    def _assigned_shards(self) -> List[str]:
+        rank, world_size = self._rank()
+        worker_id, num_workers = self._worker()
+        stream_id = rank * num_workers + worker_id
+        return self.shards[stream_id :: world_size * num_workers]
+
+    def _seed(self) -> str:
+        """Сид потока: базовый сид DataLoader, эпоха, процесс DDP и воркер."""
+        rank, _ = self._rank()
+        worker = get_worker_info()
+        # Сид воркера — base_seed + id; без воркеров — сид главного процесса
+        base_seed = torch.initial_seed() if worker is None else worker.seed - worker.id
+        worker_id = 0 if worker is None else worker.id
+        return f"{base_seed}:{self.epoch}:{rank}:{worker_id}"
+
+    def _quota(self) -> Optional[int]:
+        """Сколько сэмплов отдаёт этот воркер при balance_ranks (None — все свои)."""
+        _, world_size = self._rank()
+        if not self.balance_ranks or world_size == 1:
+            return None
+        worker_id, num_workers = self._worker()
+        per_rank = self.num_samples // world_size
+        return per_rank // num_workers + int(worker_id < per_rank % num_workers)
+
+    def _raw_samples(self, shards: List[str], rng: random.Random, repeat: bool):
+        while shards:
+            if self.shuffle_buffer > 0:
+                rng.shuffle(shards)
+            for name in shards:
+                for _, image_bytes, mask_bytes in iter_tar_samples(
+                    os.path.join(self.shard_dir, name)
+                ):
+                    yield image_bytes, mask_bytes
+            if not repeat:
+                return
+
+    def _decode(self, image_bytes: bytes, mask_bytes: bytes):
+        image = np.array(Image.open(io.BytesIO(image_bytes)).convert("RGB"))
+        mask = np.array(Image.open(io.BytesIO(mask_bytes)))
+
+        augmented = self.transform(image=image, mask=mask)
+        mask = augmented["mask"]
+        mask_dtype = torch.uint8 if self.compact else torch.long
+        if isinstance(mask, np.ndarray):
+            mask = torch.from_numpy(mask).to(mask_dtype)
+        else:
+            mask = mask.to(mask_dtype)
+        return augmented["image"], mask
+
+    def __iter__(self):
+        rng = random.Random(self._seed())
+        quota = self._quota()
+        shards = self._assigned_shards()
+        if quota is not None and not shards:
+            # Потоков больше, чем шардов: берём все шарды, лишь бы хватило шагов
+            shards = list(self.shards)
+        samples = self._shuffled(
+            self._raw_samples(shards, rng, repeat=quota is not None), rng
+        )
+        if quota is not None:
+            samples = itertools.islice(samples, quota)
+        for image_bytes, mask_bytes in samples:
+            yield self._decode(image_bytes, mask_bytes)
+
+    def _shuffled(self, samples, rng: random.Random):
+        """Перемешивание потока в буфере размера shuffle_buffer."""
+        if self.shuffle_buffer <= 0:
+            yield from samples
+            return
+        buffer = []
+        for sample in samples:
+            buffer.append(sample)
+            if len(buffer) >= self.shuffle_buffer:
+                i = rng.randrange(len(buffer))
+                buffer[i], buffer[-1] = buffer[-1], buffer[i]
+                yield buffer.pop()
+        rng.shuffle(buffer)
+        yield from buffer
+
+
+@hydra.main(version_base="1.3", config_path="../../configs", config_name="config")
+def main(cfg: DictConfig):
+    """Перепаковка data_dir/{train,test} в tar-шарды data.shards.dir."""
+    shards_cfg = cfg.data.shards
+    for phase in ("train", "test"):
+        pack_shards(
+            cfg.data.data_dir,
+            phase,
+            shards_cfg.dir,
+            samples_per_shard=shards_cfg.samples_per_shard,
+        )
+
+
+if __name__ == "__main__":
+    main()
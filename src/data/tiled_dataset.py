@@ -0,0 +1,194 @@
+import json
+import os
+import shutil
+from typing import Dict, List
+
+import numpy as np
+import torch
+from numpy.lib.format import open_memmap
+from PIL import Image
+from torch.utils.data import Dataset
+
+from .cache import list_items, sample_paths, source_fingerprint
+
+TILE_INDEX_VERSION = 1
+INDEX_NAME = "index.json"
+WINDOWS_NAME = "windows.npy"
+
+
+def tile_offsets(length: int, tile_size: int, stride: int) -> List[int]:
+    """
+    Начала окон вдоль одной оси. Последнее окно прижимается к краю,
+    чтобы каждый пиксель попал хотя бы в одно окно.
+    """
+    if length <= tile_size:
+        return [0]
+    offsets = list(range(0, length - tile_size + 1, stride))
+    if offsets[-1] + tile_size < length:
+        offsets.append(length - tile_size)
+    return offsets
+
+
+def tile_split_dir(index_root: str, phase: str, tile_size: int, overlap: int) -> str:
+    return os.path.join(index_root, f"{phase}_{tile_size}_{overlap}")
+
+
+def build_tile_index(
+    data_path: str,
+    phase: str,
+    tile_size: int,
+    overlap: int,
+    index_dir: str,
+    items: List[str],
+) -> Dict:
+    """
+    Один раз декодирует каждую сцену в несжатые .npy (картинка и маска),
+    из которых окна читаются через mmap без декодирования всей сцены,
+    и сохраняет индекс окон windows.npy: [N, 3] = (сцена, y, x).
+    """
+    stride = tile_size - overlap
+    if stride <= 0:
+        raise ValueError("overlap должен быть меньше tile_size")
+
+    tmp_dir = f"{index_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(os.path.join(tmp_dir, "scenes"))
+
+    print(f"Building tile index for '{phase}' ({len(items)} scenes) → {index_dir}")
+    windows = []
+    shapes = []
+    for scene_idx, item_id in enumerate(items):
+        image_path, mask_path = sample_paths(data_path, phase, item_id)
+        image = np.array(Image.open(image_path).convert("RGB"))
+        mask = np.array(Image.open(mask_path))
+        height, width = mask.shape
+
+        for name, array in (("image", image), ("mask", mask)):
+            path = os.path.join(tmp_dir, "scenes", f"{item_id}_{name}.npy")
+            out = open_memmap(path, mode="w+", dtype=np.uint8, shape=array.shape)
+            out[:] = array
+            out.flush()
+            del out
+
+        for y in tile_offsets(height, tile_size, stride):
+            for x in tile_offsets(width, tile_size, stride):
+                windows.append((scene_idx, y, x))
+        shapes.append([height, width])
+
+    np.save(
+        os.path.join(tmp_dir, WINDOWS_NAME),
+        np.asarray(windows, dtype=np.int32).reshape(-1, 3),
+    )
+    index = {
+        "version": TILE_INDEX_VERSION,
+        "phase": phase,
+        "tile_size": tile_size,
+        "overlap": overlap,
+        "fingerprint": source_fingerprint(
+            data_path, phase, items, tile_size=tile_size, overlap=overlap
+        ),
+        "items": items,
+        "shapes": shapes,
+    }
+    with open(os.path.join(tmp_dir, INDEX_NAME), "w", encoding="utf-8") as f:
+        json.dump(index, f)
+
+    shutil.rmtree(index_dir, ignore_errors=True)
+    os.replace(tmp_dir, index_dir)
+    return index
+
+
+def ensure_tile_index(
+    data_path: str, phase: str, tile_size: int, overlap: int, index_root: str
+) -> str:
+    """Возвращает папку с актуальным индексом окон, пересобирая его при изменениях."""
+    index_dir = tile_split_dir(index_root, phase, tile_size, overlap)
+    items = list_items(data_path, phase)
+    fingerprint = source_fingerprint(
+        data_path, phase, items, tile_size=tile_size, overlap=overlap
+    )
+
+    index_path = os.path.join(index_dir, INDEX_NAME)
+    index = None
+    if os.path.exists(index_path):
+        with open(index_path, encoding="utf-8") as f:
+            index = json.load(f)
+    if (
+        index is None
+        or index.get("version") != TILE_INDEX_VERSION
+        or index.get("fingerprint") != fingerprint
+    ):
+        build_tile_index(data_path, phase, tile_size, overlap, index_dir, items)
+    return index_dir
+
+
+class TiledFloodNetDataset(Dataset):
+    """
+    Датасет окон tile_size × tile_size по полноразмерным сценам FloodNet.
+
+    Окна идут с шагом tile_size - overlap и покрывают каждый пиксель сцены.
+    Сцены читаются через np.load(mmap_mode="r"), поэтому в память воркера
+    подгружаются только страницы нужного окна. Возвращает то же, что и
+    FloodNetDataset: картинку [3, T, T] и маску [T, T] (uint8 при compact=True).
+    """
+
+    def __init__(
+        self,
+        data_path: str,
+        phase: str,
+        tile_size: int,
+        overlap: int,
+        index_dir: str,
+        compact: bool = False,
+    ):
+        super().__init__()
+        self.num_classes = 8
+        self.compact = compact
+        self.phase = phase
+        self.tile_size = tile_size
+
+        self.split_dir = ensure_tile_index(
+            data_path, phase, tile_size, overlap, index_dir
+        )
+        with open(os.path.join(self.split_dir, INDEX_NAME), encoding="utf-8") as f:
+            index = json.load(f)
+        self.items = index["items"]
+        self.windows = np.load(os.path.join(self.split_dir, WINDOWS_NAME))
+        self._scenes = {}
+
+    def __len__(self):
+        return len(self.windows)
+
+    def _scene(self, scene_idx: int):
+        if scene_idx not in self._scenes:
+            item_id = self.items[scene_idx]
+            scene_dir = os.path.join(self.split_dir, "scenes")
+            self._scenes[scene_idx] = (
+                np.load(os.path.join(scene_dir, f"{item_id}_image.npy"), mmap_mode="r"),
+                np.load(os.path.join(scene_dir, f"{item_id}_mask.npy"), mmap_mode="r"),
+            )
+        return self._scenes[scene_idx]
+
+    def __getitem__(self, index):
+        scene_idx, y, x = (int(v) for v in self.windows[index])
+        image, mask = self._scene(scene_idx)
+        t = self.tile_size
+
+        # Сцены меньше окна дополняем нулями (фон)
+        tile_image = np.zeros((t, t, 3), dtype=np.uint8)
+        tile_mask = np.zeros((t, t), dtype=np.uint8)
+        window_image = image[y : y + t, x : x + t]
+        h, w = window_image.shape[:2]
+        tile_image[:h, :w] = window_image
+        tile_mask[:h, :w] = mask[y : y + t, x : x + t]
+
+        image = torch.from_numpy(tile_image.transpose(2, 0, 1).copy())
+        mask = torch.from_numpy(tile_mask)
+        if not self.compact:
+            mask = mask.long()
+        return image, mask
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_scenes"] = {}
+        return state
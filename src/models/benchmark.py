@@ -0,0 +1,107 @@
+# src/models/benchmark.py
+import time
+from typing import Dict
+
+import hydra
+import torch
+from omegaconf import DictConfig, OmegaConf
+from torch import nn
+from torch.utils.flop_counter import FlopCounterMode
+
+from ..utils.execution import train_step_stats
+from .unet_lightning import UNetLitModule
+from .unet_model import unet_from_config
+
+
+def count_parameters(model: nn.Module) -> int:
+    return sum(p.numel() for p in model.parameters())
+
+
+def count_flops(model: nn.Module, inputs: torch.Tensor) -> int:
+    """FLOPs одного прямого прохода (умножение + сложение считаются за 2)."""
+    counter = FlopCounterMode(display=False)
+    with torch.no_grad(), counter:
+        model(inputs)
+    return counter.get_total_flops()
+
+
+def measure_latency(
+    model: nn.Module, inputs: torch.Tensor, warmup: int = 3, iters: int = 10
+) -> float:
+    """Медианная задержка прямого прохода, мс."""
+    timings = []
+    with torch.inference_mode():
+        for step in range(warmup + iters):
+            start = time.perf_counter()
+            model(inputs)
+            if inputs.is_cuda:
+                torch.cuda.synchronize()
+            if step >= warmup:
+                timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def benchmark_variant(model_cfg: DictConfig, bench_cfg: DictConfig) -> Dict:
+    model = unet_from_config(model_cfg).eval()
+    inputs = torch.rand(bench_cfg.batch_size, 3, bench_cfg.img_size, bench_cfg.img_size)
+    return {
+        "params_m": count_parameters(model) / 1e6,
+        "gflops": count_flops(model, inputs) / 1e9,
+        "latency_ms": measure_latency(
+            model, inputs, warmup=bench_cfg.warmup, iters=bench_cfg.iters
+        ),
+    }
+
+
+def benchmark_train_variant(cfg: DictConfig, model_cfg: DictConfig) -> Dict:
+    """Время шага обучения и пик памяти (activation checkpointing влияет только тут)."""
+    train_cfg = cfg.benchmark.train_step
+    lit_model = UNetLitModule(OmegaConf.merge(cfg, {"model": model_cfg}))
+    use_cuda = cfg.trainer.accelerator == "gpu" and torch.cuda.is_available()
+    return train_step_stats(
+        lit_model,
+        batch_size=train_cfg.get("batch_size") or cfg.benchmark.batch_size,
+        img_size=cfg.benchmark.img_size,
+        device=torch.device("cuda" if use_cuda else "cpu"),
+        precision=cfg.trainer.precision,
+        steps=train_cfg.steps,
+        warmup=train_cfg.warmup,
+    )
+
+
+@hydra.main(version_base="1.3", config_path="../../configs", config_name="config")
+def main(cfg: DictConfig):
+    """
+    Параметры, FLOPs и задержка на CPU для вариантов архитектуры из
+    benchmark.variants; с train_step.enabled — ещё шаг обучения и пик памяти.
+    """
+    bench_cfg = cfg.benchmark
+    with_train = bench_cfg.get("train_step", {}).get("enabled", False)
+    if bench_cfg.get("threads"):
+        torch.set_num_threads(bench_cfg.threads)
+
+    print(
+        f"CPU, {torch.get_num_threads()} threads, input "
+        f"{bench_cfg.batch_size}x3x{bench_cfg.img_size}x{bench_cfg.img_size}"
+    )
+    header = f"{'variant':<24}{'params, M':>12}{'GFLOPs':>12}{'latency, ms':>14}"
+    if with_train:
+        header += f"{'train step, ms':>16}{'peak mem, MB':>14}"
+    print(header)
+    for variant in bench_cfg.variants:
+        overrides = {k: v for k, v in variant.items() if k != "name"}
+        model_cfg = OmegaConf.merge(cfg.model, overrides)
+        result = benchmark_variant(model_cfg, bench_cfg)
+        row = (
+            f"{variant.name:<24}{result['params_m']:>12.2f}"
+            f"{result['gflops']:>12.2f}{result['latency_ms']:>14.1f}"
+        )
+        if with_train:
+            train = benchmark_train_variant(cfg, model_cfg)
+            row += f"{train['step_ms']:>16.1f}{train['peak_mem_mb']:>14.1f}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+# src/models/distillation.py
+import hashlib
+import os
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from torch import nn
+
+from .unet_lightning import UNetLitModule
+
+
+def teacher_id(checkpoint_path: str) -> str:
+    """Идентификатор учителя для кэша: путь, размер и время изменения чекпоинта."""
+    stat = os.stat(checkpoint_path)
+    key = f"{os.path.abspath(checkpoint_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return hashlib.sha1(key.encode()).hexdigest()[:12]
+
+
+class TeacherLogitCache:
+    """
+    Дисковый кэш логитов учителя: ключ — sha1 байтов картинки, значение —
+    float16 .npy [C, H, W]. Совпадение ключа возможно только для той же
+    картинки (без случайных аугментаций), иначе логиты считаются заново.
+
+    LRU по mtime, как у ResultCache: попадание обновляет mtime файла,
+    evict() удаляет самые давно использованные записи сверх max_size_mb
+    (None — без ограничения).
+    """
+
+    def __init__(self, cache_dir: str, max_size_mb: Optional[float] = None):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size_bytes = None
+        if max_size_mb is not None:
+            self.max_size_bytes = int(max_size_mb * 2**20)
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    @staticmethod
+    def key(image: torch.Tensor) -> str:
+        data = image.detach().cpu().contiguous().numpy()
+        digest = hashlib.sha1(data.tobytes())
+        digest.update(f"{data.dtype}{data.shape}".encode())
+        return digest.hexdigest()
+
+    def path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.npy"
+
+    def get_or_compute(
+        self, images: torch.Tensor, compute: Callable[[torch.Tensor], torch.Tensor]
+    ) -> torch.Tensor:
+        """Логиты [B, C, H, W]: из кэша, а для промахов — одним батчем через compute."""
+        keys = [self.key(image) for image in images]
+        cached = {}
+        for i, key in enumerate(keys):
+            path = self.path(key)
+            try:
+                cached[i] = torch.from_numpy(np.load(path))
+            except (ValueError, OSError):
+                # Нет записи или она повреждена — считаем заново
+                continue
+            os.utime(path)
+        missing = [i for i in range(len(keys)) if i not in cached]
+        self.hits += len(cached)
+        self.misses += len(missing)
+
+        computed = {}
+        if missing:
+            logits = compute(images[missing])
+            for i, sample in zip(missing, logits):
+                computed[i] = sample
+                self.save(keys[i], sample)
+
+        device = images.device
+        return torch.stack(
+            [
+                computed[i] if i in computed else cached[i].to(device)
+                for i in range(len(keys))
+            ]
+        ).float()
+
+    def save(self, key: str, logits: torch.Tensor):
+        path = self.path(key)
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_name(path.name + f".{os.getpid()}.tmp.npy")
+        np.save(tmp, logits.detach().to(torch.float16).cpu().numpy())
+        os.replace(tmp, path)
+
+    def evict(self) -> int:
+        """Удаляет самые давно использованные записи сверх max_size_mb."""
+        if self.max_size_bytes is None:
+            return 0
+        entries = []
+        for path in self.cache_dir.glob("*/*.npy"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_size_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        self.evicted += removed
+        return removed
+
+
+def block_channels(model: nn.Module, name: str) -> int:
+    """Число выходных каналов блока UNet по его имени."""
+    if name == "bottleneck":
+        return model.channels[-1]
+    if name.startswith("enc_conv"):
+        return model.channels[int(name[len("enc_conv") :]) - 1]
+    if name.startswith("dec_conv"):
+        return model.channels[model.depth - int(name[len("dec_conv") :])]
+    raise ValueError(f"Неизвестный блок для feature-дистилляции: {name}")
+
+
+def kd_loss(
+    student_logits: torch.Tensor, teacher_logits: torch.Tensor, temperature: float
+) -> torch.Tensor:
+    """KL(teacher || student) по классам на пиксель, × T² (Hinton et al.)."""
+    log_student = F.log_softmax(student_logits / temperature, dim=1)
+    log_teacher = F.log_softmax(teacher_logits / temperature, dim=1)
+    kl = F.kl_div(log_student, log_teacher, log_target=True, reduction="none")
+    return kl.sum(dim=1).mean() * temperature**2
+
+
+class DistillationLitModule(UNetLitModule):
+    """
+    Обучение студента (UNet из cfg.model) под присмотром замороженного учителя
+    (чекпоинт UNetLitModule из cfg.distill.teacher_checkpoint):
+
+      loss = (1 - alpha) * CE + alpha * KD(T) + feature_weight * MSE(features)
+
+    Учитель не попадает в чекпоинт: сохраняется обычный UNetLitModule-чекпоинт
+    студента, который загружается UNetLitModule.load_from_checkpoint.
+    """
+
+    # При продолжении обучения в чекпоинте нет учителя и адаптера
+    strict_loading = False
+
+    def __init__(self, cfg: dict):
+        super().__init__(cfg)
+        distill = cfg["distill"]
+        self.alpha = distill.get("alpha", 0.5)
+        self.temperature = distill.get("temperature", 2.0)
+        self.feature_weight = distill.get("feature_weight", 0.0)
+
+        self.teacher = UNetLitModule.load_from_checkpoint(
+            distill["teacher_checkpoint"], map_location="cpu", weights_only=False
+        )
+        self.teacher.freeze()
+
+        cache_dir = distill.get("cache_dir")
+        if cache_dir and self.feature_weight > 0:
+            raise ValueError(
+                "Кэш логитов учителя несовместим с feature-дистилляцией "
+                "(признаки учителя не кэшируются)"
+            )
+        gpu_augment = cfg.get("data", {}).get("gpu_augment") or {}
+        if cache_dir and gpu_augment.get("enabled", False):
+            # Ключ — хэш аугментированной картинки: случайный кроп каждый раз
+            # новый, кэш только промахивался бы и рос
+            raise ValueError(
+                "Кэш логитов учителя несовместим со случайными аугментациями "
+                "(data.gpu_augment.enabled)"
+            )
+        self.logit_cache = None
+        if cache_dir:
+            cache_dir = os.path.join(
+                cache_dir, teacher_id(distill["teacher_checkpoint"])
+            )
+            self.logit_cache = TeacherLogitCache(
+                cache_dir, distill.get("cache_max_size_mb")
+            )
+
+        # Feature-дистилляция: выход блока feature_layer студента через 1×1
+        # адаптер приводится к числу каналов того же блока учителя
+        self.feature_layer: Optional[str] = None
+        self._features = {}
+        if self.feature_weight > 0:
+            self.feature_layer = distill.get("feature_layer", "bottleneck")
+            self.feature_adapter = nn.Conv2d(
+                block_channels(self.model, self.feature_layer),
+                block_channels(self.teacher.model, self.feature_layer),
+                kernel_size=1,
+            )
+            for role, net in (("student", self.model), ("teacher", self.teacher.model)):
+                getattr(net, self.feature_layer).register_forward_hook(
+                    self._feature_hook(role)
+                )
+
+    def _feature_hook(self, role: str):
+        def hook(module, inputs, output):
+            self._features[role] = output
+
+        return hook
+
+    def train(self, mode: bool = True):
+        # Учитель всегда в eval: BN на его статистиках, без dropout
+        super().train(mode)
+        self.teacher.eval()
+        return self
+
+    def teacher_logits(self, images: torch.Tensor) -> torch.Tensor:
+        with torch.no_grad():
+            if self.logit_cache is not None:
+                return self.logit_cache.get_or_compute(images, self.teacher)
+            return self.teacher(images).float()
+
+    def configure_optimizers(self):
+        params = [p for p in self.parameters() if p.requires_grad]
+        return torch.optim.Adam(params, lr=self.lr)
+
+    def training_step(self, batch, batch_idx):
+        images, masks = batch
+        masks = masks.long()
+        logits = self(images)
+        teacher_logits = self.teacher_logits(images)
+
+        ce = self.criterion(logits, masks)
+        kd = kd_loss(logits.float(), teacher_logits, self.temperature)
+        loss = (1 - self.alpha) * ce + self.alpha * kd
+        self.log("train_ce", ce, on_step=True, on_epoch=False)
+        self.log("train_kd", kd, on_step=True, on_epoch=False)
+
+        if self.feature_layer is not None:
+            student_feat = self.feature_adapter(self._features["student"])
+            teacher_feat = self._features["teacher"]
+            if student_feat.shape[-2:] != teacher_feat.shape[-2:]:
+                student_feat = F.interpolate(
+                    student_feat, size=teacher_feat.shape[-2:], mode="bilinear"
+                )
+            feat = F.mse_loss(student_feat, teacher_feat)
+            loss = loss + self.feature_weight * feat
+            self.log("train_feat", feat, on_step=True, on_epoch=False)
+
+        self.log("train_loss", loss, on_step=True, on_epoch=False, prog_bar=True)
+        return loss
+
+    def on_train_epoch_end(self):
+        if self.logit_cache is not None:
+            self.log("teacher_cache_hits", float(self.logit_cache.hits))
+            self.log("teacher_cache_misses", float(self.logit_cache.misses))
+            self.logit_cache.hits = self.logit_cache.misses = 0
+            self.logit_cache.evict()
+
+    def on_save_checkpoint(self, checkpoint):
+        # В чекпоинт — только студент, как у обычного UNetLitModule
+        checkpoint["state_dict"] = {
+            k: v
+            for k, v in checkpoint["state_dict"].items()
+            if not k.startswith(("teacher.", "feature_adapter."))
+        }
@@ -0,0 +1,207 @@
+# src/models/export.py
+import copy
+import json
+from pathlib import Path
+from typing import Dict, List
+
+import hydra
+import torch
+from omegaconf import DictConfig, OmegaConf
+from torch import nn
+from torch.nn.utils.fusion import fuse_conv_bn_eval
+
+from .benchmark import measure_latency
+from .runtime import load_predictor, metadata_path
+from .unet_lightning import UNetLitModule
+
+
+def fold_conv_bn(model: nn.Module) -> nn.Module:
+    """
+    Вливает BatchNorm в предшествующую свёртку во всех nn.Sequential модели
+    (блоки DownBlock/UpBlock/BottleNeck/InvertedResidual). BN заменяется на
+    Identity, индексы слоёв не меняются. Возвращает копию в режиме eval.
+    """
+    model = copy.deepcopy(model).eval()
+    for module in model.modules():
+        if not isinstance(module, nn.Sequential):
+            continue
+        for i in range(len(module) - 1):
+            conv, bn = module[i], module[i + 1]
+            if isinstance(conv, nn.Conv2d) and isinstance(bn, nn.BatchNorm2d):
+                module[i] = fuse_conv_bn_eval(conv, bn)
+                module[i + 1] = nn.Identity()
+    return model
+
+
+class ExportWrapper(nn.Module):
+    """
+    Граф для экспорта: float-картинки 0..255 → нормализация входа → UNet → логиты.
+    Так артефакту не нужен UNetLitModule.
+    """
+
+    def __init__(self, model: nn.Module, mean=None, std=None):
+        super().__init__()
+        self.model = model
+        self.normalize_input = mean is not None and std is not None
+        if self.normalize_input:
+            self.register_buffer("input_mean", mean.detach().clone())
+            self.register_buffer("input_std", std.detach().clone())
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        if self.normalize_input:
+            x = (x - self.input_mean) / self.input_std
+        return self.model(x)
+
+
+def export_wrapper(lit_model: UNetLitModule, fold_bn: bool = True) -> ExportWrapper:
+    model = fold_conv_bn(lit_model.model) if fold_bn else lit_model.model
+    mean = getattr(lit_model, "input_mean", None)
+    std = getattr(lit_model, "input_std", None)
+    return ExportWrapper(model, mean, std).eval()
+
+
+def write_metadata(path: Path, metadata: Dict):
+    with open(metadata_path(path), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+
+
+def export_torchscript(
+    wrapper: nn.Module, example: torch.Tensor, path: Path, metadata: Dict
+):
+    with torch.no_grad():
+        scripted = torch.jit.trace(wrapper, example)
+    scripted.save(str(path))
+    write_metadata(path, {**metadata, "format": "torchscript"})
+
+
+def export_onnx(
+    wrapper: nn.Module, example: torch.Tensor, path: Path, metadata: Dict, opset: int
+):
+    """
+    ONNX с динамической размерностью батча; нужен пакет onnx.
+    TorchScript-экспортёр (dynamo=False) не требует onnxscript.
+    """
+    torch.onnx.export(
+        wrapper,
+        (example,),
+        str(path),
+        input_names=["images"],
+        output_names=["logits"],
+        dynamic_axes={"images": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=opset,
+        dynamo=False,
+    )
+    write_metadata(path, {**metadata, "format": "onnx"})
+
+
+def onnx_available() -> bool:
+    try:
+        import onnx  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def parity_check(reference, candidate, inputs: torch.Tensor) -> Dict:
+    """Максимальное расхождение логитов и доля пикселей с тем же argmax."""
+    with torch.inference_mode():
+        expected = reference(inputs)
+        actual = candidate(inputs).to(expected.device)
+    return {
+        "max_abs_diff": (expected - actual).abs().max().item(),
+        "argmax_agreement": (expected.argmax(1) == actual.argmax(1))
+        .float()
+        .mean()
+        .item(),
+    }
+
+
+def export_model(cfg: DictConfig) -> List[Path]:
+    """
+    Экспорт чекпоинта cfg.export.checkpoint в форматы cfg.export.formats,
+    проверка совпадения с исходной моделью и сравнение задержки.
+    """
+    export_cfg = cfg.export
+    out_dir = Path(export_cfg.output_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    # hparams чекпоинта — DictConfig, который не проходит weights_only-загрузку
+    lit_model = UNetLitModule.load_from_checkpoint(
+        export_cfg.checkpoint, weights_only=False
+    )
+    lit_model = lit_model.to("cpu").eval()
+    wrapper = export_wrapper(lit_model, fold_bn=export_cfg.fold_bn)
+
+    img_size = export_cfg.img_size
+    example = torch.randint(
+        0, 256, (export_cfg.batch_size, 3, img_size, img_size)
+    ).float()
+    metadata = {
+        "checkpoint": str(export_cfg.checkpoint),
+        "img_size": img_size,
+        "num_classes": lit_model.num_classes,
+        "input_mode": lit_model.model.input_mode,
+        "fold_bn": export_cfg.fold_bn,
+    }
+
+    artifacts = []
+    for fmt in export_cfg.formats:
+        if fmt == "torchscript":
+            path = out_dir / f"{export_cfg.name}.pt"
+            export_torchscript(wrapper, example, path, metadata)
+        elif fmt == "onnx":
+            if not onnx_available():
+                print("Warning: onnx is not installed, skipping ONNX export")
+                continue
+            path = out_dir / f"{export_cfg.name}.onnx"
+            export_onnx(wrapper, example, path, metadata, export_cfg.opset)
+        else:
+            raise ValueError(f"Неизвестный формат экспорта: {fmt}")
+        artifacts.append(path)
+        print(f"Exported {fmt} → {path}")
+
+    report_parity_and_latency(lit_model, wrapper, artifacts, example, export_cfg)
+    return artifacts
+
+
+def report_parity_and_latency(
+    lit_model: UNetLitModule,
+    wrapper: nn.Module,
+    artifacts: List[Path],
+    inputs: torch.Tensor,
+    export_cfg: DictConfig,
+):
+    """Сравнение с исходной моделью (BN eager): расхождение логитов и задержка."""
+    candidates = {"folded eager": wrapper}
+    for path in artifacts:
+        try:
+            candidates[path.name] = load_predictor(path)
+        except ImportError as e:
+            print(f"Warning: {e}; skipping checks for {path.name}")
+
+    bench = dict(warmup=export_cfg.warmup, iters=export_cfg.iters)
+    base_ms = measure_latency(lit_model, inputs, **bench)
+    print(f"{'model':<24}{'max |diff|':>12}{'argmax agree':>14}{'latency, ms':>14}")
+    print(f"{'lightning (BN eager)':<24}{'-':>12}{'-':>14}{base_ms:>14.1f}")
+    for name, candidate in candidates.items():
+        parity = parity_check(lit_model, candidate, inputs)
+        latency = measure_latency(candidate, inputs, **bench)
+        print(
+            f"{name:<24}{parity['max_abs_diff']:>12.2e}"
+            f"{parity['argmax_agreement']:>14.4f}{latency:>14.1f}"
+        )
+        if parity["max_abs_diff"] > export_cfg.atol:
+            raise ValueError(
+                f"{name}: расхождение с исходной моделью "
+                f"{parity['max_abs_diff']:.2e} больше atol={export_cfg.atol}"
+            )
+
+
+@hydra.main(version_base="1.3", config_path="../../configs", config_name="config")
+def main(cfg: DictConfig):
+    print(OmegaConf.to_yaml(cfg.export))
+    export_model(cfg)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+# src/models/prune.py
+import copy
+from pathlib import Path
+from typing import Dict, List
+
+import hydra
+import torch
+from omegaconf import DictConfig, OmegaConf
+from pytorch_lightning import Trainer
+from torch import nn
+
+from ..data.datamodule import FloodNetDataModule
+from .benchmark import count_flops, count_parameters, measure_latency
+from .unet_lightning import UNetLitModule
+from .unet_model import UNet
+
+
+def top_channels(scores: torch.Tensor, keep: int) -> torch.Tensor:
+    """Индексы keep каналов с наибольшей важностью, в исходном порядке."""
+    return torch.argsort(scores, descending=True)[:keep].sort().values
+
+
+def copy_conv(dst: nn.Module, src: nn.Module, out_idx, in_idx):
+    """Conv2d: веса [out, in, k, k]; ConvTranspose2d: [in, out, k, k]."""
+    weight = src.weight
+    if isinstance(src, nn.ConvTranspose2d):
+        weight = weight[in_idx][:, out_idx]
+    else:
+        weight = weight[out_idx][:, in_idx]
+    dst.weight.copy_(weight)
+    if src.bias is not None:
+        dst.bias.copy_(src.bias[out_idx])
+
+
+def copy_bn(dst: nn.BatchNorm2d, src: nn.BatchNorm2d, idx):
+    for name in ("weight", "bias", "running_mean", "running_var"):
+        getattr(dst, name).copy_(getattr(src, name)[idx])
+    dst.num_batches_tracked.copy_(src.num_batches_tracked)
+
+
+def prune_block(dst: nn.Module, src: nn.Module, in_idx, keep: int) -> torch.Tensor:
+    """
+    Стандартный блок conv → BN → ReLU → conv → BN → ReLU: оба выхода режутся
+    до keep каналов по |gamma| своего BN. Возвращает индексы выхода блока.
+    """
+    conv_a, bn_a, conv_b, bn_b = (src.layer[i] for i in (0, 1, 3, 4))
+    mid_idx = top_channels(bn_a.weight.abs(), keep)
+    out_idx = top_channels(bn_b.weight.abs(), keep)
+    copy_conv(dst.layer[0], conv_a, mid_idx, in_idx)
+    copy_bn(dst.layer[1], bn_a, mid_idx)
+    copy_conv(dst.layer[3], conv_b, out_idx, mid_idx)
+    copy_bn(dst.layer[4], bn_b, out_idx)
+    return out_idx
+
+
+def pruned_channels(
+    channels: List[int], original: List[int], ratio: float, min_channels: int
+) -> List[int]:
+    """Ширина уровней после удаления доли ratio от исходной ширины original."""
+    return [
+        min(current, max(min_channels, int(round(orig * (1 - ratio)))))
+        for current, orig in zip(channels, original)
+    ]
+
+
+@torch.no_grad()
+def prune_unet(model: UNet, channels: List[int]) -> UNet:
+    """
+    Физически уменьшает UNet до ширины channels (одна на уровень).
+
+    Важность каналов: |gamma| BatchNorm после свёртки, для transposed conv
+    (без BN) — L1-норма весов выходного канала. На входе dec_conv каналы
+    конкатенации [апсемплинг, skip] режутся по тем же индексам, что и
+    выходы transpose_conv и энкодера, поэтому формы skip-связей совпадают.
+    """
+    if model.block_type != "standard":
+        raise ValueError(
+            f"Прунинг поддерживается только для block_type=standard, "
+            f"а не {model.block_type}"
+        )
+    if len(channels) != len(model.channels):
+        raise ValueError("Длина channels должна совпадать с глубиной модели + 1")
+
+    pruned = UNet(
+        num_classes=model.num_classes,
+        input_mode=model.input_mode,
+        block_type=model.block_type,
+        channels=channels,
+    )
+
+    # Encoder
+    prev_idx = torch.arange(3)
+    skips = []
+    for i in range(1, model.depth + 1):
+        name = f"enc_conv{i}"
+        prev_idx = prune_block(
+            getattr(pruned, name), getattr(model, name), prev_idx, channels[i - 1]
+        )
+        skips.append(prev_idx)
+
+    prev_idx = prune_block(pruned.bottleneck, model.bottleneck, prev_idx, channels[-1])
+
+    # Decoder: вход dec_conv — concat [up (C_l каналов), skip (C_l каналов)]
+    for i in range(1, model.depth + 1):
+        level = model.depth - i
+        tconv = getattr(model, f"transpose_conv{i}")
+        up_idx = top_channels(tconv.weight.abs().sum(dim=(0, 2, 3)), channels[level])
+        copy_conv(getattr(pruned, f"transpose_conv{i}"), tconv, up_idx, prev_idx)
+
+        skip_idx = skips.pop()
+        cat_idx = torch.cat([up_idx, model.channels[level] + skip_idx])
+        name = f"dec_conv{i}"
+        prev_idx = prune_block(
+            getattr(pruned, name), getattr(model, name), cat_idx, channels[level]
+        )
+
+    copy_conv(
+        pruned.final_conv, model.final_conv, torch.arange(model.num_classes), prev_idx
+    )
+    pruned.set_activation_checkpointing(
+        [name for name in model.block_names() if getattr(model, name).use_checkpoint]
+    )
+    return pruned
+
+
+def pruned_lit_module(lit_model: UNetLitModule, channels: List[int]) -> UNetLitModule:
+    """UNetLitModule с model.channels=channels и перенесёнными весами."""
+    cfg = OmegaConf.merge(
+        OmegaConf.create(dict(lit_model.hparams)), {"model": {"channels": channels}}
+    )
+    pruned = UNetLitModule(cfg)
+    pruned.model.load_state_dict(prune_unet(lit_model.model, channels).state_dict())
+    return pruned
+
+
+def model_cost(model: nn.Module, prune_cfg: DictConfig) -> Dict:
+    inputs = torch.rand(1, 3, prune_cfg.img_size, prune_cfg.img_size)
+    # Копия: Lightning сохраняет train/eval-режим модулей между fit и validate
+    model = copy.deepcopy(model).eval()
+    return {
+        "params_m": count_parameters(model) / 1e6,
+        "gflops": count_flops(model, inputs) / 1e9,
+        "latency_ms": measure_latency(
+            model, inputs, warmup=prune_cfg.warmup, iters=prune_cfg.iters
+        ),
+    }
+
+
+def validate_miou(trainer: Trainer, lit_model, dm) -> float:
+    (metrics,) = trainer.validate(lit_model, datamodule=dm, verbose=False)
+    return metrics["val_mIoU"]
+
+
+def make_trainer(cfg: DictConfig, max_epochs: int) -> Trainer:
+    return Trainer(
+        max_epochs=max_epochs,
+        accelerator=cfg.trainer.accelerator,
+        devices=cfg.trainer.devices,
+        precision=cfg.trainer.precision,
+        default_root_dir=cfg.prune.output_dir,
+        logger=False,
+        enable_checkpointing=False,
+        enable_progress_bar=False,
+    )
+
+
+@hydra.main(version_base="1.3", config_path="../../configs", config_name="config")
+def main(cfg: DictConfig):
+    """
+    Итеративный прунинг: на каждом уровне из prune.ratios модель предыдущего
+    уровня урезается до нужной ширины, дообучается prune.finetune_epochs эпох
+    и сохраняется чекпоинтом (с model.channels в гиперпараметрах).
+    """
+    prune_cfg = cfg.prune
+    out_dir = Path(prune_cfg.output_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    dm = FloodNetDataModule(
+        data_dir=cfg.data.data_dir,
+        img_size=cfg.data.img_size,
+        batch_size=cfg.data.batch_size,
+        num_workers=cfg.data.num_workers,
+        pin_memory=cfg.data.pin_memory,
+        persistent_workers=cfg.data.get("persistent_workers", False),
+        prefetch_factor=cfg.data.get("prefetch_factor"),
+        cache_dir=cfg.data.get("cache_dir"),
+        compact=cfg.data.get("compact", False),
+        gpu_augment=cfg.data.get("gpu_augment"),
+    )
+    dm.prepare_data()
+    dm.setup()
+
+    lit_model = UNetLitModule.load_from_checkpoint(
+        prune_cfg.checkpoint, weights_only=False
+    )
+    original = list(lit_model.model.channels)
+    eval_trainer = make_trainer(cfg, prune_cfg.finetune_epochs)
+    rows = [
+        {
+            "ratio": 0.0,
+            "channels": original,
+            **model_cost(lit_model.model, prune_cfg),
+            "miou_pruned": validate_miou(eval_trainer, lit_model, dm),
+        }
+    ]
+    rows[0]["miou_finetuned"] = rows[0]["miou_pruned"]
+
+    for ratio in prune_cfg.ratios:
+        channels = pruned_channels(
+            lit_model.model.channels, original, ratio, prune_cfg.min_channels
+        )
+        lit_model = pruned_lit_module(lit_model, channels)
+        row = {"ratio": ratio, "channels": channels}
+        row.update(model_cost(lit_model.model, prune_cfg))
+        row["miou_pruned"] = validate_miou(eval_trainer, lit_model, dm)
+
+        trainer = make_trainer(cfg, prune_cfg.finetune_epochs)
+        trainer.fit(lit_model, datamodule=dm)
+        row["miou_finetuned"] = validate_miou(trainer, lit_model, dm)
+
+        ckpt_path = out_dir / f"unet_pruned_{int(ratio * 100)}.ckpt"
+        trainer.save_checkpoint(ckpt_path)
+        print(f"Saved {channels} → {ckpt_path}")
+        rows.append(row)
+
+    print(
+        f"{'ratio':>6}{'params, M':>12}{'GFLOPs':>10}{'latency, ms':>14}"
+        f"{'mIoU pruned':>14}{'mIoU tuned':>13}  channels"
+    )
+    for row in rows:
+        print(
+            f"{row['ratio']:>6.2f}{row['params_m']:>12.2f}{row['gflops']:>10.2f}"
+            f"{row['latency_ms']:>14.1f}{row['miou_pruned']:>14.4f}"
+            f"{row['miou_finetuned']:>13.4f}  {row['channels']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
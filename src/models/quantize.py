@@ -0,0 +1,164 @@
+# src/models/quantize.py
+import copy
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import hydra
+import torch
+from omegaconf import DictConfig, OmegaConf
+from torch import nn
+from torch.ao.quantization import get_default_qconfig_mapping
+from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+from torch.utils.data import DataLoader, Subset
+
+from ..data.dataset import FloodNetDataset
+from .benchmark import measure_latency
+from .export import export_torchscript
+from .unet_lightning import UNetLitModule, calc_val_data, calc_val_loss
+
+
+class UNetFeatures(nn.Module):
+    """
+    Нормализация входа + encoder-decoder UNet без паддинга/кропа: такой граф
+    целиком трассируется FX (конкатенации skip-связей, transposed conv).
+    Сторона входа должна делиться на size_divisor.
+    """
+
+    def __init__(self, model: nn.Module, mean=None, std=None):
+        super().__init__()
+        self.model = model
+        self.normalize_input = mean is not None and std is not None
+        if self.normalize_input:
+            self.register_buffer("input_mean", mean.detach().clone())
+            self.register_buffer("input_std", std.detach().clone())
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        if self.normalize_input:
+            x = (x - self.input_mean) / self.input_std
+        return self.model.forward_features(x)
+
+
+def features_module(lit_model: UNetLitModule) -> UNetFeatures:
+    return UNetFeatures(
+        copy.deepcopy(lit_model.model),
+        getattr(lit_model, "input_mean", None),
+        getattr(lit_model, "input_std", None),
+    ).eval()
+
+
+def quantize_static(
+    model: nn.Module, calib_loader: DataLoader, backend: str = "x86"
+) -> nn.Module:
+    """
+    Post-training static INT8 квантизация (FX graph mode): Conv+BN+ReLU
+    сливаются, наблюдатели собирают диапазоны активаций на calib_loader,
+    затем модель конвертируется в квантованные ядра backend.
+    """
+    torch.backends.quantized.engine = backend
+    example = next(iter(calib_loader))[0].float()
+    prepared = prepare_fx(
+        copy.deepcopy(model).eval(), get_default_qconfig_mapping(backend), (example,)
+    )
+    with torch.inference_mode():
+        for images, _ in calib_loader:
+            prepared(images.float())
+    return convert_fx(prepared)
+
+
+def subset_loader(
+    cfg: DictConfig,
+    phase: str,
+    num_samples,
+    batch_size: int,
+    seed: int,
+    img_size: Optional[int] = None,
+) -> DataLoader:
+    """
+    Случайное подмножество FloodNetDataset без аугментаций (None — весь сплит).
+    img_size по умолчанию — quantize.img_size.
+    """
+    dataset = FloodNetDataset(
+        data_path=cfg.data.data_dir,
+        phase=phase,
+        img_size=img_size or cfg.quantize.img_size,
+        cache_dir=cfg.data.get("cache_dir"),
+        compact=cfg.data.get("compact", False),
+    )
+    if num_samples is not None and num_samples < len(dataset):
+        generator = torch.Generator().manual_seed(seed)
+        indices = torch.randperm(len(dataset), generator=generator)[:num_samples]
+        dataset = Subset(dataset, indices.tolist())
+    return DataLoader(dataset, batch_size=batch_size, shuffle=False)
+
+
+def evaluate(model: Callable, loader: DataLoader, num_classes: int) -> Dict:
+    """mIoU / mRecall / mAcc через calc_val_data / calc_val_loss."""
+    confusion = torch.zeros(num_classes, num_classes, dtype=torch.long)
+    with torch.inference_mode():
+        for images, masks in loader:
+            confusion += calc_val_data(model(images.float()), masks, num_classes)
+    mean_iou, mean_recall, mean_acc = calc_val_loss(confusion)
+    return {"mIoU": mean_iou, "mRecall": mean_recall, "mAcc": mean_acc}
+
+
+def run_quantization(cfg: DictConfig) -> Path:
+    q_cfg = cfg.quantize
+    lit_model = UNetLitModule.load_from_checkpoint(q_cfg.checkpoint, weights_only=False)
+    lit_model = lit_model.to("cpu").eval()
+    if q_cfg.img_size % lit_model.model.size_divisor:
+        raise ValueError(
+            f"quantize.img_size={q_cfg.img_size} должен делиться на "
+            f"{lit_model.model.size_divisor}"
+        )
+
+    fp32 = features_module(lit_model)
+    calib_loader = subset_loader(
+        cfg, "train", q_cfg.calibration_samples, q_cfg.batch_size, cfg.seed
+    )
+    int8 = quantize_static(fp32, calib_loader, q_cfg.backend)
+
+    eval_loader = subset_loader(cfg, "test", q_cfg.eval_samples, 1, cfg.seed)
+    inputs = next(iter(eval_loader))[0].float()
+    bench = dict(warmup=q_cfg.warmup, iters=q_cfg.iters)
+    report = {}
+    for name, model in (("fp32", fp32), ("int8", int8)):
+        report[name] = evaluate(model, eval_loader, lit_model.num_classes)
+        report[name]["latency_ms"] = measure_latency(model, inputs, **bench)
+
+    print(f"{'model':<8}{'mIoU':>10}{'mRecall':>10}{'mAcc':>10}{'latency, ms':>14}")
+    for name, r in report.items():
+        print(
+            f"{name:<8}{r['mIoU']:>10.4f}{r['mRecall']:>10.4f}"
+            f"{r['mAcc']:>10.4f}{r['latency_ms']:>14.1f}"
+        )
+    print(
+        f"mIoU drop: {report['fp32']['mIoU'] - report['int8']['mIoU']:.4f}, "
+        f"speedup: x{report['fp32']['latency_ms'] / report['int8']['latency_ms']:.2f}"
+    )
+
+    output = Path(q_cfg.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    export_torchscript(
+        int8,
+        inputs,
+        output,
+        {
+            "checkpoint": str(q_cfg.checkpoint),
+            "img_size": q_cfg.img_size,
+            "num_classes": lit_model.num_classes,
+            "quantization": "int8-static",
+            "quantized_engine": q_cfg.backend,
+        },
+    )
+    print(f"Saved INT8 model → {output}")
+    return output
+
+
+@hydra.main(version_base="1.3", config_path="../../configs", config_name="config")
+def main(cfg: DictConfig):
+    print(OmegaConf.to_yaml(cfg.quantize))
+    run_quantization(cfg)
+
+
+if __name__ == "__main__":
+    main()
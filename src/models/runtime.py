@@ -0,0 +1,157 @@
+# src/models/runtime.py
+"""
+Инференс из экспортированного артефакта (TorchScript .pt или ONNX .onnx)
+без Lightning и Hydra: только torch, numpy и (для ONNX) onnxruntime.
+
+Артефакт принимает float32-картинки [B, 3, S, S] со значениями 0..255
+(нормализация входа зашита в граф) и возвращает логиты [B, C, S, S].
+Рядом лежит {artifact}.json с метаданными экспорта.
+
+S фиксирован при экспорте (metadata["img_size"]): трассировка зашивает ветку
+pad/resize UNet.forward для этого размера, и на другом размере артефакт
+молча давал бы неверные маски, поэтому предикторы такой вход отвергают.
+"""
+import argparse
+import json
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Union
+
+import numpy as np
+import torch
+
+TORCHSCRIPT_SUFFIXES = (".pt", ".ts")
+ONNX_SUFFIXES = (".onnx",)
+ARTIFACT_SUFFIXES = TORCHSCRIPT_SUFFIXES + ONNX_SUFFIXES
+
+
+def metadata_path(path: Union[str, Path]) -> Path:
+    path = Path(path)
+    return path.with_name(path.name + ".json")
+
+
+def read_metadata(path: Union[str, Path]) -> Dict:
+    meta_path = metadata_path(path)
+    if not meta_path.exists():
+        return {}
+    with open(meta_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def is_artifact(path: Union[str, Path]) -> bool:
+    return Path(path).suffix in ARTIFACT_SUFFIXES
+
+
+class Predictor(ABC):
+    """Общий интерфейс: __call__ — логиты, predict — маски классов."""
+
+    def __init__(self, path: Union[str, Path], device: Union[str, torch.device]):
+        self.path = Path(path)
+        self.device = torch.device(device)
+        self.metadata = read_metadata(path)
+        self.img_size = self.metadata.get("img_size")
+        self.num_classes = self.metadata.get("num_classes")
+
+    @abstractmethod
+    def __call__(self, images: torch.Tensor) -> torch.Tensor:
+        """Логиты [B, C, S, S] для uint8-батча [B, 3, S, S]."""
+
+    def check_size(self, images: torch.Tensor):
+        size = tuple(images.shape[-2:])
+        if self.img_size is not None and size != (self.img_size, self.img_size):
+            raise ValueError(
+                f"Артефакт {self.path.name} экспортирован для входа "
+                f"{self.img_size}×{self.img_size}, получен {size[0]}×{size[1]}"
+            )
+
+    def predict(self, images: torch.Tensor) -> torch.Tensor:
+        """images: [B, 3, S, S] (uint8 или float 0..255) → маски [B, S, S] uint8."""
+        return torch.argmax(self(images), dim=1).to(torch.uint8)
+
+
+class TorchScriptPredictor(Predictor):
+    def __init__(self, path, device="cpu"):
+        super().__init__(path, device)
+        # INT8-модели (src/models/quantize.py) исполняются квантованными ядрами
+        engine = self.metadata.get("quantized_engine")
+        if engine is not None:
+            torch.backends.quantized.engine = engine
+        self.module = torch.jit.load(str(path), map_location=self.device).eval()
+
+    @torch.inference_mode()
+    def __call__(self, images: torch.Tensor) -> torch.Tensor:
+        self.check_size(images)
+        return self.module(images.to(self.device, torch.float32))
+
+
+class OnnxPredictor(Predictor):
+    def __init__(self, path, device="cpu"):
+        super().__init__(path, device)
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError(
+                "Для ONNX-артефактов нужен onnxruntime: pip install onnxruntime"
+            ) from e
+        providers = ["CPUExecutionProvider"]
+        if self.device.type == "cuda":
+            providers.insert(0, "CUDAExecutionProvider")
+        self.session = ort.InferenceSession(str(path), providers=providers)
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, images: torch.Tensor) -> torch.Tensor:
+        self.check_size(images)
+        inputs = images.detach().to("cpu", torch.float32).numpy()
+        (logits,) = self.session.run(None, {self.input_name: inputs})
+        return torch.from_numpy(logits).to(self.device)
+
+
+def load_predictor(
+    path: Union[str, Path], device: Union[str, torch.device] = "cpu"
+) -> Predictor:
+    """Загружает артефакт по расширению файла (.pt/.ts — TorchScript, .onnx — ONNX)."""
+    suffix = Path(path).suffix
+    if suffix in TORCHSCRIPT_SUFFIXES:
+        return TorchScriptPredictor(path, device)
+    if suffix in ONNX_SUFFIXES:
+        return OnnxPredictor(path, device)
+    raise ValueError(f"Неизвестный формат артефакта: {path}")
+
+
+def load_image(path: Union[str, Path], img_size: int) -> torch.Tensor:
+    """Картинка → uint8-тензор [3, S, S] с центральным кропом, как в test-трансформе."""
+    from PIL import Image
+
+    image = np.asarray(Image.open(path).convert("RGB"))
+    h, w = image.shape[:2]
+    if h < img_size or w < img_size:
+        raise ValueError(f"Картинка {path} меньше {img_size}×{img_size}")
+    top, left = (h - img_size) // 2, (w - img_size) // 2
+    crop = image[top : top + img_size, left : left + img_size]
+    return torch.from_numpy(np.ascontiguousarray(crop)).permute(2, 0, 1)
+
+
+def main():
+    """python -m src.models.runtime model.pt img1.png img2.png --output-dir out"""
+    from PIL import Image
+
+    parser = argparse.ArgumentParser(description="Инференс из экспортированной UNet")
+    parser.add_argument("artifact")
+    parser.add_argument("images", nargs="+")
+    parser.add_argument("--output-dir", default="outputs/predicted")
+    parser.add_argument("--device", default="cpu")
+    args = parser.parse_args()
+
+    predictor = load_predictor(args.artifact, args.device)
+    out_dir = Path(args.output_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for image_path in args.images:
+        image = load_image(image_path, predictor.img_size)
+        mask = predictor.predict(image.unsqueeze(0))[0].cpu().numpy()
+        out_path = out_dir / f"{Path(image_path).stem}.png"
+        Image.fromarray(mask).save(out_path)
+        print(f"{image_path} → {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+# src/models/tta.py
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import hydra
+import torch
+from omegaconf import DictConfig, OmegaConf
+from torch.utils.data import DataLoader
+
+from .quantize import subset_loader
+from .unet_lightning import UNetLitModule, calc_val_data, calc_val_loss
+
+Transform = Callable[[torch.Tensor], torch.Tensor]
+
+
+def _flip(dim: int) -> Transform:
+    return lambda x: torch.flip(x, dims=(dim,))
+
+
+def _rot(k: int) -> Transform:
+    return lambda x: torch.rot90(x, k, dims=(-2, -1))
+
+
+# Имя → (прямое преобразование картинок, обратное для логитов) по осям H, W
+TTA_TRANSFORMS: Dict[str, Tuple[Transform, Transform]] = {
+    "identity": (lambda x: x, lambda x: x),
+    "hflip": (_flip(-1), _flip(-1)),
+    "vflip": (_flip(-2), _flip(-2)),
+    "rot90": (_rot(1), _rot(-1)),
+    "rot180": (_rot(2), _rot(-2)),
+    "rot270": (_rot(3), _rot(-3)),
+    "transpose": (lambda x: x.transpose(-2, -1), lambda x: x.transpose(-2, -1)),
+}
+# Меняют местами H и W: для батча нужны квадратные картинки
+SWAPS_AXES = ("rot90", "rot270", "transpose")
+
+
+def tta_views(transforms: Sequence[str]) -> List[str]:
+    """identity всегда первый, повторы убираются, неизвестные имена — ошибка."""
+    unknown = set(transforms) - set(TTA_TRANSFORMS)
+    if unknown:
+        raise ValueError(
+            f"Неизвестные TTA-преобразования: {sorted(unknown)}; "
+            f"доступны: {list(TTA_TRANSFORMS)}"
+        )
+    return list(dict.fromkeys(["identity", *transforms]))
+
+
+class TTAModel:
+    """
+    Test-time augmentation одним forward: V видов батча [B, 3, H, W]
+    склеиваются в [V*B, 3, H, W], логиты каждого вида возвращаются обратным
+    преобразованием на том же устройстве и усредняются. Интерфейс как у
+    модели: __call__ → логиты, атрибут device.
+    """
+
+    def __init__(self, model, transforms: Sequence[str]):
+        self.model = model
+        self.views = tta_views(transforms)
+        self.device = getattr(model, "device", torch.device("cpu"))
+
+    def __call__(self, images: torch.Tensor) -> torch.Tensor:
+        batch, height, width = images.shape[0], images.shape[-2], images.shape[-1]
+        if height != width and any(v in SWAPS_AXES for v in self.views):
+            raise ValueError(
+                f"Повороты на 90° и transpose требуют квадратных картинок, "
+                f"а не {height}×{width}"
+            )
+        views = torch.cat([TTA_TRANSFORMS[v][0](images) for v in self.views])
+        logits = self.model(views).float()
+        merged = torch.zeros_like(logits[:batch])
+        for view, chunk in zip(self.views, logits.split(batch)):
+            merged += TTA_TRANSFORMS[view][1](chunk)
+        return merged / len(self.views)
+
+
+class SequentialTTAModel(TTAModel):
+    """Та же TTA, но отдельный forward на каждый вид (для сравнения в отчёте)."""
+
+    def __call__(self, images: torch.Tensor) -> torch.Tensor:
+        merged = 0
+        for view in self.views:
+            forward, inverse = TTA_TRANSFORMS[view]
+            merged = merged + inverse(self.model(forward(images)).float())
+        return merged / len(self.views)
+
+
+def maybe_tta(model, cfg: DictConfig):
+    """Оборачивает модель в TTAModel, если tta.enabled."""
+    tta_cfg = cfg.get("tta")
+    if tta_cfg is None or not tta_cfg.get("enabled", False):
+        return model
+    tta_model = TTAModel(model, tta_cfg.transforms)
+    print(f"TTA: {', '.join(tta_model.views)} in one forward")
+    return tta_model
+
+
+def evaluate_timed(model, loader: DataLoader, num_classes: int) -> Dict:
+    """mIoU / mRecall / mAcc и чистое время модели на картинку."""
+    device = torch.device(getattr(model, "device", "cpu"))
+    confusion = torch.zeros(num_classes, num_classes, dtype=torch.long)
+    seconds, images_seen = 0.0, 0
+    with torch.inference_mode():
+        for images, masks in loader:
+            images = images.to(device)
+            if device.type == "cuda":
+                torch.cuda.synchronize(device)
+            start = time.perf_counter()
+            logits = model(images)
+            if device.type == "cuda":
+                torch.cuda.synchronize(device)
+            seconds += time.perf_counter() - start
+            images_seen += len(images)
+            confusion += calc_val_data(logits.cpu(), masks, num_classes)
+    mean_iou, mean_recall, mean_acc = calc_val_loss(confusion)
+    return {
+        "mIoU": mean_iou,
+        "mRecall": mean_recall,
+        "mAcc": mean_acc,
+        "ms_per_image": seconds * 1000 / max(images_seen, 1),
+    }
+
+
+@hydra.main(version_base="1.3", config_path="../../configs", config_name="config")
+def main(cfg: DictConfig):
+    """
+    Отчёт TTA: mIoU и время на картинку без TTA, с каждым преобразованием
+    по отдельности и со всем набором tta.transforms (одним forward и, для
+    сравнения, отдельными forward на каждый вид).
+    """
+    tta_cfg = cfg.tta
+    print(OmegaConf.to_yaml(tta_cfg))
+    lit_model = UNetLitModule.load_from_checkpoint(
+        tta_cfg.checkpoint, weights_only=False
+    )
+    lit_model.eval()
+    lit_model.freeze()
+
+    loader = subset_loader(
+        cfg,
+        "test",
+        tta_cfg.eval_samples,
+        tta_cfg.batch_size,
+        cfg.seed,
+        img_size=tta_cfg.img_size,
+    )
+    transforms = list(tta_cfg.transforms)
+    variants = [("plain", lit_model)]
+    variants += [(t, TTAModel(lit_model, [t])) for t in transforms]
+    if len(transforms) > 1:
+        variants.append(("all", TTAModel(lit_model, transforms)))
+    variants.append(("all (seq)", SequentialTTAModel(lit_model, transforms)))
+
+    # Прогрев: первые forward не должны попасть в замер ни одного варианта
+    warmup_images = next(iter(loader))[0].to(lit_model.device)
+    with torch.inference_mode():
+        for _ in range(tta_cfg.warmup):
+            for _, model in variants:
+                model(warmup_images)
+
+    rows = []
+    for name, model in variants:
+        views = len(model.views) if isinstance(model, TTAModel) else 1
+        rows.append((name, views, evaluate_timed(model, loader, lit_model.num_classes)))
+
+    base = rows[0][2]
+    print(f"{'variant':<12}{'views':>6}{'mIoU':>9}{'ΔmIoU':>9}{'ms/img':>9}{'cost':>7}")
+    for name, views, r in rows:
+        print(
+            f"{name:<12}{views:>6}{r['mIoU']:>9.4f}{r['mIoU'] - base['mIoU']:>+9.4f}"
+            f"{r['ms_per_image']:>9.1f}{r['ms_per_image'] / base['ms_per_image']:>6.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,67 +2,45 @@ import pytorch_lightning as pl
 import torch
 from torch import nn
 
-from .unet_model import UNet
+from .unet_model import unet_from_config
 
 
 def calc_val_data(preds: torch.Tensor, masks: torch.Tensor, num_classes: int):
     """
-    Берёт логиты [B, C, H, W] и ground-truth [B, H, W],
-    возвращает intersection, union, target
+    Берёт логиты [B, C, H, W] и ground-truth [B, H, W], возвращает матрицу
+    ошибок [C, C] (строки — ground-truth, столбцы — предсказание), int64,
+    на устройстве preds. Один bincount на батч; метки вне 0..C-1 пропускаются.
     """
     preds = torch.argmax(preds, dim=1)  # [B, H, W]
-    B, H, W = preds.shape
+    masks = masks.to(preds.device).long()
+    valid = (masks >= 0) & (masks < num_classes)
+    index = masks[valid] * num_classes + preds[valid]
+    return torch.bincount(index, minlength=num_classes**2).view(
+        num_classes, num_classes
+    )
 
-    intersection = torch.zeros(B, num_classes, H, W, device=preds.device)
-    union = torch.zeros(B, num_classes, H, W, device=preds.device)
-    target = torch.zeros(B, num_classes, H, W, device=preds.device)
 
-    for i in range(num_classes):
-        pred_mask = (preds == i).float()
-        gt_mask = (masks == i).float()
-        intersection[:, i, :, :] = pred_mask * gt_mask
-        union[:, i, :, :] = pred_mask + gt_mask - (pred_mask * gt_mask)
-        target[:, i, :, :] = gt_mask
-
-    return intersection, union, target
-
-
-def calc_val_loss(
-    intersection: torch.Tensor,
-    union: torch.Tensor,
-    target: torch.Tensor,
-    num_batches: int,
-    eps: float = 1e-7,
-):
+def calc_val_loss(confusion: torch.Tensor, eps: float = 1e-7):
     """
-    Принимает:
-      intersection: [total_examples, C, H, W]
-      union      : [total_examples, C, H, W]
-      target     : [total_examples, C, H, W]
-      num_batches: число обработанных мини-батчей на валидации
+    Принимает матрицу ошибок [C, C], накопленную по всем батчам.
     Возвращает: (mean_iou, mean_recall, mean_acc)
     """
-    # Суммируем по пространственным осям и по batch’ам
-    intersection_sum = intersection.sum(dim=(0, 2, 3))  # [C]
-    union_sum = union.sum(dim=(0, 2, 3))  # [C]
-    target_sum = target.sum(dim=(0, 2, 3))  # [C]
+    confusion = confusion.double()
+    intersection = confusion.diagonal()  # [C]
+    target = confusion.sum(dim=1)  # пиксели класса в ground-truth, [C]
+    predicted = confusion.sum(dim=0)  # пиксели, предсказанные как класс, [C]
+    union = target + predicted - intersection
 
     # iou и recall на класс [C]
-    iou_per_class = (intersection_sum + eps) / (union_sum + eps)
-    recall_per_class = (intersection_sum + eps) / (target_sum + eps)
+    iou_per_class = (intersection + eps) / (union + eps)
+    recall_per_class = (intersection + eps) / (target + eps)
 
     mean_iou = iou_per_class.mean().item()
     mean_recall = recall_per_class.mean().item()
 
-    total_intersection = intersection_sum.sum()  # скаляр
-    # получаем B × H × W × num_batches
-    # Но нам нужно знать число пикселей:
-    # total_pixels = (H * W) * (число примеров).
-    # Мы знаем, что intersection.shape = [N, C, H, W],
-    # где N = total_examples
-    N, _, H, W = intersection.shape
-    total_pixels = N * H * W
-    mean_acc = ((total_intersection + eps) / (total_pixels + eps)).item()
+    # Доля верно классифицированных пикселей
+    total_pixels = confusion.sum()
+    mean_acc = ((intersection.sum() + eps) / (total_pixels + eps)).item()
 
     return mean_iou, mean_recall, mean_acc
 
@@ -78,15 +56,44 @@ class UNetLitModule(pl.LightningModule):
         self.lr = cfg["model"]["lr"]
 
         # Создаём модель и loss
-        self.model = UNet(num_classes=self.num_classes)
+        # Архитектура — из cfg.model; чекпоинты без новых ключей
+        # собираются в исходной конфигурации (64→1024, legacy "resize")
+        self.model = unet_from_config(cfg["model"])
         self.criterion = nn.CrossEntropyLoss()
 
-        # Накопители для валидации
-        self.val_intersection = []
-        self.val_union = []
-        self.val_target = []
+        # Включается apply_execution_mode (src/utils/execution.py)
+        self.channels_last = False
+
+        # Датасет может отдавать uint8-картинки и маски: перевод во float и
+        # нормализация делаются один раз здесь, уже на устройстве.
+        # Буферы не сохраняются в чекпоинт (persistent=False)
+        mean = cfg["model"].get("input_mean")
+        std = cfg["model"].get("input_std")
+        self.normalize_input = mean is not None and std is not None
+        if self.normalize_input:
+            self.register_buffer(
+                "input_mean", torch.tensor(mean).view(1, -1, 1, 1), persistent=False
+            )
+            self.register_buffer(
+                "input_std", torch.tensor(std).view(1, -1, 1, 1), persistent=False
+            )
+
+        # Матрицы ошибок [C, C] за эпоху: копятся на устройстве модели,
+        # память не зависит от размера датасета
+        for stage in ("val", "test"):
+            self.register_buffer(
+                f"{stage}_confusion",
+                torch.zeros(self.num_classes, self.num_classes, dtype=torch.long),
+                persistent=False,
+            )
 
     def forward(self, x: torch.Tensor) -> torch.Tensor:
+        if not x.is_floating_point():
+            x = x.float()
+        if self.normalize_input:
+            x = (x - self.input_mean) / self.input_std
+        if self.channels_last:
+            x = x.contiguous(memory_format=torch.channels_last)
         return self.model(x)
 
     def configure_optimizers(self):
@@ -95,6 +102,7 @@ class UNetLitModule(pl.LightningModule):
 
     def training_step(self, batch, batch_idx):
         images, masks = batch
+        masks = masks.long()
         logits = self(images)
         loss = self.criterion(logits, masks)
 
@@ -104,52 +112,56 @@ class UNetLitModule(pl.LightningModule):
 
     def validation_step(self, batch, batch_idx):
         images, masks = batch
+        masks = masks.long()
         logits = self(images)
         loss = self.criterion(logits, masks)
 
         # Логируем валидационный лосс (по эпохе)
-        self.log("val_loss", loss, on_step=False, on_epoch=True, prog_bar=True)
+        self.log(
+            "val_loss",
+            loss,
+            on_step=False,
+            on_epoch=True,
+            prog_bar=True,
+            sync_dist=True,
+        )
 
-        # Считаем матрицы intersection/union/target (на CPU)
-        inter, uni, tar = calc_val_data(logits, masks, self.num_classes)
-        self.val_intersection.append(inter.detach().cpu())
-        self.val_union.append(uni.detach().cpu())
-        self.val_target.append(tar.detach().cpu())
+        # Копим матрицу ошибок (на устройстве)
+        self.val_confusion += calc_val_data(logits.detach(), masks, self.num_classes)
+
+    def reduce_confusion(self, confusion: torch.Tensor) -> torch.Tensor:
+        """Сумма матриц ошибок всех процессов (DDP); без Trainer — как есть."""
+        if self._trainer is None:
+            return confusion
+        return self.trainer.strategy.reduce(confusion.clone(), reduce_op="sum")
 
     def on_validation_epoch_end(self):
-        # Склеиваем накопленные батчи
-        intersection = torch.cat(
-            self.val_intersection, dim=0
-        )  # [total_examples, C, H, W]
-        union = torch.cat(self.val_union, dim=0)
-        target = torch.cat(self.val_target, dim=0)
-
-        # Вычисляем метрики
-        mean_iou, mean_recall, mean_acc = calc_val_loss(
-            intersection, union, target, num_batches=len(self.val_intersection)
-        )
+        # Вычисляем метрики по всей эпохе (и по всем процессам)
+        confusion = self.reduce_confusion(self.val_confusion)
+        mean_iou, mean_recall, mean_acc = calc_val_loss(confusion)
 
         # Логируем mIoU, mRecall, mAcc
         self.log("val_mIoU", mean_iou, prog_bar=True)
         self.log("val_mRecall", mean_recall, prog_bar=True)
         self.log("val_mAcc", mean_acc, prog_bar=True)
 
-        # Сбросим накопители
-        self.val_intersection.clear()
-        self.val_union.clear()
-        self.val_target.clear()
+        # Сбросим накопитель
+        self.val_confusion.zero_()
 
     def test_step(self, batch, batch_idx):
         images, masks = batch
+        masks = masks.long()
         logits = self(images)
         loss = self.criterion(logits, masks)
 
-        # Логируем test loss & метрики
-        self.log("test_loss", loss, on_step=False, on_epoch=True)
-        inter, uni, tar = calc_val_data(logits, masks, self.num_classes)
-        mean_iou, mean_recall, mean_acc = calc_val_loss(
-            inter.cpu(), uni.cpu(), tar.cpu(), num_batches=1
-        )
+        # Логируем test loss; метрики — по всему датасету в on_test_epoch_end
+        self.log("test_loss", loss, on_step=False, on_epoch=True, sync_dist=True)
+        self.test_confusion += calc_val_data(logits.detach(), masks, self.num_classes)
+
+    def on_test_epoch_end(self):
+        confusion = self.reduce_confusion(self.test_confusion)
+        mean_iou, mean_recall, mean_acc = calc_val_loss(confusion)
         self.log("test_mIoU", mean_iou, prog_bar=True)
         self.log("test_mRecall", mean_recall, prog_bar=True)
         self.log("test_mAcc", mean_acc, prog_bar=True)
+        self.test_confusion.zero_()
@@ -1,28 +1,47 @@
+from contextlib import contextmanager
+from typing import Iterable, List, Optional, Sequence, Union
+
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
+from torch.utils.checkpoint import checkpoint
+
 
+class InvertedResidual(nn.Module):
+    """
+    Блок MobileNetV2: 1×1 расширение → depthwise 3×3 → 1×1 проекция,
+    с residual-связью, если число каналов не меняется.
+    """
 
-class DownBlock(nn.Module):
-    def __init__(self, in_channel: int, out_channel: int):
+    def __init__(self, in_channel: int, out_channel: int, expand_ratio: int = 4):
         super().__init__()
+        hidden = in_channel * expand_ratio
+        self.use_residual = in_channel == out_channel
         self.layer = nn.Sequential(
-            nn.Conv2d(in_channel, out_channel, kernel_size=3, padding=1),
-            nn.BatchNorm2d(out_channel),
-            nn.ReLU(),
-            nn.Conv2d(out_channel, out_channel, kernel_size=3, padding=1),
+            nn.Conv2d(in_channel, hidden, kernel_size=1),
+            nn.BatchNorm2d(hidden),
+            nn.ReLU6(),
+            nn.Conv2d(hidden, hidden, kernel_size=3, padding=1, groups=hidden),
+            nn.BatchNorm2d(hidden),
+            nn.ReLU6(),
+            nn.Conv2d(hidden, out_channel, kernel_size=1),
             nn.BatchNorm2d(out_channel),
-            nn.ReLU(),
         )
 
     def forward(self, x: torch.Tensor) -> torch.Tensor:
-        return self.layer(x)
-
-
-class UpBlock(nn.Module):
-    def __init__(self, in_channel: int, out_channel: int):
-        super().__init__()
-        self.layer = nn.Sequential(
+        out = self.layer(x)
+        return x + out if self.use_residual else out
+
+
+def block_layers(in_channel: int, out_channel: int, block_type: str) -> nn.Sequential:
+    """
+    Слои блока UNet из двух свёрточных ступеней:
+      standard  — conv 3×3 → BN → ReLU, дважды;
+      depthwise — depthwise 3×3 → BN → ReLU → pointwise 1×1 → BN → ReLU, дважды;
+      inverted  — два блока InvertedResidual (второй — с residual-связью).
+    """
+    if block_type == "standard":
+        return nn.Sequential(
             nn.Conv2d(in_channel, out_channel, kernel_size=3, padding=1),
             nn.BatchNorm2d(out_channel),
             nn.ReLU(),
@@ -30,117 +49,220 @@ class UpBlock(nn.Module):
             nn.BatchNorm2d(out_channel),
             nn.ReLU(),
         )
+    if block_type == "depthwise":
+        layers = []
+        for cin in (in_channel, out_channel):
+            layers += [
+                nn.Conv2d(cin, cin, kernel_size=3, padding=1, groups=cin),
+                nn.BatchNorm2d(cin),
+                nn.ReLU(),
+                nn.Conv2d(cin, out_channel, kernel_size=1),
+                nn.BatchNorm2d(out_channel),
+                nn.ReLU(),
+            ]
+        return nn.Sequential(*layers)
+    if block_type == "inverted":
+        return nn.Sequential(
+            InvertedResidual(in_channel, out_channel),
+            InvertedResidual(out_channel, out_channel),
+        )
+    raise ValueError(f"Неизвестный block_type: {block_type}")
+
+
+@contextmanager
+def preserve_bn_stats(module: nn.Module):
+    """Откатывает running-статистики BatchNorm модуля после выхода из блока."""
+    buffers = [
+        (buf, buf.clone())
+        for m in module.modules()
+        if isinstance(m, nn.modules.batchnorm._BatchNorm)
+        for buf in m.buffers()
+    ]
+    try:
+        yield
+    finally:
+        for buf, saved in buffers:
+            buf.copy_(saved)
+
+
+class ConvBlock(nn.Module):
+    def __init__(self, in_channel: int, out_channel: int, block_type: str = "standard"):
+        super().__init__()
+        self.layer = block_layers(in_channel, out_channel, block_type)
+        # Activation checkpointing: промежуточные активации блока не хранятся,
+        # а пересчитываются на backward (меньше памяти, дольше шаг)
+        self.use_checkpoint = False
 
     def forward(self, x: torch.Tensor) -> torch.Tensor:
+        if self.use_checkpoint and self.training and torch.is_grad_enabled():
+            return checkpoint(self._checkpointed_forward(), x, use_reentrant=False)
         return self.layer(x)
 
+    def _checkpointed_forward(self):
+        """
+        Повторный forward на backward не должен второй раз сдвигать
+        running-статистики BatchNorm: при пересчёте они откатываются.
+        """
+        calls = 0
 
-class BottleNeck(nn.Module):
-    def __init__(self, in_channel: int, out_channel: int):
-        super().__init__()
-        self.layer = nn.Sequential(
-            nn.Conv2d(in_channel, out_channel, kernel_size=3, padding=1),
-            nn.BatchNorm2d(out_channel),
-            nn.ReLU(),
-            nn.Conv2d(out_channel, out_channel, kernel_size=3, padding=1),
-            nn.BatchNorm2d(out_channel),
-            nn.ReLU(),
-        )
+        def run(x: torch.Tensor) -> torch.Tensor:
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                return self.layer(x)
+            with preserve_bn_stats(self.layer):
+                return self.layer(x)
 
-    def forward(self, x: torch.Tensor) -> torch.Tensor:
-        return self.layer(x)
+        return run
+
+
+class DownBlock(ConvBlock):
+    """Блок энкодера."""
+
+
+class UpBlock(ConvBlock):
+    """Блок декодера (вход — конкатенация апсемплинга и skip-связи)."""
+
+
+class BottleNeck(ConvBlock):
+    """Блок между энкодером и декодером."""
 
 
 class UNet(nn.Module):
+    """
+    UNet глубины depth: каналы уровней base_channels * channel_mult ** i,
+    последний элемент channels — bottleneck. Явный список channels
+    (длины depth + 1) перекрывает base_channels/channel_mult/depth.
+    Имена слоёв (enc_conv1, transpose_conv1, ...) совпадают с исходной
+    архитектурой 64→1024, поэтому старые чекпоинты загружаются как есть.
+
+    input_mode задаёт, как обрабатываются входы произвольного размера:
+      "resize"  — (legacy) вход масштабируется к 256×256, логиты — обратно;
+      "pad"     — вход дополняется нулями до кратного 2**depth, сеть работает
+                  в исходном разрешении, выход обрезается до H×W;
+      "reflect" — то же, но с отражающим паддингом.
+    """
+
+    INPUT_MODES = ("resize", "pad", "reflect")
+    LEGACY_SIZE = 256
+
     def __init__(
         self,
         num_classes: int,
+        input_mode: str = "resize",
+        base_channels: int = 64,
+        depth: int = 4,
+        channel_mult: float = 2.0,
+        block_type: str = "standard",
+        channels: Optional[Sequence[int]] = None,
     ):
         super().__init__()
+        if input_mode not in self.INPUT_MODES:
+            raise ValueError(f"Неизвестный input_mode: {input_mode}")
+        if channels is None:
+            channels = [
+                int(round(base_channels * channel_mult**i)) for i in range(depth + 1)
+            ]
         self.num_classes = num_classes
+        self.input_mode = input_mode
+        self.block_type = block_type
+        self.channels: List[int] = [int(c) for c in channels]
+        self.depth = len(self.channels) - 1
+        # depth max-pool по 2: сторона входа должна делиться на 2**depth
+        self.size_divisor = 2**self.depth
 
         # Encoder
-        self.enc_conv1 = DownBlock(3, 64)
-        self.max_pool1 = nn.MaxPool2d(kernel_size=2, stride=2)
-
-        self.enc_conv2 = DownBlock(64, 128)
-        self.max_pool2 = nn.MaxPool2d(kernel_size=2, stride=2)
-
-        self.enc_conv3 = DownBlock(128, 256)
-        self.max_pool3 = nn.MaxPool2d(kernel_size=2, stride=2)
-
-        self.enc_conv4 = DownBlock(256, 512)
-        self.max_pool4 = nn.MaxPool2d(kernel_size=2, stride=2)
+        in_channel = 3
+        for i in range(1, self.depth + 1):
+            out_channel = self.channels[i - 1]
+            setattr(
+                self, f"enc_conv{i}", DownBlock(in_channel, out_channel, block_type)
+            )
+            setattr(self, f"max_pool{i}", nn.MaxPool2d(kernel_size=2, stride=2))
+            in_channel = out_channel
 
         # Bottleneck
-        self.bottleneck = BottleNeck(512, 1024)
-
-        # Decoder
-        self.transpose_conv1 = nn.ConvTranspose2d(1024, 512, kernel_size=2, stride=2)
-        self.dec_conv1 = UpBlock(1024, 512)
-
-        self.transpose_conv2 = nn.ConvTranspose2d(512, 256, kernel_size=2, stride=2)
-        self.dec_conv2 = UpBlock(512, 256)
-
-        self.transpose_conv3 = nn.ConvTranspose2d(256, 128, kernel_size=2, stride=2)
-        self.dec_conv3 = UpBlock(256, 128)
+        self.bottleneck = BottleNeck(
+            self.channels[-2], self.channels[-1], block_type=block_type
+        )
 
-        self.transpose_conv4 = nn.ConvTranspose2d(128, 64, kernel_size=2, stride=2)
-        self.dec_conv4 = UpBlock(128, 64)
+        # Decoder: dec_conv1 — самый глубокий уровень, dec_conv{depth} — верхний
+        for i in range(1, self.depth + 1):
+            level = self.depth - i
+            skip_channel = self.channels[level]
+            setattr(
+                self,
+                f"transpose_conv{i}",
+                nn.ConvTranspose2d(
+                    self.channels[level + 1], skip_channel, kernel_size=2, stride=2
+                ),
+            )
+            setattr(
+                self,
+                f"dec_conv{i}",
+                UpBlock(2 * skip_channel, skip_channel, block_type),
+            )
 
         # Final conv
-        self.final_conv = nn.Conv2d(64, num_classes, kernel_size=1)
+        self.final_conv = nn.Conv2d(self.channels[0], num_classes, kernel_size=1)
+
+    def block_names(self) -> List[str]:
+        """Имена блоков, которые можно чекпоинтить: enc_conv*, bottleneck, dec_conv*."""
+        return [name for name, m in self.named_children() if isinstance(m, ConvBlock)]
+
+    def set_activation_checkpointing(self, blocks: Union[str, Iterable[str], None]):
+        """
+        Включает activation checkpointing для перечисленных блоков
+        ("all" — для всех), у остальных выключает.
+        """
+        names = self.block_names()
+        if blocks is None:
+            blocks = []
+        elif isinstance(blocks, str):
+            blocks = names if blocks == "all" else [blocks]
+        blocks = set(blocks)
+        unknown = blocks - set(names)
+        if unknown:
+            raise ValueError(
+                f"Неизвестные блоки для checkpointing: {sorted(unknown)}; "
+                f"доступны: {names}"
+            )
+        for name in names:
+            getattr(self, name).use_checkpoint = name in blocks
 
     def forward(self, inputs: torch.Tensor) -> torch.Tensor:
-        x = inputs.clone().float()
+        # Без clone: float-вход используется как есть, uint8 переводится во float
+        x = inputs if inputs.is_floating_point() else inputs.float()
         B, C, H_in, W_in = x.shape
-
-        # Если изображение не 256×256 (или любое другое), масштабируем к 256 при помощи interpolate
-        if H_in != 256 or W_in != 256:
-            x = F.interpolate(x, size=(256, 256), mode="bilinear", align_corners=False)
-            reshaped = True
+        size = self.LEGACY_SIZE
+
+        reshaped = False
+        pad_h = pad_w = 0
+        if self.input_mode == "resize":
+            # Если изображение не 256×256, масштабируем к 256 при помощи interpolate
+            if H_in != size or W_in != size:
+                x = F.interpolate(
+                    x, size=(size, size), mode="bilinear", align_corners=False
+                )
+                reshaped = True
         else:
-            reshaped = False
-
-        # Encoder
-        conv1 = self.enc_conv1(x)  # [B, 64, 256, 256]
-        x = self.max_pool1(conv1)  # [B, 64, 128, 128]
+            pad_h = -H_in % self.size_divisor
+            pad_w = -W_in % self.size_divisor
+            if pad_h or pad_w:
+                mode = "constant" if self.input_mode == "pad" else "reflect"
+                # reflect требует паддинг меньше стороны входа
+                if mode == "reflect" and (pad_h >= H_in or pad_w >= W_in):
+                    mode = "replicate"
+                x = F.pad(x, (0, pad_w, 0, pad_h), mode=mode)
 
-        conv2 = self.enc_conv2(x)  # [B, 128, 128, 128]
-        x = self.max_pool2(conv2)  # [B, 128, 64, 64]
-
-        conv3 = self.enc_conv3(x)  # [B, 256, 64, 64]
-        x = self.max_pool3(conv3)  # [B, 256, 32, 32]
-
-        conv4 = self.enc_conv4(x)  # [B, 512, 32, 32]
-        x = self.max_pool4(conv4)  # [B, 512, 16, 16]
-
-        # Bottleneck
-        x = self.bottleneck(x)  # [B, 1024, 16, 16]
-
-        # Decoder
-        x = self.transpose_conv1(x)  # [B, 512, 32, 32]
-        x = torch.cat([x, conv4], dim=1)
-        x = self.dec_conv1(x)  # [B, 512, 32, 32]
-
-        x = self.transpose_conv2(x)  # [B, 256, 64, 64]
-        x = torch.cat([x, conv3], dim=1)
-        x = self.dec_conv2(x)  # [B, 256, 64, 64]
-
-        x = self.transpose_conv3(x)  # [B, 128, 128, 128]
-        x = torch.cat([x, conv2], dim=1)
-        x = self.dec_conv3(x)  # [B, 128, 128, 128]
-
-        x = self.transpose_conv4(x)  # [B, 64, 256, 256]
-        x = torch.cat([x, conv1], dim=1)
-        x = self.dec_conv4(x)  # [B, 64, 256, 256]
-
-        logits = self.final_conv(x)  # [B, num_classes, 256, 256]
+        logits = self.forward_features(x)
 
         if reshaped:
             logits = F.interpolate(
                 logits, size=(H_in, W_in), mode="bilinear", align_corners=False
             )
+        elif pad_h or pad_w:
+            logits = logits[:, :, :H_in, :W_in]
 
         assert logits.shape == (
             B,
@@ -149,3 +271,41 @@ class UNet(nn.Module):
             W_in,
         ), "Неправильная форма выходного тензора"
         return logits
+
+    def forward_features(self, x: torch.Tensor) -> torch.Tensor:
+        """Encoder-decoder на входе со сторонами, кратными size_divisor."""
+        # Encoder: [B, C_i, H / 2**(i-1), W / 2**(i-1)] сохраняем для skip-связей
+        skips = []
+        for i in range(1, self.depth + 1):
+            x = getattr(self, f"enc_conv{i}")(x)
+            skips.append(x)
+            x = getattr(self, f"max_pool{i}")(x)
+
+        # Bottleneck
+        x = self.bottleneck(x)
+
+        # Decoder
+        for i in range(1, self.depth + 1):
+            x = getattr(self, f"transpose_conv{i}")(x)
+            x = torch.cat([x, skips.pop()], dim=1)
+            x = getattr(self, f"dec_conv{i}")(x)
+
+        return self.final_conv(x)  # [B, num_classes, H, W]
+
+
+def unet_from_config(model_cfg) -> UNet:
+    """
+    Собирает UNet по секции cfg.model. Отсутствующие ключи (старые чекпоинты)
+    дают исходную архитектуру 64→1024 в legacy-режиме "resize".
+    """
+    model = UNet(
+        num_classes=model_cfg["num_classes"],
+        input_mode=model_cfg.get("input_mode", "resize"),
+        base_channels=model_cfg.get("base_channels", 64),
+        depth=model_cfg.get("depth", 4),
+        channel_mult=model_cfg.get("channel_mult", 2.0),
+        block_type=model_cfg.get("block_type", "standard"),
+        channels=model_cfg.get("channels"),
+    )
+    model.set_activation_checkpointing(model_cfg.get("activation_checkpointing"))
+    return model
@@ -0,0 +1,151 @@
+# src/serving/batcher.py
+import asyncio
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+
+def percentiles(values, qs=(50, 95, 99)) -> Dict[str, float]:
+    if not values:
+        return {f"p{q}": 0.0 for q in qs}
+    data = np.asarray(values)
+    return {f"p{q}": float(np.percentile(data, q)) for q in qs}
+
+
+class ServingMetrics:
+    """Счётчики сервера и скользящие окна задержек (последние window запросов)."""
+
+    def __init__(self, window: int = 1000):
+        self.requests = 0
+        self.rejected = 0
+        self.errors = 0
+        self.batches = 0
+        self.batch_sizes = Counter()
+        self.latency_ms = deque(maxlen=window)
+        self.queue_wait_ms = deque(maxlen=window)
+        self.model_ms = deque(maxlen=window)
+
+    def snapshot(self, queue_depth: int) -> Dict:
+        images = sum(size * n for size, n in self.batch_sizes.items())
+        return {
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "queue_depth": queue_depth,
+            "batches": self.batches,
+            "mean_batch_size": images / max(self.batches, 1),
+            "batch_sizes": {str(k): v for k, v in sorted(self.batch_sizes.items())},
+            "latency_ms": percentiles(self.latency_ms),
+            "queue_wait_ms": percentiles(self.queue_wait_ms),
+            "model_ms": percentiles(self.model_ms),
+        }
+
+
+class MicroBatcher:
+    """
+    Динамический micro-batching для асинхронного сервера.
+
+    Запросы складываются в очередь; цикл run() ждёт первый, затем добирает
+    остальные, пока не наберётся max_batch_size или не истечёт max_latency_ms
+    с момента прихода первого. Батч считается одним вызовом predict_fn
+    (картинки [B, 3, S, S] → маски [B, S, S]) в отдельном потоке, поэтому
+    event loop продолжает принимать запросы, и пока модель занята, следующий
+    батч копится сам. Картинки разного размера считаются отдельными батчами.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[torch.Tensor], np.ndarray],
+        max_batch_size: int = 16,
+        max_latency_ms: float = 10.0,
+        max_queue: int = 256,
+        metrics: Optional[ServingMetrics] = None,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size должен быть не меньше 1")
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.metrics = metrics or ServingMetrics()
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="model")
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self.queue.qsize()
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._executor.shutdown(wait=True)
+
+    async def submit(self, image: torch.Tensor) -> np.ndarray:
+        """Маска одной картинки [3, S, S]; asyncio.QueueFull, если очередь полна."""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((image, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.metrics.rejected += 1
+            raise
+        return await future
+
+    async def _collect(self) -> List[Tuple]:
+        batch = [await self.queue.get()]
+        deadline = batch[0][2] + self.max_latency
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                if timeout <= 0:
+                    # Окно истекло: забираем только то, что уже в очереди
+                    batch.append(self.queue.get_nowait())
+                else:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+        return batch
+
+    async def _process(self, batch: List[Tuple]):
+        loop = asyncio.get_running_loop()
+        groups = defaultdict(list)
+        for item in batch:
+            groups[tuple(item[0].shape)].append(item)
+
+        for items in groups.values():
+            start = time.perf_counter()
+            for _, _, queued_at in items:
+                self.metrics.queue_wait_ms.append((start - queued_at) * 1000)
+            images = torch.stack([image for image, _, _ in items])
+            try:
+                masks = await loop.run_in_executor(
+                    self._executor, self.predict_fn, images
+                )
+            except Exception as e:
+                self.metrics.errors += len(items)
+                for _, future, _ in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.metrics.model_ms.append((time.perf_counter() - start) * 1000)
+            self.metrics.batches += 1
+            self.metrics.batch_sizes[len(items)] += 1
+            for (_, future, _), mask in zip(items, masks):
+                if not future.done():
+                    future.set_result(mask)
+
+    async def run(self):
+        while True:
+            await self._process(await self._collect())
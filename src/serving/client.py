@@ -0,0 +1,92 @@
+# src/serving/client.py
+"""
+Нагрузочный клиент для src/serving/server.py:
+
+  python -m src.serving.client data/test/image --requests 500 --concurrency 32
+
+concurrency потоков шлют картинки по кругу, в конце печатаются пропускная
+способность, перцентили задержки и /metrics сервера (размеры батчей).
+"""
+import argparse
+import json
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from ..data.image_folder import list_images
+from .batcher import percentiles
+
+
+def post_image(url: str, data: bytes, fmt: str = "png", timeout: float = 60) -> bytes:
+    request = urllib.request.Request(
+        f"{url}/predict?format={fmt}",
+        data=data,
+        method="POST",
+        headers={"Content-Type": "application/octet-stream"},
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.read()
+
+
+def fetch_metrics(url: str, timeout: float = 10) -> Dict:
+    with urllib.request.urlopen(f"{url}/metrics", timeout=timeout) as response:
+        return json.load(response)
+
+
+def load_test(
+    url: str, payloads: List[bytes], requests: int, concurrency: int, fmt: str = "png"
+) -> Dict:
+    """requests запросов из concurrency потоков; задержки — с точки зрения клиента."""
+    latencies, errors = [], []
+
+    def one(i: int):
+        start = time.perf_counter()
+        try:
+            post_image(url, payloads[i % len(payloads)], fmt)
+            latencies.append((time.perf_counter() - start) * 1000)
+        except (urllib.error.URLError, ConnectionError) as e:
+            errors.append(str(e))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "ok": len(latencies),
+        "errors": len(errors),
+        "seconds": wall,
+        "requests_per_sec": len(latencies) / wall,
+        "latency_ms": percentiles(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест сервера UNet")
+    parser.add_argument("images", nargs="+", help="папки, glob или файлы")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--format", default="png", choices=["png", "npy"])
+    args = parser.parse_args()
+
+    payloads = [path.read_bytes() for path in list_images(args.images)]
+    report = load_test(args.url, payloads, args.requests, args.concurrency, args.format)
+    lat = report["latency_ms"]
+    print(
+        f"{report['ok']}/{report['requests']} ok in {report['seconds']:.2f}s: "
+        f"{report['requests_per_sec']:.1f} req/s, latency p50 {lat['p50']:.1f} ms, "
+        f"p95 {lat['p95']:.1f} ms, p99 {lat['p99']:.1f} ms"
+    )
+    metrics = fetch_metrics(args.url)
+    print(
+        f"server: {metrics['batches']} batches, "
+        f"mean batch {metrics['mean_batch_size']:.2f}, "
+        f"sizes {metrics['batch_sizes']}, rejected {metrics['rejected']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+# src/serving/server.py
+"""
+Долгоживущий HTTP-сервер инференса на asyncio (только стандартная библиотека):
+модель загружается один раз, одновременные запросы собираются в micro-батчи.
+
+  POST /predict[?format=png|npy]  тело — картинка (jpg/png) → маска классов:
+                                  палитровый PNG или .npy [S, S] uint8
+  GET  /metrics                   JSON: очередь, размеры батчей, задержки
+  GET  /health                    {"status": "ok"}
+"""
+import asyncio
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http import HTTPStatus
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import hydra
+import numpy as np
+import torch
+from omegaconf import DictConfig, OmegaConf
+
+from ..models.runtime import load_image
+from ..models.tta import maybe_tta
+from ..trainers.inference import load_model, paletted_image, predict_masks
+from .batcher import MicroBatcher, ServingMetrics
+
+
+class HttpError(Exception):
+    def __init__(self, status: HTTPStatus, message: str = ""):
+        super().__init__(status, message)
+        self.status = status
+        self.message = message or status.phrase
+
+
+def http_response(
+    status: HTTPStatus, body: bytes, content_type: str, keep_alive: bool
+) -> bytes:
+    head = (
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode("latin-1") + body
+
+
+async def read_request(
+    reader: asyncio.StreamReader, max_body_bytes: int
+) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+    """Метод, путь (с query), заголовки и тело; None — клиент закрыл соединение."""
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split()
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "Некорректная строка запроса")
+
+    headers = {}
+    while True:
+        header = await reader.readline()
+        if header in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = header.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    if "chunked" in headers.get("transfer-encoding", ""):
+        raise HttpError(HTTPStatus.LENGTH_REQUIRED, "Нужен Content-Length")
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "Некорректный Content-Length")
+    if length > max_body_bytes:
+        raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+    body = await reader.readexactly(length) if length else b""
+    return method, target, headers, body
+
+
+def decode_image(data: bytes, img_size: int) -> torch.Tensor:
+    try:
+        return load_image(io.BytesIO(data), img_size)
+    except ValueError:
+        raise HttpError(
+            HTTPStatus.BAD_REQUEST, f"Картинка меньше {img_size}×{img_size}"
+        )
+    except Exception:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "Не удалось декодировать картинку")
+
+
+def encode_mask(mask: np.ndarray, fmt: str, palette: dict) -> Tuple[bytes, str]:
+    buffer = io.BytesIO()
+    if fmt == "png":
+        paletted_image(mask, palette).save(buffer, format="PNG")
+        return buffer.getvalue(), "image/png"
+    np.save(buffer, mask)
+    return buffer.getvalue(), "application/octet-stream"
+
+
+class InferenceServer:
+    """
+    HTTP поверх asyncio.start_server: декодирование и кодирование картинок —
+    в пуле потоков, расчёт модели — через MicroBatcher. При переполненной
+    очереди отвечает 503, чтобы задержка не росла без ограничений.
+    """
+
+    def __init__(
+        self,
+        model,
+        img_size: int,
+        palette: dict,
+        max_batch_size: int = 16,
+        max_latency_ms: float = 10.0,
+        max_queue: int = 256,
+        max_body_mb: float = 32,
+        io_threads: int = 4,
+    ):
+        self.img_size = img_size
+        self.palette = palette
+        self.max_body_bytes = int(max_body_mb * 2**20)
+        self.metrics = ServingMetrics()
+        self.batcher = MicroBatcher(
+            partial(predict_masks, model),
+            max_batch_size=max_batch_size,
+            max_latency_ms=max_latency_ms,
+            max_queue=max_queue,
+            metrics=self.metrics,
+        )
+        self.io_pool = ThreadPoolExecutor(io_threads, thread_name_prefix="serve-io")
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str, port: int) -> asyncio.AbstractServer:
+        self.batcher.start()
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server
+
+    @property
+    def port(self) -> int:
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        await self.batcher.stop()
+        self.io_pool.shutdown(wait=True)
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader, self.max_body_bytes)
+                except HttpError as e:
+                    body = json.dumps({"error": e.message}).encode()
+                    writer.write(
+                        http_response(e.status, body, "application/json", False)
+                    )
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                status, payload, content_type = await self.route(method, target, body)
+                writer.write(http_response(status, payload, content_type, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method: str, target: str, body: bytes):
+        url = urlsplit(target)
+        try:
+            if url.path == "/predict":
+                if method != "POST":
+                    raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED)
+                fmt = parse_qs(url.query).get("format", ["png"])[0]
+                return (HTTPStatus.OK, *await self.predict(body, fmt))
+            if url.path == "/metrics" and method == "GET":
+                snapshot = self.metrics.snapshot(self.batcher.queue_depth)
+                return HTTPStatus.OK, json.dumps(snapshot).encode(), "application/json"
+            if url.path == "/health" and method == "GET":
+                return HTTPStatus.OK, b'{"status": "ok"}', "application/json"
+            raise HttpError(HTTPStatus.NOT_FOUND)
+        except HttpError as e:
+            return (
+                e.status,
+                json.dumps({"error": e.message}).encode(),
+                "application/json",
+            )
+
+    async def predict(self, body: bytes, fmt: str) -> Tuple[bytes, str]:
+        if fmt not in ("png", "npy"):
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"Неизвестный format: {fmt}")
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        self.metrics.requests += 1
+        image = await loop.run_in_executor(
+            self.io_pool, decode_image, body, self.img_size
+        )
+        try:
+            mask = await self.batcher.submit(image)
+        except asyncio.QueueFull:
+            raise HttpError(HTTPStatus.SERVICE_UNAVAILABLE, "Очередь переполнена")
+        except Exception:
+            raise HttpError(HTTPStatus.INTERNAL_SERVER_ERROR, "Ошибка инференса")
+        result = await loop.run_in_executor(
+            self.io_pool, encode_mask, mask, fmt, self.palette
+        )
+        self.metrics.latency_ms.append((time.perf_counter() - start) * 1000)
+        return result
+
+
+async def serve(server: InferenceServer, host: str, port: int):
+    await server.start(host, port)
+    print(f"Serving on http://{host}:{server.port} (POST /predict, GET /metrics)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+@hydra.main(version_base="1.3", config_path="../../configs", config_name="config")
+def main(cfg: DictConfig):
+    serve_cfg = cfg.serve
+    print(OmegaConf.to_yaml(serve_cfg))
+    img_size = serve_cfg.get("img_size") or cfg.data.img_size
+
+    model = maybe_tta(load_model(serve_cfg.model), cfg)
+    # Прогрев: первый запрос не должен платить за ленивую инициализацию
+    predict_masks(model, torch.zeros(1, 3, img_size, img_size, dtype=torch.uint8))
+
+    server = InferenceServer(
+        model,
+        img_size,
+        cfg.palette,
+        max_batch_size=serve_cfg.max_batch_size,
+        max_latency_ms=serve_cfg.max_latency_ms,
+        max_queue=serve_cfg.max_queue,
+        max_body_mb=serve_cfg.max_body_mb,
+        io_threads=serve_cfg.io_threads,
+    )
+    try:
+        asyncio.run(serve(server, serve_cfg.host, serve_cfg.port))
+    except KeyboardInterrupt:
+        print("Server stopped")
+
+
+if __name__ == "__main__":
+    main()
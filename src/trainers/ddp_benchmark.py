@@ -0,0 +1,121 @@
+# src/trainers/ddp_benchmark.py
+import json
+import os
+import tempfile
+import time
+
+import hydra
+import pytorch_lightning as pl
+import torch
+from omegaconf import DictConfig
+from pytorch_lightning import Trainer
+from pytorch_lightning.strategies import DDPStrategy
+
+from ..callbacks.thread_pinning_callback import ThreadPinningCallback, available_cores
+from ..data.datamodule import FloodNetDataModule
+from ..models.unet_lightning import UNetLitModule
+
+
+class ThroughputCallback(pl.Callback):
+    """
+    Картинки в секунду по всем процессам: первые warmup_batches батчей не
+    считаются, число картинок суммируется по процессам, rank 0 пишет
+    результат в output_path (из spawn-процессов его иначе не вернуть).
+    """
+
+    def __init__(self, warmup_batches: int, output_path: str):
+        super().__init__()
+        self.warmup_batches = warmup_batches
+        self.output_path = output_path
+        self.images = 0
+        self.start = None
+
+    def on_train_start(self, trainer, pl_module):
+        # Иначе замер так и не начнётся, а on_train_end упадёт на self.start
+        batches = trainer.num_training_batches
+        if batches <= self.warmup_batches:
+            raise ValueError(
+                f"В эпохе {batches} батчей при warmup_batches="
+                f"{self.warmup_batches}: замерять нечего, уменьшите "
+                "benchmark.scaling.warmup_batches или размер батча"
+            )
+
+    def on_train_batch_start(self, trainer, pl_module, batch, batch_idx):
+        if batch_idx == self.warmup_batches:
+            self.start = time.perf_counter()
+
+    def on_train_batch_end(self, trainer, pl_module, outputs, batch, batch_idx):
+        if batch_idx >= self.warmup_batches:
+            self.images += batch[0].shape[0]
+
+    def on_train_end(self, trainer, pl_module):
+        elapsed = time.perf_counter() - self.start
+        images = torch.tensor(float(self.images))
+        images = trainer.strategy.reduce(images, reduce_op="sum")
+        if trainer.is_global_zero:
+            with open(self.output_path, "w") as f:
+                json.dump({"images": images.item(), "seconds": elapsed}, f)
+
+
+def run_scaling_point(cfg: DictConfig, num_processes: int, output_path: str):
+    scaling = cfg.benchmark.scaling
+    dm = FloodNetDataModule(
+        data_dir=cfg.data.data_dir,
+        img_size=cfg.data.img_size,
+        batch_size=scaling.get("batch_size") or cfg.data.batch_size,
+        num_workers=cfg.data.num_workers,
+        pin_memory=False,
+        cache_dir=cfg.data.get("cache_dir"),
+        compact=cfg.data.get("compact", False),
+        gpu_augment=cfg.data.get("gpu_augment"),
+    )
+    strategy = "auto"
+    if num_processes > 1:
+        # spawn: все замеры идут из одного запуска скрипта
+        strategy = DDPStrategy(start_method="spawn", process_group_backend="gloo")
+    trainer = Trainer(
+        accelerator="cpu",
+        devices=num_processes,
+        strategy=strategy,
+        max_epochs=1,
+        limit_train_batches=scaling.warmup_batches + scaling.num_batches,
+        limit_val_batches=0,
+        num_sanity_val_steps=0,
+        logger=False,
+        enable_checkpointing=False,
+        enable_progress_bar=False,
+        enable_model_summary=False,
+        callbacks=[
+            ThreadPinningCallback(pin=scaling.get("pin_threads", True)),
+            ThroughputCallback(scaling.warmup_batches, output_path),
+        ],
+    )
+    trainer.fit(UNetLitModule(cfg), datamodule=dm)
+
+
+@hydra.main(version_base="1.3", config_path="../../configs", config_name="config")
+def main(cfg: DictConfig):
+    """Пропускная способность CPU-DDP (gloo) в зависимости от числа процессов."""
+    scaling = cfg.benchmark.scaling
+    print(f"CPU cores available: {len(available_cores())}")
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for num_processes in scaling.processes:
+            output_path = os.path.join(tmp, f"{num_processes}.json")
+            run_scaling_point(cfg, num_processes, output_path)
+            with open(output_path) as f:
+                result = json.load(f)
+            results.append((num_processes, result["images"] / result["seconds"]))
+
+    base = results[0][1]
+    print(f"{'processes':>10}{'images/s':>12}{'speedup':>10}{'efficiency':>12}")
+    for num_processes, throughput in results:
+        speedup = throughput / base
+        print(
+            f"{num_processes:>10}{throughput:>12.2f}{speedup:>10.2f}"
+            f"{speedup * results[0][0] / num_processes:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,305 @@
 # src/trainers/inference.py
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
 from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 
 import numpy as np
 import torch
 from hydra import compose, initialize
 from omegaconf import DictConfig, OmegaConf
 from PIL import Image
+from torch.utils.data import DataLoader
 
 from ..data.datamodule import FloodNetDataModule
 from ..data.dataset_download import download_data_from_gdrive_folder
+from ..data.fetch import file_sha256
+from ..data.image_folder import ImageFileDataset, check_images, list_images
+from ..data.prediction_store import PredictionStoreWriter
+from ..data.result_cache import ResultCache
+from ..models.runtime import is_artifact, load_predictor
+from ..models.tta import maybe_tta
 from ..models.unet_lightning import UNetLitModule
 from ..utils.seed import seed_everything
 
 
-def apply_palette(mask_np: np.ndarray, palette: dict) -> Image.Image:
-    h, w = mask_np.shape
-    color_img = np.zeros((h, w, 3), dtype=np.uint8)
+def palette_lut(palette: dict) -> np.ndarray:
+    """Таблица цветов [256, 3] uint8: класс → RGB (неизвестные классы — чёрные)."""
+    lut = np.zeros((256, 3), dtype=np.uint8)
     for cls_id, color in palette.items():
-        color_img[mask_np == int(cls_id)] = color
-    return Image.fromarray(color_img)
+        lut[int(cls_id)] = color
+    return lut
+
+
+def apply_palette(mask_np: np.ndarray, palette: dict) -> Image.Image:
+    """Цветная RGB-картинка маски одной индексацией таблицы цветов."""
+    return Image.fromarray(palette_lut(palette)[mask_np])
 
 
-def save_mask(mask_tensor: torch.Tensor, output_path: Path, palette: dict):
-    mask_np = mask_tensor.detach().cpu().numpy().astype(np.uint8)
-    img = apply_palette(mask_np, palette)
+def paletted_image(mask_np: np.ndarray, palette: dict) -> Image.Image:
+    """
+    Палитровая картинка (mode "P"): пиксели — индексы классов, цвета — в
+    палитре PNG. Втрое меньше байт, чем RGB, а np.asarray(Image.open(path))
+    возвращает исходную маску классов.
+    """
+    img = Image.fromarray(mask_np)  # mode "L", putpalette переводит в "P"
+    img.putpalette(palette_lut(palette).ravel().tolist())
+    return img
+
+
+def save_mask(
+    mask: Union[torch.Tensor, np.ndarray],
+    output_path: Path,
+    palette: dict,
+    png_mode: str = "P",
+):
+    if isinstance(mask, torch.Tensor):
+        mask = mask.detach().cpu().numpy()
+    mask = mask.astype(np.uint8, copy=False)
+    if png_mode == "P":
+        img = paletted_image(mask, palette)
+    elif png_mode == "RGB":
+        img = apply_palette(mask, palette)
+    else:
+        raise ValueError(f"Неизвестный png_mode: {png_mode} (ожидается P или RGB)")
     img.save(str(output_path))
 
 
-def run_inference(cfg: DictConfig):
-    """Вся логика инференса, cfg уже готов."""
-    print(OmegaConf.to_yaml(cfg))
+class PngSink:
+    """Маски — отдельными PNG в папке out_dir."""
 
-    seed_everything(cfg.seed)
+    def __init__(self, out_dir: Path, palette: dict, png_mode: str = "P"):
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.palette = palette
+        self.png_mode = png_mode
+
+    def add(self, name: str, mask: np.ndarray):
+        save_mask(mask, self.out_dir / f"{name}.png", self.palette, self.png_mode)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+def mask_sink(inf_cfg: DictConfig, out_dir: Path, palette: dict, metadata: Dict):
+    """
+    Куда писать маски: inference.output_format=png — PNG в out_dir,
+    store — одно хранилище out_dir.store (см. src/data/prediction_store.py).
+    """
+    output_format = inf_cfg.get("output_format", "png")
+    if output_format == "png":
+        return PngSink(out_dir, palette, inf_cfg.get("png_mode", "P"))
+    if output_format == "store":
+        return PredictionStoreWriter(
+            str(out_dir) + ".store",
+            chunk_mb=inf_cfg.get("store_chunk_mb", 256),
+            metadata={**metadata, "palette": OmegaConf.to_container(palette)},
+        )
+    raise ValueError(
+        f"Неизвестный inference.output_format: {output_format} (ожидается png или store)"
+    )
+
+
+def load_model(path: str):
+    """
+    Чекпоинт Lightning (.ckpt) или экспортированный артефакт
+    (.pt/.onnx, см. src/models/export.py). Возвращает callable: картинки → логиты.
+    """
+    if is_artifact(path):
+        return load_predictor(path)
+
+    # hparams чекпоинта — DictConfig, который не проходит weights_only-загрузку
+    lit_model = UNetLitModule.load_from_checkpoint(path, weights_only=False)
+    lit_model.eval()
+    lit_model.freeze()
+    return lit_model
+
+
+class StageTimer:
+    """Время и число картинок по стадиям пайплайна; пополняется из разных потоков."""
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.images = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, images: int, seconds: float):
+        with self._lock:
+            self.seconds[stage] += seconds
+            self.images[stage] += images
+
+    @contextmanager
+    def measure(self, stage: str, images: int):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, images, time.perf_counter() - start)
+
+    def report(self, wall_seconds: float) -> Dict[str, Dict[str, float]]:
+        stats = {
+            stage: {
+                "images": self.images[stage],
+                "seconds": seconds,
+                "images_per_sec": self.images[stage] / max(seconds, 1e-9),
+            }
+            for stage, seconds in self.seconds.items()
+        }
+        # Картинки из кэша результатов модель не видит, но они тоже обработаны
+        images = self.images["model"] + self.images["cache_hit"]
+        stats["total"] = {
+            "images": images,
+            "seconds": wall_seconds,
+            "images_per_sec": images / max(wall_seconds, 1e-9),
+        }
+        return stats
+
+
+def print_stage_report(stats: Dict[str, Dict[str, float]]):
+    print(f"{'stage':<12}{'images':>8}{'seconds':>10}{'images/s':>11}")
+    for stage, s in stats.items():
+        print(
+            f"{stage:<12}{s['images']:>8}{s['seconds']:>10.2f}"
+            f"{s['images_per_sec']:>11.1f}"
+        )
+
+
+class MaskWriter:
+    """
+    Кодирование и запись масок (PngSink / PredictionStoreWriter) в фоновом
+    пуле потоков, чтобы модель не ждала диск. В очереди не больше max_pending
+    батчей: если запись отстаёт, цикл модели дожидается самого старого,
+    и память не растёт.
+    """
+
+    def __init__(self, threads: int, max_pending: int, timer: StageTimer):
+        self.max_pending = max_pending
+        self.timer = timer
+        self.pool = ThreadPoolExecutor(threads, thread_name_prefix="mask-writer")
+        self.pending = deque()
 
-    out_root = Path(cfg.inference.output_dir)
-    gt_dir = out_root / "gt"
-    pred_dir = out_root / "predicted"
-    gt_dir.mkdir(parents=True, exist_ok=True)
-    pred_dir.mkdir(parents=True, exist_ok=True)
+    def submit(self, sink, masks: np.ndarray, names: List[str], stage="write"):
+        while len(self.pending) >= self.max_pending:
+            self.pending.popleft().result()
+        self.pending.append(self.pool.submit(self._write, sink, masks, names, stage))
 
+    def _write(self, sink, masks: np.ndarray, names: List[str], stage: str):
+        with self.timer.measure(stage, len(names)):
+            for mask, name in zip(masks, names):
+                sink.add(name, mask)
+
+    def close(self):
+        try:
+            while self.pending:
+                self.pending.popleft().result()
+        finally:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def result_cache(cfg: DictConfig, model, img_size: int) -> Optional[ResultCache]:
+    """ResultCache для inference.input, если inference.cache.enabled."""
+    cache_cfg = cfg.inference.get("cache")
+    if cache_cfg is None or not cache_cfg.get("enabled", False):
+        return None
+    preprocess = {
+        "img_size": img_size,
+        "crop": "center",
+        "tta": getattr(model, "views", None),
+    }
+    return ResultCache(
+        cache_cfg.dir,
+        model_hash=file_sha256(Path(cfg.inference.model)),
+        preprocess=preprocess,
+        max_size_mb=cache_cfg.max_size_mb,
+    )
+
+
+def serve_from_cache(
+    cache: ResultCache,
+    paths: List[Path],
+    writer: MaskWriter,
+    sink,
+    batch_size: int,
+    timer: StageTimer,
+) -> Tuple[List[int], Dict[int, str]]:
+    """
+    Считает ключи всех картинок и батчами отдаёт попадания в writer: они не
+    декодируются и не идут в модель. Возвращает индексы промахов и ключи.
+    """
+    with timer.measure("hash", len(paths)):
+        keys = {i: cache.key(path) for i, path in enumerate(paths)}
+    pending = []
+    for start in range(0, len(paths), batch_size):
+        masks, names = [], []
+        for i in range(start, min(start + batch_size, len(paths))):
+            mask = cache.get(keys[i])
+            if mask is None:
+                pending.append(i)
+            else:
+                masks.append(mask)
+                names.append(paths[i].stem)
+        if names:
+            writer.submit(sink, masks, names, stage="cache_hit")
+    return pending, keys
+
+
+def timed_batches(loader: DataLoader, timer: StageTimer) -> Iterator:
+    """
+    Батчи (images, targets) из loader. Стадия decode_wait — сколько главный
+    поток ждал готовый батч (около нуля, если воркеры успевают); decode —
+    суммарное время декодирования в воркерах, если датасет его отдаёт третьим
+    элементом (ImageFileDataset), то есть картинки/с на один воркер.
+    """
+    iterator = iter(loader)
+    while True:
+        start = time.perf_counter()
+        try:
+            batch = next(iterator)
+        except StopIteration:
+            return
+        timer.add("decode_wait", len(batch[0]), time.perf_counter() - start)
+        if len(batch) == 3:
+            images, targets, seconds = batch
+            timer.add("decode", len(images), float(seconds.sum()))
+            batch = images, targets
+        yield batch
+
+
+def predict_masks(model, images: torch.Tensor) -> np.ndarray:
+    """Батч картинок → маски классов uint8 [B, H, W] на CPU."""
+    with torch.inference_mode():
+        logits = model(images.to(model.device, non_blocking=True))
+        return torch.argmax(logits, dim=1).to(torch.uint8).cpu().numpy()
+
+
+def image_loader(cfg: DictConfig, paths: List[Path], img_size: int) -> DataLoader:
+    # Не больше воркеров, чем картинок: при полном попадании в кэш — ни одного
+    num_workers = min(
+        cfg.inference.get("num_workers", cfg.data.num_workers), len(paths)
+    )
+    return DataLoader(
+        ImageFileDataset(paths, img_size),
+        batch_size=cfg.inference.batch_size,
+        shuffle=False,
+        num_workers=num_workers,
+        pin_memory=cfg.data.pin_memory and torch.cuda.is_available(),
+        prefetch_factor=cfg.data.get("prefetch_factor") if num_workers > 0 else None,
+    )
+
+
+def floodnet_test_loader(cfg: DictConfig) -> DataLoader:
     if cfg.inference.need_data_download:
         download_data_from_gdrive_folder(cfg)
 
@@ -48,29 +309,122 @@ def run_inference(cfg: DictConfig):
         batch_size=cfg.inference.batch_size,
         num_workers=cfg.data.num_workers,
         pin_memory=cfg.data.pin_memory,
+        persistent_workers=cfg.data.get("persistent_workers", False),
+        prefetch_factor=cfg.data.get("prefetch_factor"),
+        cache_dir=cfg.data.get("cache_dir"),
+        compact=cfg.data.get("compact", False),
     )
     dm.prepare_data()
     dm.setup(stage="test")
+    return dm.test_dataloader()
 
-    lit_model = UNetLitModule.load_from_checkpoint(cfg.inference.model)
-    lit_model.cfg = cfg
-    lit_model.eval()
-    lit_model.freeze()
 
-    for idx, batch in enumerate(dm.test_dataloader()):
-        images, gt_masks = batch
-        images = images.to(lit_model.device)
+def run_inference(cfg: DictConfig) -> Dict[str, Dict[str, float]]:
+    """
+    Вся логика инференса, cfg уже готов.
+
+    Пайплайн: воркеры DataLoader декодируют картинки, модель считает целые
+    батчи inference.batch_size, PNG кодируются и пишутся в фоновых потоках.
+    Вход — inference.input (папка, glob или список файлов), по умолчанию
+    test-сплит FloodNet (тогда рядом сохраняются и gt-маски). Для
+    inference.input с inference.cache.enabled маски неизменившихся картинок
+    берутся из ResultCache без модели. Картинки меньше img_size и нечитаемые
+    файлы пропускаются с сообщением, а не обрывают прогон.
+    Возвращает картинки/с по стадиям (попадания в кэш и пропущенные файлы).
+    """
+    print(OmegaConf.to_yaml(cfg))
+
+    seed_everything(cfg.seed)
+    inf_cfg = cfg.inference
+
+    out_root = Path(inf_cfg.output_dir)
+    source = inf_cfg.get("input")
+    model = maybe_tta(load_model(inf_cfg.model), cfg)
+    img_size = inf_cfg.get("img_size") or cfg.data.img_size
+
+    cache = None
+    skipped = []
+    if source is not None:
+        paths, skipped = check_images(list_images(source), img_size)
+        for path, reason in skipped:
+            print(f"Skipping {path}: {reason}")
+        print(f"Found {len(paths)} images in {source} ({len(skipped)} skipped)")
+        cache = result_cache(cfg, model, img_size)
+    else:
+        if inf_cfg.get("cache", {}).get("enabled", False):
+            print("Result cache is used only with inference.input, skipping")
+        loader = floodnet_test_loader(cfg)
+    save_gt = source is None and inf_cfg.get("save_gt", True)
+
+    timer = StageTimer()
+    wall_start = time.perf_counter()
+    if OmegaConf.is_config(source):
+        source = OmegaConf.to_container(source)
+    metadata = {"model": str(inf_cfg.model), "input": source}
+    with ExitStack() as stack:
+        # Порядок выхода обратный: сначала дописывает MaskWriter, потом sink-и
+        pred_sink = stack.enter_context(
+            mask_sink(inf_cfg, out_root / "predicted", cfg.palette, metadata)
+        )
+        gt_sink = None
+        if save_gt:
+            gt_sink = stack.enter_context(
+                mask_sink(inf_cfg, out_root / "gt", cfg.palette, metadata)
+            )
+        writer = stack.enter_context(
+            MaskWriter(
+                threads=inf_cfg.get("write_threads", 4),
+                max_pending=inf_cfg.get("max_pending_batches", 8),
+                timer=timer,
+            )
+        )
+
+        if source is not None:
+            pending, keys = list(range(len(paths))), {}
+            if cache is not None:
+                pending, keys = serve_from_cache(
+                    cache, paths, writer, pred_sink, inf_cfg.batch_size, timer
+                )
+            loader = image_loader(cfg, [paths[i] for i in pending], img_size)
 
-        with torch.no_grad():
-            logits = lit_model(images)
-        preds = torch.argmax(logits, dim=1).squeeze(0)
-        gt = gt_masks.squeeze(0)
+        offset = 0
+        for images, targets in timed_batches(loader, timer):
+            with timer.measure("model", len(images)):
+                preds = predict_masks(model, images)
 
-        gt_path = gt_dir / f"gt_{idx:04d}.png"
-        pred_path = pred_dir / f"pred_{idx:04d}.png"
+            if source is not None:
+                indices = [pending[i] for i in targets.tolist()]
+                writer.submit(pred_sink, preds, [paths[i].stem for i in indices])
+                if cache is not None:
+                    writer.submit(
+                        cache, preds, [keys[i] for i in indices], stage="cache_put"
+                    )
+            else:
+                indices = range(offset, offset + len(images))
+                writer.submit(pred_sink, preds, [f"pred_{i:04d}" for i in indices])
+                if gt_sink is not None:
+                    writer.submit(
+                        gt_sink, targets.numpy(), [f"gt_{i:04d}" for i in indices]
+                    )
+            offset += len(images)
 
-        save_mask(gt, gt_path, cfg.palette)
-        save_mask(preds, pred_path, cfg.palette)
+    stats = timer.report(time.perf_counter() - wall_start)
+    print_stage_report(stats)
+    if skipped:
+        stats["skipped"] = {str(path): reason for path, reason in skipped}
+    if cache is not None:
+        cache.evict()
+        stats["cache"] = {
+            "hits": cache.hits,
+            "misses": cache.misses,
+            "evicted": cache.evicted,
+            "size_mb": cache.size_bytes() / 2**20,
+        }
+        print(
+            f"Result cache: {cache.hits} hits, {cache.misses} misses, "
+            f"{cache.evicted} evicted, {stats['cache']['size_mb']:.1f} MB"
+        )
+    return stats
 
 
 if __name__ == "__main__":
@@ -0,0 +1,260 @@
+# src/trainers/sliding_window.py
+import math
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Tuple, Union
+
+import hydra
+import numpy as np
+import torch
+import torch.nn.functional as F
+from numpy.lib.format import open_memmap
+from omegaconf import DictConfig, OmegaConf
+
+from ..data.image_folder import IMAGE_SUFFIXES, list_images
+from ..data.tiled_dataset import tile_offsets
+from ..models.tta import maybe_tta
+from .inference import load_model
+
+WINDOWS = ("hann", "linear", "uniform")
+# Сцены: картинки и несжатые .npy [H, W, 3] (читаются через mmap)
+SCENE_SUFFIXES = IMAGE_SUFFIXES + (".npy",)
+
+
+def blend_window(
+    tile_size: int, overlap: int, kind: str = "hann", eps: float = 1e-3
+) -> torch.Tensor:
+    """
+    Вес пикселей тайла [T, T]: 1 в центре, к краям спадает на ширине overlap
+    (hann — косинусом, linear — линейно, uniform — без спада). Нижняя граница
+    eps: у края сцены пиксель покрыт одним тайлом, и вес не должен быть нулём.
+    """
+    if kind not in WINDOWS:
+        raise ValueError(f"Неизвестное окно: {kind}; доступны {WINDOWS}")
+    ramp = torch.ones(tile_size)
+    overlap = min(overlap, tile_size)
+    if kind != "uniform" and overlap > 0:
+        t = (torch.arange(overlap) + 0.5) / overlap
+        edge = t if kind == "linear" else 0.5 - 0.5 * torch.cos(math.pi * t)
+        ramp[:overlap] = edge
+        ramp[-overlap:] = torch.minimum(ramp[-overlap:], edge.flip(0))
+    ramp = ramp.clamp_min(eps)
+    return ramp[:, None] * ramp[None, :]
+
+
+class SlidingWindowPredictor:
+    """
+    Предсказание сцены любого размера в исходном разрешении: сцена режется на
+    тайлы tile_size с перекрытием overlap, тайлы считаются батчами по
+    tile_batch, логиты складываются с весами blend_window и делятся на сумму
+    весов, поэтому швов на границах тайлов нет.
+
+    Сцена обходится полосами строк: аккумулятор логитов покрывает одну полосу
+    высотой tile_size ([C, T, W]). Как только следующая полоса тайлов уже не
+    задевает верхние строки, их маска записывается в output и аккумулятор
+    сдвигается. Память — батч тайлов и одна полоса, а не вся сцена, если
+    image — np.memmap (.npy-сцена); картинки JPEG/PNG при декодировании всё
+    равно целиком попадают в память (см. image_to_npy).
+    """
+
+    def __init__(
+        self,
+        model,
+        tile_size: int = 256,
+        overlap: int = 64,
+        tile_batch: int = 8,
+        window: str = "hann",
+    ):
+        if not 0 <= overlap < tile_size:
+            raise ValueError("overlap должен быть в диапазоне [0, tile_size)")
+        self.model = model
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.tile_batch = tile_batch
+        self.device = torch.device(getattr(model, "device", "cpu"))
+        self.weights = blend_window(tile_size, overlap, window).to(self.device)
+
+    def _tile(self, image: np.ndarray, y: int, x: int) -> torch.Tensor:
+        """uint8 [3, T, T]; тайл у края сцены меньше T дополняется нулями."""
+        crop = np.ascontiguousarray(
+            image[y : y + self.tile_size, x : x + self.tile_size]
+        )
+        tile = torch.from_numpy(crop).permute(2, 0, 1)
+        pad_h = self.tile_size - tile.shape[1]
+        pad_w = self.tile_size - tile.shape[2]
+        if pad_h or pad_w:
+            tile = F.pad(tile, (0, pad_w, 0, pad_h))
+        return tile
+
+    @torch.inference_mode()
+    def _logits(self, tiles) -> torch.Tensor:
+        images = torch.stack(tiles).to(self.device)
+        return self.model(images).float()
+
+    def predict(self, image: np.ndarray, output: np.ndarray) -> Dict[str, float]:
+        """
+        image: [H, W, 3] uint8 (можно np.memmap), output: [H, W] uint8,
+        куда по полосам пишется маска классов (обычно open_memmap).
+        """
+        height, width = image.shape[:2]
+        stride = self.tile_size - self.overlap
+        ys = tile_offsets(height, self.tile_size, stride)
+        xs = tile_offsets(width, self.tile_size, stride)
+        band_h = min(self.tile_size, height)
+
+        acc = None
+        weight_sum = torch.zeros(band_h, width, device=self.device)
+        start = time.perf_counter()
+        for k, y in enumerate(ys):
+            # Аккумулятор покрывает строки [y, y + band_h)
+            for i in range(0, len(xs), self.tile_batch):
+                band_xs = xs[i : i + self.tile_batch]
+                logits = self._logits([self._tile(image, y, x) for x in band_xs])
+                if acc is None:
+                    acc = torch.zeros(
+                        logits.shape[1], band_h, width, device=self.device
+                    )
+                for x, tile_logits in zip(band_xs, logits):
+                    w = min(self.tile_size, width - x)
+                    weights = self.weights[:band_h, :w]
+                    acc[:, :, x : x + w] += tile_logits[:, :band_h, :w] * weights
+                    weight_sum[:, x : x + w] += weights
+
+            # Строки до начала следующей полосы больше не изменятся
+            next_y = ys[k + 1] if k + 1 < len(ys) else height
+            done = next_y - y
+            blended = acc[:, :done] / weight_sum[:done]
+            output[y:next_y] = (
+                torch.argmax(blended, dim=0).to(torch.uint8).cpu().numpy()
+            )
+
+            acc = torch.cat([acc[:, done:], torch.zeros_like(acc[:, :done])], dim=1)
+            weight_sum = torch.cat(
+                [weight_sum[done:], torch.zeros_like(weight_sum[:done])], dim=0
+            )
+
+        if hasattr(output, "flush"):
+            output.flush()
+        seconds = time.perf_counter() - start
+        return {
+            "height": height,
+            "width": width,
+            "tiles": len(ys) * len(xs),
+            "seconds": seconds,
+            "megapixels_per_sec": height * width / 1e6 / max(seconds, 1e-9),
+            "band_mb": (acc.numel() + weight_sum.numel()) * 4 / 2**20,
+        }
+
+
+@contextmanager
+def unlimited_image_pixels():
+    """
+    Ортофотопланы легко превышают защитный порог PIL от «decompression bomb»:
+    порог снимается только на время открытия сцены и затем восстанавливается.
+    """
+    from PIL import Image
+
+    limit = Image.MAX_IMAGE_PIXELS
+    Image.MAX_IMAGE_PIXELS = None
+    try:
+        yield
+    finally:
+        Image.MAX_IMAGE_PIXELS = limit
+
+
+def image_to_npy(path: Union[str, Path], npy_path: Path, band_rows: int = 1024):
+    """
+    Декодирует картинку-сцену в несжатый .npy [H, W, 3] uint8 полосами строк.
+    PIL декодирует JPEG/PNG целиком, поэтому пик памяти здесь — сама картинка;
+    зато предсказание потом читает сцену через mmap, а полосы копируются без
+    второй полной копии в numpy.
+    """
+    from PIL import Image
+
+    with unlimited_image_pixels(), Image.open(path) as image:
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        width, height = image.size
+        scene = open_memmap(
+            npy_path, mode="w+", dtype=np.uint8, shape=(height, width, 3)
+        )
+        for y in range(0, height, band_rows):
+            bottom = min(y + band_rows, height)
+            scene[y:bottom] = np.asarray(image.crop((0, y, width, bottom)))
+        scene.flush()
+        del scene
+
+
+def read_scene(path: Union[str, Path]) -> np.ndarray:
+    """Сцена [H, W, 3] uint8 из .npy через mmap (без чтения в память)."""
+    path = Path(path)
+    if path.suffix != ".npy":
+        raise ValueError(f"read_scene читает только .npy, а не {path.name}")
+    return np.load(path, mmap_mode="r")
+
+
+def predict_scene(
+    predictor: SlidingWindowPredictor, scene_path: Path, output_path: Path
+) -> Dict[str, float]:
+    """
+    Маска сцены → output_path. Картинка-сцена сначала один раз переводится
+    во временный .npy рядом с output_path (см. image_to_npy), который
+    удаляется после предсказания.
+    """
+    scene_path = Path(scene_path)
+    scratch = None
+    if scene_path.suffix != ".npy":
+        scratch = output_path.with_name(f"{output_path.stem}.scene.tmp.npy")
+        image_to_npy(scene_path, scratch)
+        scene_path = scratch
+    try:
+        image = read_scene(scene_path)
+        output = open_memmap(
+            output_path, mode="w+", dtype=np.uint8, shape=tuple(image.shape[:2])
+        )
+        stats = predictor.predict(image, output)
+        del output, image
+    finally:
+        if scratch is not None:
+            scratch.unlink(missing_ok=True)
+    return stats
+
+
+def predict_scenes(
+    predictor: SlidingWindowPredictor, source, out_dir: Path
+) -> Iterator[Tuple[Path, Dict[str, float]]]:
+    """Все сцены source (папка, glob или список) → {out_dir}/{имя}.npy."""
+    for path in list_images(source, SCENE_SUFFIXES):
+        yield path, predict_scene(predictor, path, out_dir / f"{path.stem}.npy")
+
+
+@hydra.main(version_base="1.3", config_path="../../configs", config_name="config")
+def main(cfg: DictConfig):
+    """Маски больших сцен в исходном разрешении → {output_dir}/{имя}.npy."""
+    sw_cfg = cfg.sliding_window
+    print(OmegaConf.to_yaml(sw_cfg))
+    if sw_cfg.input is None:
+        raise ValueError("Укажите сцены: sliding_window.input=<папка|glob|файл>")
+
+    predictor = SlidingWindowPredictor(
+        maybe_tta(load_model(sw_cfg.model), cfg),
+        tile_size=sw_cfg.tile_size,
+        overlap=sw_cfg.overlap,
+        tile_batch=sw_cfg.tile_batch,
+        window=sw_cfg.window,
+    )
+    out_dir = Path(sw_cfg.output_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"{'scene':<24}{'size':>14}{'tiles':>8}{'seconds':>10}{'MP/s':>8}")
+    for path, s in predict_scenes(predictor, sw_cfg.input, out_dir):
+        size = f"{s['height']}×{s['width']}"
+        print(
+            f"{path.stem:<24}{size:>14}{s['tiles']:>8}{s['seconds']:>10.2f}"
+            f"{s['megapixels_per_sec']:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -10,7 +10,14 @@ from ..callbacks.callbacks import get_callbacks
 from ..data.datamodule import FloodNetDataModule
 from ..data.dataset_download import download_data_from_gdrive_folder
 from ..loggers.logger import get_loggers
+from ..models.distillation import DistillationLitModule
 from ..models.unet_lightning import UNetLitModule
+from ..utils.distributed import distributed_trainer_kwargs
+from ..utils.execution import (
+    apply_execution_mode,
+    compare_with_eager,
+    configure_threads,
+)
 from ..utils.seed import seed_everything
 
 
@@ -18,6 +25,8 @@ from ..utils.seed import seed_everything
 def main(cfg: DictConfig):
     print(OmegaConf.to_yaml(cfg))  # Для отладки
 
+    exec_cfg = cfg.trainer.get("execution", {})
+    configure_threads(exec_cfg)
     seed_everything(cfg.seed)
 
     output_dir = cfg.experiment.output_dir
@@ -34,25 +43,43 @@ def main(cfg: DictConfig):
         batch_size=cfg.data.batch_size,
         num_workers=cfg.data.num_workers,
         pin_memory=cfg.data.pin_memory,
+        persistent_workers=cfg.data.get("persistent_workers", False),
+        prefetch_factor=cfg.data.get("prefetch_factor"),
+        cache_dir=cfg.data.get("cache_dir"),
+        compact=cfg.data.get("compact", False),
+        gpu_augment=cfg.data.get("gpu_augment"),
+        tiling=cfg.data.get("tiling"),
+        shards=cfg.data.get("shards"),
+        sampler=cfg.data.get("sampler"),
     )
     dm.prepare_data()
     dm.setup()
 
-    lit_model = UNetLitModule(cfg)
+    # С distill.enabled студент (cfg.model) учится у замороженного учителя
+    if cfg.get("distill", {}).get("enabled", False):
+        lit_model = DistillationLitModule(cfg)
+    else:
+        lit_model = UNetLitModule(cfg)
 
     # Получаем список логгеров (MLflow и/или TensorBoard)
     loggers = get_loggers(cfg)
 
+    if exec_cfg.get("compare_eager", False):
+        compare_with_eager(lit_model, cfg, loggers)
+    apply_execution_mode(lit_model, exec_cfg)
+
     # Получаем список коллбеков (ModelCheckpoint + SaveMetricsPlotCallback, если включено)
     callbacks = get_callbacks(cfg)
 
     trainer = Trainer(
         max_epochs=cfg.trainer.max_epochs,
-        accelerator=cfg.trainer.accelerator,
-        devices=cfg.trainer.devices,
+        # accelerator/devices, а с trainer.distributed — DDP (gloo) на CPU
+        **distributed_trainer_kwargs(cfg.trainer),
         deterministic=cfg.trainer.deterministic,
         benchmark=cfg.trainer.benchmark,
         val_check_interval=cfg.trainer.val_check_interval,
+        # Прогрессивный ресайз меняет батч — train_dataloader пересоздаётся
+        reload_dataloaders_every_n_epochs=int(dm.progressive is not None),
         precision=cfg.trainer.precision,
         default_root_dir=cfg.trainer.default_root_dir,
         logger=loggers or None,
@@ -0,0 +1,158 @@
+# src/trainers/tune_data.py
+import itertools
+import os
+import time
+from typing import Dict, List
+
+import hydra
+from omegaconf import DictConfig, OmegaConf
+
+from ..data.datamodule import FloodNetDataModule
+
+
+def worker_rss_mb() -> float:
+    """Суммарный RSS дочерних процессов (воркеров DataLoader), МБ. Только Linux."""
+    pid = os.getpid()
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            children = f.read().split()
+    except OSError:
+        return float("nan")
+
+    total_kb = 0
+    for child in children:
+        try:
+            with open(f"/proc/{child}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+        except OSError:
+            continue
+    return total_kb / 1024
+
+
+def loader_grid(tune_cfg: DictConfig) -> List[Dict]:
+    """
+    Все сочетания настроек; без воркеров prefetch/persistent не перебираются.
+    compact (uint8-маски вместо int64) перебирается, чтобы выигрыш от
+    компактной передачи сэмплов был виден в том же замере.
+    """
+    grid = []
+    for workers, pin, compact in itertools.product(
+        tune_cfg.num_workers, tune_cfg.pin_memory, tune_cfg.get("compact", [False])
+    ):
+        if workers == 0:
+            grid.append(
+                dict(
+                    num_workers=0,
+                    pin_memory=pin,
+                    persistent_workers=False,
+                    prefetch_factor=None,
+                    compact=compact,
+                )
+            )
+            continue
+        for prefetch, persistent in itertools.product(
+            tune_cfg.prefetch_factor, tune_cfg.persistent_workers
+        ):
+            grid.append(
+                dict(
+                    num_workers=workers,
+                    pin_memory=pin,
+                    persistent_workers=persistent,
+                    prefetch_factor=prefetch,
+                    compact=compact,
+                )
+            )
+    return grid
+
+
+def benchmark_loader(cfg: DictConfig, settings: Dict) -> Dict:
+    """
+    Замер train_dataloader с заданными настройками: сэмплы/с, память воркеров
+    и объём батча (картинки + маски), который воркеры передают главному процессу.
+    """
+    dm = FloodNetDataModule(
+        data_dir=cfg.data.data_dir,
+        img_size=cfg.data.img_size,
+        batch_size=cfg.data.batch_size,
+        cache_dir=cfg.data.get("cache_dir"),
+        gpu_augment=cfg.data.get("gpu_augment"),
+        tiling=cfg.data.get("tiling"),
+        shards=cfg.data.get("shards"),
+        sampler=cfg.data.get("sampler"),
+        **settings,
+    )
+    dm.prepare_data()
+    dm.setup(stage="fit")
+    loader = dm.train_dataloader()
+
+    num_samples = 0
+    num_batches = 0
+    batch_bytes = 0
+    peak_rss = 0.0
+    start = time.perf_counter()
+    for _ in range(cfg.tune_data.epochs):
+        for step, (images, masks) in enumerate(loader):
+            num_samples += images.shape[0]
+            num_batches += 1
+            batch_bytes += images.nbytes + masks.nbytes
+            if step % 5 == 0:
+                peak_rss = max(peak_rss, worker_rss_mb())
+            if step + 1 >= cfg.tune_data.num_batches:
+                break
+    elapsed = time.perf_counter() - start
+
+    # Останавливаем persistent-воркеры до следующего замера
+    del loader
+    return {
+        **settings,
+        "samples_per_sec": num_samples / elapsed,
+        "worker_rss_mb": peak_rss,
+        "batch_mb": batch_bytes / max(num_batches, 1) / 2**20,
+    }
+
+
+def write_override(settings: Dict, path: str):
+    """Пишет лучшие настройки как config group `tuned` (`+tuned=data_loader`)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write("# @package _global_\n")
+        f.write("# Сгенерировано python -m src.trainers.tune_data\n")
+        f.write(OmegaConf.to_yaml({"data": settings}))
+
+
+@hydra.main(version_base="1.3", config_path="../../configs", config_name="config")
+def main(cfg: DictConfig):
+    results = []
+    for settings in loader_grid(cfg.tune_data):
+        result = benchmark_loader(cfg, settings)
+        results.append(result)
+        print(
+            f"workers={result['num_workers']:<2} pin={result['pin_memory']!s:<5} "
+            f"persistent={result['persistent_workers']!s:<5} "
+            f"prefetch={result['prefetch_factor']!s:<4} "
+            f"compact={result['compact']!s:<5} "
+            f"→ {result['samples_per_sec']:8.1f} samples/s, "
+            f"batch {result['batch_mb']:6.2f} MB, "
+            f"workers RSS {result['worker_rss_mb']:8.1f} MB"
+        )
+
+    best = max(results, key=lambda r: r["samples_per_sec"])
+    best_settings = {
+        key: best[key]
+        for key in (
+            "num_workers",
+            "pin_memory",
+            "persistent_workers",
+            "prefetch_factor",
+            "compact",
+        )
+    }
+    write_override(best_settings, cfg.tune_data.output)
+    print(f"Best: {best_settings} ({best['samples_per_sec']:.1f} samples/s)")
+    print(f"Saved to {cfg.tune_data.output}; use it with `+tuned=data_loader`")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+from pytorch_lightning.strategies import DDPStrategy
+
+
+def distributed_trainer_kwargs(trainer_cfg) -> dict:
+    """
+    accelerator / devices / num_nodes / strategy для Trainer.
+
+    С trainer.distributed.enabled — DDP на gloo: num_processes процессов на
+    узел, num_nodes узлов. Для нескольких узлов на каждом задаются
+    MASTER_ADDR, MASTER_PORT и NODE_RANK (см. README).
+    """
+    dist_cfg = trainer_cfg.get("distributed") or {}
+    if not dist_cfg.get("enabled", False):
+        return dict(accelerator=trainer_cfg.accelerator, devices=trainer_cfg.devices)
+
+    return dict(
+        accelerator=dist_cfg.get("accelerator", "cpu"),
+        devices=dist_cfg.get("num_processes", 2),
+        num_nodes=dist_cfg.get("num_nodes", 1),
+        strategy=DDPStrategy(
+            process_group_backend=dist_cfg.get("backend", "gloo"),
+            find_unused_parameters=dist_cfg.get("find_unused_parameters", False),
+        ),
+    )
@@ -0,0 +1,153 @@
+import copy
+import time
+from typing import Dict, Optional
+
+import torch
+
+
+def autocast_dtype(precision) -> Optional[torch.dtype]:
+    """dtype autocast для значения trainer.precision (None — без autocast)."""
+    precision = str(precision)
+    if precision.startswith("bf16"):
+        return torch.bfloat16
+    if precision.startswith("16"):
+        return torch.float16
+    return None
+
+
+def configure_threads(exec_cfg):
+    """
+    Потоки CPU: intra-op (внутри одного оператора) и inter-op (между
+    независимыми операторами). Вызывать до первой параллельной работы torch.
+    """
+    threads = exec_cfg.get("cpu_threads") or {}
+    if threads.get("intra_op"):
+        torch.set_num_threads(threads["intra_op"])
+    if threads.get("inter_op"):
+        torch.set_num_interop_threads(threads["inter_op"])
+
+
+def apply_execution_mode(lit_model, exec_cfg):
+    """
+    channels_last для весов и батчей и torch.compile модели.
+    Module.compile() компилирует на месте, поэтому имена параметров
+    и формат чекпоинта не меняются.
+    """
+    if exec_cfg.get("channels_last", False):
+        lit_model.channels_last = True
+        lit_model.model.to(memory_format=torch.channels_last)
+
+    compile_cfg = exec_cfg.get("compile") or {}
+    if compile_cfg.get("enabled", False):
+        lit_model.model.compile(
+            backend=compile_cfg.get("backend", "inductor"),
+            mode=compile_cfg.get("mode"),
+        )
+    return lit_model
+
+
+class SavedActivationMeter:
+    """
+    Пиковый объём тензоров, сохранённых autograd для backward (без параметров),
+    через saved_tensors_hooks. Работает и на CPU, где нет max_memory_allocated.
+    Одно хранилище, сохранённое несколькими операциями, считается один раз.
+    """
+
+    def __init__(self):
+        self.current = {}
+        self.peak_bytes = 0
+
+    def pack(self, tensor: torch.Tensor):
+        if not isinstance(tensor, torch.nn.Parameter):
+            storage = tensor.untyped_storage()
+            self.current[storage.data_ptr()] = storage.nbytes()
+            self.peak_bytes = max(self.peak_bytes, sum(self.current.values()))
+        return tensor
+
+    def unpack(self, tensor: torch.Tensor) -> torch.Tensor:
+        return tensor
+
+    def hooks(self):
+        self.current = {}
+        return torch.autograd.graph.saved_tensors_hooks(self.pack, self.unpack)
+
+
+def train_step_stats(
+    lit_model,
+    batch_size: int,
+    img_size: int,
+    device: torch.device,
+    precision=32,
+    steps: int = 5,
+    warmup: int = 2,
+) -> Dict[str, float]:
+    """
+    Шаг обучения (forward + backward + Adam) на синтетическом батче:
+      step_ms      — среднее время шага, мс;
+      peak_mem_mb  — пик памяти: на CUDA max_memory_allocated, на CPU — пик
+                     сохранённых для backward активаций.
+    Модель копируется, исходная не меняется.
+    """
+    model = copy.deepcopy(lit_model).to(device).train()
+    optimizer = torch.optim.Adam(model.parameters(), lr=1e-4)
+    images = torch.randint(
+        0, 256, (batch_size, 3, img_size, img_size), dtype=torch.uint8, device=device
+    )
+    masks = torch.randint(
+        0, model.num_classes, (batch_size, img_size, img_size), device=device
+    )
+    dtype = autocast_dtype(precision)
+    meter = SavedActivationMeter()
+    if device.type == "cuda":
+        torch.cuda.reset_peak_memory_stats(device)
+
+    elapsed = 0.0
+    for step in range(warmup + steps):
+        start = time.perf_counter()
+        with meter.hooks():
+            with torch.autocast(device.type, dtype=dtype, enabled=dtype is not None):
+                loss = model.criterion(model(images), masks)
+        optimizer.zero_grad(set_to_none=True)
+        loss.backward()
+        optimizer.step()
+        if device.type == "cuda":
+            torch.cuda.synchronize()
+        if step >= warmup:
+            elapsed += time.perf_counter() - start
+
+    if device.type == "cuda":
+        peak_bytes = torch.cuda.max_memory_allocated(device)
+    else:
+        peak_bytes = meter.peak_bytes
+    return {"step_ms": elapsed / steps * 1000, "peak_mem_mb": peak_bytes / 2**20}
+
+
+def compare_with_eager(lit_model, cfg, loggers=()) -> dict:
+    """Сравнивает время шага настроенного режима с eager NCHW и логирует результат."""
+    exec_cfg = cfg.trainer.execution
+    use_cuda = cfg.trainer.accelerator == "gpu" and torch.cuda.is_available()
+    device = torch.device("cuda" if use_cuda else "cpu")
+    kwargs = dict(
+        batch_size=cfg.data.batch_size,
+        img_size=cfg.data.img_size,
+        device=device,
+        precision=cfg.trainer.precision,
+        steps=exec_cfg.get("compare_steps", 5),
+    )
+
+    eager_ms = train_step_stats(lit_model, **kwargs)["step_ms"]
+    configured = apply_execution_mode(copy.deepcopy(lit_model), exec_cfg)
+    configured_ms = train_step_stats(configured, **kwargs)["step_ms"]
+
+    metrics = {
+        "step_ms_eager": eager_ms,
+        "step_ms_configured": configured_ms,
+        "step_speedup": eager_ms / configured_ms,
+    }
+    print(
+        f"Train step: eager {eager_ms:.1f} ms, configured {configured_ms:.1f} ms "
+        f"(x{metrics['step_speedup']:.2f})"
+    )
+    for logger in loggers:
+        logger.log_metrics(metrics, step=0)
+    return metrics
@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+
+@pytest.fixture
+def floodnet_dir(tmp_path):
+    """
+    Создаёт во временной папке маленький датасет в формате FloodNet:
+    {train,test}/image/*.jpg и {train,test}/mask/*.png.
+    """
+    rng = np.random.default_rng(0)
+    for phase, n in (("train", 3), ("test", 2)):
+        (tmp_path / phase / "image").mkdir(parents=True)
+        (tmp_path / phase / "mask").mkdir(parents=True)
+        for i in range(n):
+            image = rng.integers(0, 256, size=(40, 48, 3), dtype=np.uint8)
+            mask = rng.integers(0, 8, size=(40, 48), dtype=np.uint8)
+            Image.fromarray(image).save(tmp_path / phase / "image" / f"{i}.jpg")
+            Image.fromarray(mask).save(tmp_path / phase / "mask" / f"{i}.png")
+    return tmp_path
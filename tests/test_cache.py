@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+import torch
+
+from src.data.cache import cache_split_dir, ensure_sample_cache, read_cache_index
+from src.data.dataset import FloodNetDataset
+
+
+def test_cached_dataset_matches_decoded(floodnet_dir, tmp_path):
+    cache_root = str(tmp_path / "cache")
+    plain = FloodNetDataset(str(floodnet_dir), "train", img_size=32)
+    cached = FloodNetDataset(
+        str(floodnet_dir), "train", img_size=32, cache_dir=cache_root
+    )
+    assert len(cached) == len(plain)
+
+    plain_by_id = {item: plain[i] for i, item in enumerate(plain.items)}
+    for i, item in enumerate(cached.items):
+        image, mask = cached[i]
+        ref_image, ref_mask = plain_by_id[item]
+        assert torch.equal(image, ref_image)
+        assert torch.equal(mask, ref_mask)
+
+
+def test_cache_invalidation(floodnet_dir, tmp_path):
+    cache_root = str(tmp_path / "cache")
+    split_dir = ensure_sample_cache(str(floodnet_dir), "train", 32, cache_root)
+    fingerprint = read_cache_index(split_dir)["fingerprint"]
+
+    # Без изменений кэш не пересобирается
+    mtime = os.stat(os.path.join(split_dir, "index.json")).st_mtime_ns
+    ensure_sample_cache(str(floodnet_dir), "train", 32, cache_root)
+    assert os.stat(os.path.join(split_dir, "index.json")).st_mtime_ns == mtime
+
+    # Изменился исходный файл — новый отпечаток
+    mask_path = floodnet_dir / "train" / "mask" / "0.png"
+    os.utime(mask_path, ns=(0, 0))
+    ensure_sample_cache(str(floodnet_dir), "train", 32, cache_root)
+    assert read_cache_index(split_dir)["fingerprint"] != fingerprint
+    # Старый кэш подменён и удалён, временных папок не осталось
+    assert not [
+        name
+        for name in os.listdir(os.path.dirname(split_dir))
+        if ".old-" in name or ".tmp-" in name
+    ]
+
+    # Другой img_size — отдельный кэш нужного размера
+    other = ensure_sample_cache(str(floodnet_dir), "train", 16, cache_root)
+    assert other == cache_split_dir(cache_root, "train", 16)
+    images = np.load(os.path.join(other, "images.npy"), mmap_mode="r")
+    assert images.shape == (3, 16, 16, 3)
@@ -0,0 +1,38 @@
+import numpy as np
+
+from src.data.class_stats import (
+    class_balanced_weights,
+    dataset_statistics,
+    ensure_class_histogram,
+)
+
+
+def test_histogram_counts_every_pixel(floodnet_dir, tmp_path):
+    items, counts = ensure_class_histogram(str(floodnet_dir), "train", 8, str(tmp_path))
+    assert len(items) == 3
+    assert counts.shape == (3, 8)
+    assert (counts.sum(axis=1) == 40 * 48).all()
+
+    # Повторный вызов читает сохранённый индекс
+    items_again, counts_again = ensure_class_histogram(
+        str(floodnet_dir), "train", 8, str(tmp_path)
+    )
+    assert items_again == items
+    assert np.array_equal(counts_again, counts)
+
+
+def test_images_with_rare_classes_get_larger_weights():
+    counts = np.array(
+        [
+            [100, 0, 0],
+            [90, 10, 0],
+            [95, 0, 5],
+        ]
+    )
+    weights = class_balanced_weights(counts, power=1.0)
+    assert weights[0] < weights[1] < weights[2]
+    assert np.allclose(class_balanced_weights(counts, power=0.0), 1.0)
+
+    stats = dataset_statistics(counts)
+    assert stats["Background"]["image_fraction"] == 1.0
+    assert np.isclose(stats["Road"]["pixel_fraction"], 5 / 300)
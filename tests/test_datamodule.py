@@ -0,0 +1,11 @@
+from src.data.datamodule import DistributedEvalSampler
+
+
+def test_distributed_eval_sampler_covers_dataset_without_duplicates():
+    dataset = list(range(7))
+    shards = [
+        list(DistributedEvalSampler(dataset, num_replicas=3, rank=r)) for r in range(3)
+    ]
+    assert [len(s) for s in shards] == [3, 2, 2]
+    assert sorted(i for s in shards for i in s) == dataset
+    assert len(DistributedEvalSampler(dataset, num_replicas=3, rank=2)) == 2
@@ -0,0 +1,16 @@
+import torch
+
+from src.data.dataset import FloodNetDataset
+
+
+def test_compact_mode_keeps_values_in_uint8(floodnet_dir):
+    full = FloodNetDataset(str(floodnet_dir), "train", img_size=32)
+    compact = FloodNetDataset(str(floodnet_dir), "train", img_size=32, compact=True)
+
+    image, mask = full[0]
+    compact_image, compact_mask = compact[0]
+    assert image.dtype == compact_image.dtype == torch.uint8
+    assert mask.dtype == torch.long
+    assert compact_mask.dtype == torch.uint8
+    assert torch.equal(compact_mask.long(), mask)
+    assert compact_mask.nbytes * 8 == mask.nbytes
@@ -0,0 +1,12 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.trainers.ddp_benchmark import ThroughputCallback
+
+
+def test_throughput_callback_rejects_epoch_shorter_than_warmup(tmp_path):
+    callback = ThroughputCallback(warmup_batches=2, output_path=str(tmp_path / "r"))
+    with pytest.raises(ValueError, match="warmup_batches=2"):
+        callback.on_train_start(SimpleNamespace(num_training_batches=2), None)
+    callback.on_train_start(SimpleNamespace(num_training_batches=3), None)
@@ -0,0 +1,54 @@
+import time
+
+import torch
+
+from src.models.distillation import TeacherLogitCache, block_channels, kd_loss
+from src.models.unet_model import UNet
+
+
+def test_kd_loss_zero_for_identical_logits():
+    logits = torch.randn(2, 8, 4, 4)
+    assert kd_loss(logits, logits.clone(), temperature=2.0).abs() < 1e-6
+    assert kd_loss(logits, torch.randn(2, 8, 4, 4), temperature=2.0) > 0
+
+
+def test_teacher_logit_cache_computes_only_misses(tmp_path):
+    cache = TeacherLogitCache(tmp_path)
+    calls = []
+
+    def teacher(images):
+        calls.append(len(images))
+        return images.float().mean(dim=1, keepdim=True).repeat(1, 3, 1, 1)
+
+    images = torch.randint(0, 256, (3, 3, 4, 4), dtype=torch.uint8)
+    first = cache.get_or_compute(images[:2], teacher)
+    second = cache.get_or_compute(images, teacher)
+
+    assert calls == [2, 1]
+    assert (cache.hits, cache.misses) == (2, 3)
+    torch.testing.assert_close(second[:2], first, rtol=1e-3, atol=0.1)
+    torch.testing.assert_close(second, teacher(images), rtol=1e-3, atol=0.1)
+
+
+def test_teacher_logit_cache_evicts_least_recently_used(tmp_path):
+    cache = TeacherLogitCache(tmp_path, max_size_mb=0.0035)  # 3 записи по 1152 байта
+
+    def teacher(images):
+        return images.float().repeat(1, 2, 1, 1)
+
+    images = torch.randint(0, 256, (4, 1, 16, 16), dtype=torch.uint8)
+    for i in range(4):
+        cache.get_or_compute(images[i : i + 1], teacher)
+        time.sleep(0.01)
+    cache.get_or_compute(images[:1], teacher)  # первая запись снова свежая
+
+    assert cache.evict() == 1
+    assert cache.path(cache.key(images[0])).exists()
+    assert not cache.path(cache.key(images[1])).exists()
+
+
+def test_block_channels():
+    model = UNet(8, base_channels=4, depth=3)
+    assert block_channels(model, "enc_conv1") == 4
+    assert block_channels(model, "bottleneck") == 32
+    assert block_channels(model, "dec_conv3") == 4
@@ -0,0 +1,51 @@
+import torch
+from omegaconf import OmegaConf
+
+from src.models.unet_lightning import UNetLitModule
+from src.utils.execution import apply_execution_mode, autocast_dtype, train_step_stats
+
+
+def small_lit_model():
+    cfg = OmegaConf.create(
+        {"model": {"num_classes": 3, "lr": 1e-3, "base_channels": 4, "depth": 2}}
+    )
+    return UNetLitModule(cfg)
+
+
+def test_autocast_dtype():
+    assert autocast_dtype("bf16-mixed") is torch.bfloat16
+    assert autocast_dtype("16-mixed") is torch.float16
+    assert autocast_dtype(32) is None
+
+
+def test_channels_last_matches_eager():
+    torch.manual_seed(0)
+    model = small_lit_model().eval()
+    images = torch.randint(0, 256, (2, 3, 32, 32), dtype=torch.uint8)
+    expected = model(images)
+
+    apply_execution_mode(model, {"channels_last": True})
+    assert model.model.final_conv.weight.is_contiguous(
+        memory_format=torch.channels_last
+    )
+    torch.testing.assert_close(model(images), expected, rtol=1e-4, atol=1e-4)
+
+
+def test_train_step_stats_keeps_weights():
+    model = small_lit_model()
+    before = model.model.final_conv.weight.clone()
+    stats = train_step_stats(
+        model, batch_size=2, img_size=32, device=torch.device("cpu"), steps=1, warmup=0
+    )
+    assert stats["step_ms"] > 0 and stats["peak_mem_mb"] > 0
+    assert torch.equal(model.model.final_conv.weight, before)
+
+
+def test_activation_checkpointing_reduces_saved_memory():
+    model = small_lit_model()
+    kwargs = dict(batch_size=2, img_size=32, device=torch.device("cpu"), steps=1)
+    plain = train_step_stats(model, warmup=0, **kwargs)
+
+    model.model.set_activation_checkpointing("all")
+    checkpointed = train_step_stats(model, warmup=0, **kwargs)
+    assert checkpointed["peak_mem_mb"] < plain["peak_mem_mb"]
@@ -0,0 +1,73 @@
+import pytest
+import torch
+from torch import nn
+
+from src.models.export import (
+    ExportWrapper,
+    export_onnx,
+    export_torchscript,
+    fold_conv_bn,
+    parity_check,
+)
+from src.models.runtime import load_predictor
+from src.models.unet_model import UNet
+
+
+def trained_like_unet(block_type: str = "standard") -> UNet:
+    """Маленькая UNet с неединичными статистиками BN, как после обучения."""
+    torch.manual_seed(0)
+    model = UNet(3, "pad", base_channels=4, depth=2, block_type=block_type)
+    for m in model.modules():
+        if isinstance(m, nn.BatchNorm2d):
+            m.running_mean.uniform_(-1, 1)
+            m.running_var.uniform_(0.5, 2)
+            m.weight.data.uniform_(0.5, 1.5)
+            m.bias.data.uniform_(-0.5, 0.5)
+    return model.eval()
+
+
+@pytest.mark.parametrize("block_type", ["standard", "depthwise", "inverted"])
+def test_fold_conv_bn_matches_original(block_type):
+    model = trained_like_unet(block_type)
+    folded = fold_conv_bn(model)
+    assert not any(isinstance(m, nn.BatchNorm2d) for m in folded.modules())
+
+    images = torch.rand(2, 3, 16, 16) * 255
+    parity = parity_check(model, folded, images)
+    assert parity["max_abs_diff"] < 1e-3
+    assert parity["argmax_agreement"] == 1.0
+
+
+def test_torchscript_artifact_roundtrip(tmp_path):
+    model = trained_like_unet()
+    mean, std = torch.full((1, 3, 1, 1), 120.0), torch.full((1, 3, 1, 1), 60.0)
+    wrapper = ExportWrapper(fold_conv_bn(model), mean, std).eval()
+    path = tmp_path / "unet.pt"
+    export_torchscript(wrapper, torch.rand(1, 3, 16, 16), path, {"img_size": 16})
+
+    predictor = load_predictor(path)
+    assert predictor.img_size == 16
+    images = torch.randint(0, 256, (3, 3, 16, 16), dtype=torch.uint8)
+    expected = model((images.float() - mean) / std)
+    torch.testing.assert_close(predictor(images), expected, rtol=1e-4, atol=1e-4)
+    assert predictor.predict(images).dtype == torch.uint8
+    # Трассировка зашила размер 16: другой размер — ошибка, а не неверные маски
+    with pytest.raises(ValueError, match="16×16"):
+        predictor(torch.zeros(1, 3, 24, 24, dtype=torch.uint8))
+
+
+def test_onnx_artifact_roundtrip(tmp_path):
+    pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    wrapper = ExportWrapper(fold_conv_bn(trained_like_unet())).eval()
+    path = tmp_path / "unet.onnx"
+    export_onnx(wrapper, torch.rand(1, 3, 16, 16), path, {"img_size": 16}, opset=17)
+
+    images = torch.rand(2, 3, 16, 16) * 255
+    parity = parity_check(wrapper, load_predictor(path), images)
+    assert parity["max_abs_diff"] < 1e-3
+
+
+def test_unknown_artifact_format(tmp_path):
+    with pytest.raises(ValueError):
+        load_predictor(tmp_path / "model.bin")
@@ -0,0 +1,167 @@
+import hashlib
+import io
+import tarfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.data.fetch import fetch_and_extract
+
+TAR_NAME = "tiny-floodnet-challenge.tar.gz"
+
+
+def make_archive(files):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        for name, data in files.items():
+            info = tarfile.TarInfo(f"tiny-floodnet-challenge/{name}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+class ArchiveServer:
+    """
+    Локальная замена файлового хостинга: HEAD, GET, Range и ETag.
+    validators=False — HEAD без ETag и Content-Length, как у редиректов Drive.
+    """
+
+    def __init__(self, payload: bytes):
+        self.payload = payload
+        self.validators = True
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _etag(self):
+                return '"' + hashlib.md5(server.payload).hexdigest() + '"'
+
+            def do_HEAD(self):
+                server.requests.append(("HEAD", None))
+                self.send_response(200)
+                if server.validators:
+                    self.send_header("Content-Length", str(len(server.payload)))
+                    self.send_header("ETag", self._etag())
+                self.end_headers()
+
+            def do_GET(self):
+                range_header = self.headers.get("Range")
+                server.requests.append(("GET", range_header))
+                if_range = self.headers.get("If-Range")
+                if range_header and (if_range is None or if_range == self._etag()):
+                    start = int(range_header.split("=")[1].rstrip("-"))
+                    body = server.payload[start:]
+                    self.send_response(206)
+                else:
+                    body = server.payload
+                    self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", self._etag())
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/{TAR_NAME}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+
+
+FILES = {
+    "train/image/0.jpg": b"image-0" * 1000,
+    "train/mask/0.png": b"mask-0" * 1000,
+    "test/image/1.jpg": b"image-1" * 1000,
+    "test/mask/1.png": b"mask-1" * 1000,
+    "README.txt": b"not a subset",
+}
+
+
+@pytest.fixture
+def server():
+    srv = ArchiveServer(make_archive(FILES))
+    yield srv
+    srv.close()
+
+
+def fetch(server, dest, **kwargs):
+    return fetch_and_extract(
+        url=server.url,
+        dest_dir=dest,
+        tar_name=TAR_NAME,
+        subsets=["train", "test"],
+        manifest_path=dest / "manifest.json",
+        **kwargs,
+    )
+
+
+def test_fetch_extracts_and_skips_unchanged(server, tmp_path):
+    sha = hashlib.sha256(server.payload).hexdigest()
+    assert fetch(server, tmp_path, expected_sha256=sha)
+    for name, data in FILES.items():
+        if name.startswith(("train/", "test/")):
+            assert (tmp_path / name).read_bytes() == data
+    assert not (tmp_path / "README.txt").exists()
+    assert not (tmp_path / f"{TAR_NAME}.part").exists()
+
+    server.requests.clear()
+    assert not fetch(server, tmp_path)
+    assert server.requests == [("HEAD", None)]
+
+
+def test_fetch_trusts_manifest_when_server_sends_no_validators(server, tmp_path):
+    sha = hashlib.sha256(server.payload).hexdigest()
+    fetch(server, tmp_path, expected_sha256=sha)
+
+    server.validators = False
+    server.requests.clear()
+    assert not fetch(server, tmp_path, expected_sha256=sha)
+    assert server.requests == [("HEAD", None)]
+
+    # Другая ожидаемая сумма — архив качается заново, даже без валидаторов
+    server.payload = make_archive({**FILES, "train/mask/0.png": b"new-mask"})
+    new_sha = hashlib.sha256(server.payload).hexdigest()
+    assert fetch(server, tmp_path, expected_sha256=new_sha)
+    assert (tmp_path / "train/mask/0.png").read_bytes() == b"new-mask"
+
+
+def test_fetch_resumes_partial_download(server, tmp_path):
+    half = len(server.payload) // 2
+    (tmp_path / f"{TAR_NAME}.part").write_bytes(server.payload[:half])
+
+    assert fetch(server, tmp_path, expected_sha256=None)
+    assert ("GET", f"bytes={half}-") in server.requests
+    assert (tmp_path / "test/mask/1.png").read_bytes() == FILES["test/mask/1.png"]
+
+
+def test_fetch_rewrites_only_changed_files(server, tmp_path):
+    fetch(server, tmp_path)
+    unchanged = tmp_path / "train/image/0.jpg"
+    mtime = unchanged.stat().st_mtime_ns
+
+    server.payload = make_archive({**FILES, "train/mask/0.png": b"new-mask"})
+    assert fetch(server, tmp_path)
+    assert (tmp_path / "train/mask/0.png").read_bytes() == b"new-mask"
+    assert unchanged.stat().st_mtime_ns == mtime
+
+
+def test_fetch_checks_archive_sha256(server, tmp_path):
+    with pytest.raises(ValueError):
+        fetch(server, tmp_path, expected_sha256="0" * 64)
+    assert not (tmp_path / "manifest.json").exists()
+
+
+def test_fetch_bad_checksum_keeps_existing_data(server, tmp_path):
+    fetch(server, tmp_path)
+    manifest = (tmp_path / "manifest.json").read_bytes()
+
+    server.payload = make_archive({**FILES, "train/mask/0.png": b"tampered"})
+    with pytest.raises(ValueError):
+        fetch(server, tmp_path, expected_sha256="0" * 64)
+    assert (tmp_path / "train/mask/0.png").read_bytes() == FILES["train/mask/0.png"]
+    assert (tmp_path / "manifest.json").read_bytes() == manifest
+    assert not list(tmp_path.parent.glob(f".{tmp_path.name}.staging-*"))
@@ -0,0 +1,35 @@
+import torch
+
+from src.data.gpu_augment import BatchAugment
+
+
+def test_identity_params_keep_batch():
+    images = torch.randint(0, 256, (2, 3, 16, 16), dtype=torch.uint8)
+    masks = torch.randint(0, 8, (2, 16, 16))
+    augment = BatchAugment(
+        out_size=16, scale=(1.0, 1.0), ratio=(1.0, 1.0), hflip=0.0, vflip=0.0
+    )
+
+    out_images, out_masks = augment(images, masks)
+    assert out_images.dtype == torch.float32
+    assert torch.allclose(out_images, images.float(), atol=1e-3)
+    assert torch.equal(out_masks, masks)
+
+
+def test_flip_and_resize_apply_to_image_and_mask_together():
+    masks = torch.randint(0, 8, (4, 32, 32), dtype=torch.uint8)
+    # Картинка совпадает с маской, поэтому после общей сетки они должны совпасть
+    images = masks.unsqueeze(1).repeat(1, 3, 1, 1)
+    augment = BatchAugment(out_size=16, scale=(0.3, 1.0), hflip=0.5, vflip=0.5)
+
+    out_images, out_masks = augment(images, masks)
+    assert out_images.shape == (4, 3, 16, 16)
+    assert out_masks.shape == (4, 16, 16)
+    assert out_masks.dtype == torch.uint8
+    assert set(out_masks.unique().tolist()) <= set(masks.unique().tolist())
+
+    hflip = BatchAugment(
+        out_size=32, scale=(1.0, 1.0), ratio=(1.0, 1.0), hflip=1.0, vflip=0.0
+    )
+    _, flipped = hflip(images, masks)
+    assert torch.equal(flipped, masks.flip(-1))
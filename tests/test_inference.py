@@ -0,0 +1,186 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+import torch
+from omegaconf import OmegaConf
+from PIL import Image
+
+from src.data.image_folder import list_images
+from src.data.prediction_store import PredictionStore
+from src.models.export import ExportWrapper, export_torchscript
+from src.models.unet_model import UNet
+from src.trainers.inference import apply_palette, run_inference, save_mask
+
+PALETTE = {i: [i * 30, 0, 0] for i in range(3)}
+
+
+@pytest.fixture
+def image_dir(tmp_path):
+    rng = np.random.default_rng(0)
+    folder = tmp_path / "scenes"
+    folder.mkdir()
+    for i in range(5):
+        image = rng.integers(0, 256, size=(20, 24, 3), dtype=np.uint8)
+        Image.fromarray(image).save(folder / f"scene_{i}.png")
+    (folder / "notes.txt").write_text("not an image")
+    return folder
+
+
+@pytest.fixture
+def artifact(tmp_path):
+    torch.manual_seed(0)
+    model = UNet(3, "pad", base_channels=4, depth=2).eval()
+    path = tmp_path / "unet.pt"
+    example = torch.rand(1, 3, 16, 16)
+    export_torchscript(ExportWrapper(model).eval(), example, path, {"img_size": 16})
+    return path
+
+
+def test_list_images_dir_glob_and_list(image_dir):
+    assert [p.name for p in list_images(str(image_dir))] == [
+        f"scene_{i}.png" for i in range(5)
+    ]
+    assert len(list_images(str(image_dir / "scene_[01].png"))) == 2
+    files = [str(image_dir / "scene_3.png"), str(image_dir / "scene_4.png")]
+    assert [p.name for p in list_images(files)] == ["scene_3.png", "scene_4.png"]
+
+    with pytest.raises(ValueError):
+        list_images(str(image_dir / "missing.png"))
+    with pytest.raises(ValueError):
+        list_images([str(image_dir), str(image_dir / "scene_0.png")])
+
+
+def test_run_inference_batches_directory(image_dir, artifact, tmp_path):
+    cfg = OmegaConf.create(
+        {
+            "seed": 0,
+            "data": {"img_size": 16, "num_workers": 0, "pin_memory": False},
+            "inference": {
+                "model": str(artifact),
+                "input": str(image_dir),
+                "output_dir": str(tmp_path / "out"),
+                "batch_size": 2,
+                "num_workers": 0,
+                "write_threads": 2,
+                "max_pending_batches": 1,
+                "need_data_download": False,
+            },
+            "palette": PALETTE,
+        }
+    )
+    stats = run_inference(cfg)
+
+    outputs = sorted((tmp_path / "out" / "predicted").iterdir())
+    assert [p.name for p in outputs] == [f"scene_{i}.png" for i in range(5)]
+    assert np.asarray(Image.open(outputs[0])).shape == (16, 16)
+    for stage in ("decode", "decode_wait", "model", "write", "total"):
+        assert stats[stage]["images"] == 5
+        assert stats[stage]["images_per_sec"] > 0
+
+
+def test_run_inference_skips_small_and_broken_images(image_dir, artifact, tmp_path):
+    Image.fromarray(np.zeros((8, 24, 3), dtype=np.uint8)).save(image_dir / "tiny.png")
+    (image_dir / "broken.png").write_bytes(b"not a png")
+    cfg = OmegaConf.create(
+        {
+            "seed": 0,
+            "data": {"img_size": 16, "num_workers": 0, "pin_memory": False},
+            "inference": {
+                "model": str(artifact),
+                "input": str(image_dir),
+                "output_dir": str(tmp_path / "out"),
+                "batch_size": 4,
+                "num_workers": 0,
+                "need_data_download": False,
+            },
+            "palette": PALETTE,
+        }
+    )
+    stats = run_inference(cfg)
+
+    outputs = sorted(p.name for p in (tmp_path / "out" / "predicted").iterdir())
+    assert outputs == [f"scene_{i}.png" for i in range(5)]
+    assert sorted(Path(p).name for p in stats["skipped"]) == ["broken.png", "tiny.png"]
+    assert stats["total"]["images"] == 5
+
+
+def test_run_inference_writes_prediction_store(image_dir, artifact, tmp_path):
+    cfg = OmegaConf.create(
+        {
+            "seed": 0,
+            "data": {"img_size": 16, "num_workers": 0, "pin_memory": False},
+            "inference": {
+                "model": str(artifact),
+                "input": [
+                    str(image_dir / "scene_1.png"),
+                    str(image_dir / "scene_2.png"),
+                ],
+                "output_dir": str(tmp_path / "out"),
+                "batch_size": 4,
+                "num_workers": 0,
+                "output_format": "store",
+                "need_data_download": False,
+            },
+            "palette": PALETTE,
+        }
+    )
+    run_inference(cfg)
+
+    store = PredictionStore(tmp_path / "out" / "predicted.store")
+    assert store.names == ["scene_1", "scene_2"]
+    assert store["scene_1"].shape == (16, 16)
+    assert store.metadata["palette"]["1"] == [30, 0, 0]
+
+
+def test_run_inference_serves_unchanged_images_from_cache(
+    image_dir, artifact, tmp_path
+):
+    cfg = OmegaConf.create(
+        {
+            "seed": 0,
+            "data": {"img_size": 16, "num_workers": 0, "pin_memory": False},
+            "inference": {
+                "model": str(artifact),
+                "input": str(image_dir),
+                "output_dir": str(tmp_path / "out"),
+                "batch_size": 2,
+                "num_workers": 0,
+                "need_data_download": False,
+                "cache": {
+                    "enabled": True,
+                    "dir": str(tmp_path / "cache"),
+                    "max_size_mb": 16,
+                },
+            },
+            "palette": PALETTE,
+        }
+    )
+    first = run_inference(cfg)
+    assert first["cache"]["hits"] == 0 and first["cache"]["misses"] == 5
+    expected = np.asarray(Image.open(tmp_path / "out" / "predicted" / "scene_3.png"))
+
+    Image.fromarray(np.zeros((20, 24, 3), dtype=np.uint8)).save(
+        image_dir / "scene_0.png"
+    )
+    second = run_inference(cfg)
+    assert second["cache"]["hits"] == 4 and second["cache"]["misses"] == 1
+    assert second["model"]["images"] == 1
+    assert second["total"]["images"] == 5
+    np.testing.assert_array_equal(
+        np.asarray(Image.open(tmp_path / "out" / "predicted" / "scene_3.png")),
+        expected,
+    )
+
+
+def test_palette_lut_and_paletted_png(tmp_path):
+    mask = np.array([[0, 1], [2, 7]], dtype=np.uint8)
+    rgb = np.asarray(apply_palette(mask, PALETTE))
+    assert rgb[0, 1].tolist() == [30, 0, 0]
+    assert rgb[1, 1].tolist() == [0, 0, 0]  # класса нет в палитре
+
+    save_mask(mask, tmp_path / "p.png", PALETTE)
+    image = Image.open(tmp_path / "p.png")
+    assert image.mode == "P"
+    np.testing.assert_array_equal(np.asarray(image), mask)
+    np.testing.assert_array_equal(np.asarray(image.convert("RGB")), rgb)
@@ -0,0 +1,48 @@
+import torch
+
+from src.models.unet_lightning import calc_val_data, calc_val_loss
+
+
+def reference_metrics(preds, masks, num_classes, eps=1e-7):
+    """Прежний расчёт через попиксельные intersection/union/target."""
+    labels = preds.argmax(dim=1)
+    inter, union, target = [], [], []
+    for c in range(num_classes):
+        p, g = labels == c, masks == c
+        inter.append((p & g).sum().double())
+        union.append((p | g).sum().double())
+        target.append(g.sum().double())
+    inter, union, target = map(torch.stack, (inter, union, target))
+    mean_iou = ((inter + eps) / (union + eps)).mean().item()
+    mean_recall = ((inter + eps) / (target + eps)).mean().item()
+    mean_acc = ((inter.sum() + eps) / (masks.numel() + eps)).item()
+    return mean_iou, mean_recall, mean_acc
+
+
+def test_confusion_matrix_counts():
+    logits = torch.zeros(1, 3, 1, 4)
+    logits[0, [0, 1, 1, 2], 0, [0, 1, 2, 3]] = 1  # предсказания 0, 1, 1, 2
+    masks = torch.tensor([[[0, 1, 2, 2]]])
+    expected = torch.tensor([[1, 0, 0], [0, 1, 0], [0, 1, 1]])
+    assert torch.equal(calc_val_data(logits, masks, 3), expected)
+
+
+def test_streaming_matches_whole_dataset():
+    torch.manual_seed(0)
+    num_classes = 5
+    preds = torch.randn(6, num_classes, 8, 8)
+    masks = torch.randint(0, num_classes, (6, 8, 8))
+
+    confusion = torch.zeros(num_classes, num_classes, dtype=torch.long)
+    for i in range(0, 6, 2):
+        confusion += calc_val_data(preds[i : i + 2], masks[i : i + 2], num_classes)
+
+    expected = reference_metrics(preds, masks, num_classes)
+    for value, ref in zip(calc_val_loss(confusion), expected):
+        assert abs(value - ref) < 1e-9
+
+
+def test_out_of_range_labels_are_ignored():
+    preds = torch.randn(1, 3, 2, 2)
+    masks = torch.tensor([[[0, 255], [1, 2]]])
+    assert calc_val_data(preds, masks, 3).sum() == 3
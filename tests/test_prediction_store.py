@@ -0,0 +1,56 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from src.data.prediction_store import PredictionStore, PredictionStoreWriter
+
+
+def test_store_roundtrip_across_chunks(tmp_path):
+    rng = np.random.default_rng(0)
+    masks = {
+        f"m{i}": rng.integers(0, 8, size=(32, 16 + i), dtype=np.uint8) for i in range(6)
+    }
+    store_dir = tmp_path / "predicted.store"
+    # Чанк ~0.6 КБ: в каждый помещается одна маска (большая — целиком)
+    with PredictionStoreWriter(store_dir, chunk_mb=0.6 / 1024, metadata={"a": 1}) as w:
+        for name, mask in masks.items():
+            w.add(name, mask)
+
+    assert len(list(store_dir.glob("chunk_*.bin"))) == len(masks)
+    store = PredictionStore(store_dir)
+    assert store.metadata == {"a": 1}
+    assert store.names == sorted(masks)
+    assert "m3" in store and "missing" not in store
+    for name, mask in masks.items():
+        np.testing.assert_array_equal(store[name], mask)
+    np.testing.assert_array_equal(store[0], masks["m0"])
+    np.testing.assert_array_equal(store[np.int64(2)], masks["m2"])
+
+    restored = pickle.loads(pickle.dumps(store))
+    np.testing.assert_array_equal(restored["m5"], masks["m5"])
+
+
+def test_store_rejects_duplicates_and_keeps_old_on_error(tmp_path):
+    store_dir = tmp_path / "predicted.store"
+    with PredictionStoreWriter(store_dir) as w:
+        w.add("old", np.zeros((2, 2), dtype=np.uint8))
+
+    with pytest.raises(ValueError):
+        with PredictionStoreWriter(store_dir) as w:
+            w.add("new", np.ones((2, 2), dtype=np.uint8))
+            w.add("new", np.ones((2, 2), dtype=np.uint8))
+
+    assert PredictionStore(store_dir).names == ["old"]
+    assert not list(tmp_path.glob("*.tmp-*"))
+
+
+def test_store_close_replaces_existing_store(tmp_path):
+    store_dir = tmp_path / "predicted.store"
+    for value in (0, 1):
+        with PredictionStoreWriter(store_dir) as w:
+            w.add(f"v{value}", np.full((2, 2), value, dtype=np.uint8))
+
+    store = PredictionStore(store_dir)
+    assert store.names == ["v1"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["predicted.store"]
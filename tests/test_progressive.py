@@ -0,0 +1,28 @@
+import torch
+
+from src.data.gpu_augment import resize_batch
+from src.data.progressive import ProgressiveSchedule
+
+
+def test_schedule_picks_latest_started_stage():
+    schedule = ProgressiveSchedule(
+        [
+            {"epoch": 5, "img_size": 192, "batch_size": 8},
+            {"epoch": 0, "img_size": 128, "batch_size": 16},
+            {"epoch": 10, "img_size": 256},
+        ]
+    )
+    assert schedule.stage(0).img_size == 128
+    assert schedule.stage(4).batch_size == 16
+    assert schedule.stage(5).img_size == 192
+    assert schedule.stage(12).img_size == 256
+    assert schedule.stage(12).batch_size is None
+
+
+def test_resize_batch_keeps_mask_labels():
+    images = torch.randint(0, 256, (2, 3, 32, 32), dtype=torch.uint8)
+    masks = torch.randint(0, 8, (2, 32, 32), dtype=torch.uint8)
+    out_images, out_masks = resize_batch(images, masks, 16)
+    assert out_images.shape == (2, 3, 16, 16)
+    assert out_masks.dtype == torch.uint8
+    assert set(out_masks.unique().tolist()) <= set(masks.unique().tolist())
@@ -0,0 +1,55 @@
+import pytest
+import torch
+from torch import nn
+
+from src.models.prune import prune_unet, pruned_channels
+from src.models.unet_model import UNet
+
+
+def unet_with_dead_channels(keep_ratio: float = 0.5) -> UNet:
+    """
+    UNet, в которой у каждого BN и transpose_conv последние каналы «мёртвые»
+    (нулевые gamma/beta и веса): их удаление не меняет выход модели.
+    """
+    torch.manual_seed(0)
+    model = UNet(3, "pad", base_channels=8, depth=2)
+    with torch.no_grad():
+        for m in model.modules():
+            if isinstance(m, nn.BatchNorm2d):
+                keep = int(m.num_features * keep_ratio)
+                m.weight.uniform_(0.5, 1.5)
+                m.running_mean.uniform_(-0.1, 0.1)
+                m.weight[keep:] = 0
+                m.bias[keep:] = 0
+            elif isinstance(m, nn.ConvTranspose2d):
+                keep = int(m.out_channels * keep_ratio)
+                m.weight[:, keep:] = 0
+                m.bias[keep:] = 0
+    return model.eval()
+
+
+def test_prune_removes_dead_channels_exactly():
+    model = unet_with_dead_channels()
+    channels = [c // 2 for c in model.channels]
+    pruned = prune_unet(model, channels).eval()
+
+    assert pruned.channels == channels
+    assert sum(p.numel() for p in pruned.parameters()) < sum(
+        p.numel() for p in model.parameters()
+    )
+    images = torch.rand(2, 3, 16, 16) * 255
+    with torch.no_grad():
+        torch.testing.assert_close(pruned(images), model(images), rtol=1e-4, atol=1e-4)
+
+
+def test_pruned_channels_respects_minimum_and_current_width():
+    original = [64, 128, 256]
+    assert pruned_channels(original, original, 0.5, 8) == [32, 64, 128]
+    assert pruned_channels([32, 64, 128], original, 0.95, 8) == [8, 8, 13]
+    assert pruned_channels([16, 16, 16], original, 0.25, 8) == [16, 16, 16]
+
+
+def test_prune_rejects_non_standard_blocks():
+    model = UNet(3, base_channels=4, depth=2, block_type="depthwise")
+    with pytest.raises(ValueError):
+        prune_unet(model, [2, 4, 8])
@@ -0,0 +1,38 @@
+import torch
+from omegaconf import OmegaConf
+
+from src.models.export import export_torchscript
+from src.models.quantize import UNetFeatures, evaluate, quantize_static, subset_loader
+from src.models.runtime import load_predictor
+from src.models.unet_model import UNet
+
+
+def make_cfg(data_dir):
+    return OmegaConf.create(
+        {
+            "data": {"data_dir": str(data_dir)},
+            "quantize": {"img_size": 32},
+        }
+    )
+
+
+def test_quantized_unet_close_to_fp32(floodnet_dir, tmp_path):
+    torch.manual_seed(0)
+    fp32 = UNetFeatures(UNet(8, "pad", base_channels=8, depth=2)).eval()
+    calib_loader = subset_loader(make_cfg(floodnet_dir), "train", 2, 2, seed=0)
+    int8 = quantize_static(fp32, calib_loader)
+
+    images = next(iter(calib_loader))[0].float()
+    with torch.inference_mode():
+        expected, actual = fp32(images), int8(images)
+    scale = expected.abs().max()
+    assert (expected - actual).abs().max() < 0.1 * scale
+
+    eval_loader = subset_loader(make_cfg(floodnet_dir), "test", None, 1, seed=0)
+    metrics = evaluate(int8, eval_loader, num_classes=8)
+    assert set(metrics) == {"mIoU", "mRecall", "mAcc"}
+
+    path = tmp_path / "unet_int8.pt"
+    export_torchscript(int8, images, path, {"img_size": 32, "quantized_engine": "x86"})
+    predictor = load_predictor(path)
+    torch.testing.assert_close(predictor(images.to(torch.uint8)), actual)
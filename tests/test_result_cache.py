@@ -0,0 +1,43 @@
+import os
+
+import numpy as np
+
+from src.data.result_cache import ResultCache
+
+
+def make_cache(tmp_path, model_hash="m1", img_size=16, max_size_mb=1):
+    return ResultCache(
+        tmp_path / "cache", model_hash, {"img_size": img_size}, max_size_mb
+    )
+
+
+def test_key_depends_on_content_model_and_preprocess(tmp_path):
+    image = tmp_path / "a.png"
+    image.write_bytes(b"image-1")
+    key = make_cache(tmp_path).key(image)
+
+    assert make_cache(tmp_path).key(image) == key
+    assert make_cache(tmp_path, model_hash="m2").key(image) != key
+    assert make_cache(tmp_path, img_size=32).key(image) != key
+    image.write_bytes(b"image-2")
+    assert make_cache(tmp_path).key(image) != key
+
+
+def test_get_add_and_lru_eviction(tmp_path):
+    cache = make_cache(tmp_path, max_size_mb=0)
+    assert cache.get("ab" * 32) is None
+
+    masks = {f"{i:02d}" * 32: np.full((8, 8), i, dtype=np.uint8) for i in range(3)}
+    for i, (key, mask) in enumerate(masks.items()):
+        cache.add(key, mask)
+        os.utime(cache.path(key), ns=(i * 10**9, i * 10**9))
+    first, second, third = masks
+    np.testing.assert_array_equal(cache.get(first), masks[first])  # обновляет mtime
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    entry_size = cache.path(first).stat().st_size
+    cache.max_size_bytes = 2 * entry_size
+    assert cache.evict() == 1
+    # Вытеснена самая давно использованная запись, а не самая старая по записи
+    assert not cache.path(second).exists()
+    assert cache.path(first).exists() and cache.path(third).exists()
@@ -0,0 +1,112 @@
+import asyncio
+import io
+
+import numpy as np
+import torch
+from PIL import Image
+
+from src.serving.batcher import MicroBatcher
+from src.serving.client import fetch_metrics, load_test, post_image
+from src.serving.server import InferenceServer
+
+
+def first_channel(images: torch.Tensor) -> np.ndarray:
+    return images[:, 0].numpy()
+
+
+def test_batcher_groups_concurrent_requests():
+    batch_sizes = []
+
+    def predict(images):
+        batch_sizes.append(len(images))
+        return first_channel(images)
+
+    async def scenario():
+        batcher = MicroBatcher(predict, max_batch_size=4, max_latency_ms=50)
+        batcher.start()
+        images = [torch.full((3, 2, 2), i, dtype=torch.uint8) for i in range(10)]
+        masks = await asyncio.gather(*(batcher.submit(image) for image in images))
+        await batcher.stop()
+        return masks, batcher.metrics
+
+    masks, metrics = asyncio.run(scenario())
+    # Каждый запрос получает свою маску, батчи не больше max_batch_size
+    assert [int(m[0, 0]) for m in masks] == list(range(10))
+    assert batch_sizes == [4, 4, 2]
+    assert metrics.batches == 3
+    assert metrics.snapshot(queue_depth=0)["mean_batch_size"] == 10 / 3
+
+
+def test_batcher_flushes_after_latency_window():
+    async def scenario():
+        batcher = MicroBatcher(first_channel, max_batch_size=8, max_latency_ms=20)
+        batcher.start()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await batcher.submit(torch.zeros(3, 2, 2, dtype=torch.uint8))
+        elapsed = loop.time() - start
+        await batcher.stop()
+        return elapsed, batcher.metrics.batch_sizes
+
+    elapsed, batch_sizes = asyncio.run(scenario())
+    assert 0.015 < elapsed < 1.0
+    assert batch_sizes == {1: 1}
+
+
+class ChannelArgmax:
+    """Модель-заглушка: логиты — сами каналы картинки."""
+
+    device = torch.device("cpu")
+
+    def __call__(self, images):
+        return images.float()
+
+
+def test_server_predicts_and_reports_metrics():
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, size=(12, 10, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format="PNG")
+    expected = image[2:10, 1:9].argmax(axis=2)  # центральный кроп 8×8
+
+    async def scenario():
+        server = InferenceServer(
+            ChannelArgmax(), img_size=8, palette={0: [0, 0, 0]}, max_latency_ms=5
+        )
+        await server.start("127.0.0.1", 0)
+        url = f"http://127.0.0.1:{server.port}"
+        png = await asyncio.to_thread(post_image, url, buffer.getvalue())
+        npy = await asyncio.to_thread(post_image, url, buffer.getvalue(), "npy")
+        report = await asyncio.to_thread(load_test, url, [buffer.getvalue()], 12, 4)
+        metrics = await asyncio.to_thread(fetch_metrics, url)
+        await server.stop()
+        return png, npy, report, metrics
+
+    png, npy, report, metrics = asyncio.run(scenario())
+    np.testing.assert_array_equal(np.asarray(Image.open(io.BytesIO(png))), expected)
+    np.testing.assert_array_equal(np.load(io.BytesIO(npy)), expected)
+    assert report["ok"] == 12 and report["errors"] == 0
+    assert metrics["requests"] == 14
+    assert sum(int(k) * v for k, v in metrics["batch_sizes"].items()) == 14
+
+
+def test_server_rejects_malformed_content_length():
+    async def raw_request(port, length):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(
+            f"POST /predict HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode()
+        )
+        await writer.drain()
+        status_line = await reader.readline()
+        writer.close()
+        return status_line
+
+    async def scenario():
+        server = InferenceServer(ChannelArgmax(), img_size=8, palette={})
+        await server.start("127.0.0.1", 0)
+        lines = [await raw_request(server.port, length) for length in ("abc", "-5")]
+        await server.stop()
+        return lines
+
+    for status_line in asyncio.run(scenario()):
+        assert status_line.startswith(b"HTTP/1.1 400 ")
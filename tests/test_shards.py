@@ -0,0 +1,61 @@
+import torch
+from torch.utils.data import DataLoader
+
+from src.data.dataset import FloodNetDataset
+from src.data.shards import FloodNetShardDataset, pack_shards
+
+
+def _as_key(mask: torch.Tensor) -> bytes:
+    return mask.numpy().tobytes()
+
+
+def test_stream_from_shards_yields_every_sample_once(floodnet_dir, tmp_path):
+    shard_dir = str(tmp_path / "shards")
+    shards = pack_shards(str(floodnet_dir), "train", shard_dir, samples_per_shard=1)
+    assert len(shards) == 3
+
+    reference = FloodNetDataset(str(floodnet_dir), "train", img_size=32)
+    expected = sorted(_as_key(reference[i][1]) for i in range(len(reference)))
+
+    dataset = FloodNetShardDataset(shard_dir, "train", img_size=32, shuffle_buffer=2)
+    assert len(dataset) == 3
+    for num_workers in (0, 2):
+        loader = DataLoader(dataset, batch_size=None, num_workers=num_workers)
+        samples = list(loader)
+        assert all(image.shape == (3, 32, 32) for image, _ in samples)
+        assert sorted(_as_key(mask) for _, mask in samples) == expected
+
+
+def test_balanced_ranks_get_equal_sample_counts(floodnet_dir, tmp_path, monkeypatch):
+    shard_dir = str(tmp_path / "shards")
+    # Один шард на 3 сэмпла: процессу 1 шардов не достаётся
+    pack_shards(str(floodnet_dir), "train", shard_dir, samples_per_shard=3)
+    dataset = FloodNetShardDataset(
+        shard_dir, "train", img_size=32, shuffle_buffer=2, balance_ranks=True
+    )
+    for rank in (0, 1):
+        monkeypatch.setattr(
+            FloodNetShardDataset, "_rank", staticmethod(lambda r=rank: (r, 2))
+        )
+        assert len(dataset) == 1
+        assert len(list(dataset)) == 1
+
+
+def test_persistent_workers_reshuffle_every_epoch(floodnet_dir, tmp_path):
+    shard_dir = str(tmp_path / "shards")
+    pack_shards(str(floodnet_dir), "train", shard_dir, samples_per_shard=1)
+    dataset = FloodNetShardDataset(shard_dir, "train", img_size=32, shuffle_buffer=2)
+
+    torch.manual_seed(0)
+    loader = DataLoader(
+        dataset, batch_size=None, num_workers=1, persistent_workers=True
+    )
+
+    def epoch_order(epoch):
+        dataset.set_epoch(epoch)
+        return tuple(_as_key(mask) for _, mask in loader)
+
+    orders = [epoch_order(epoch) for epoch in range(4)]
+    # Воркер не пересоздаётся, но порядок меняется вместе с эпохой
+    assert len(set(orders)) > 1
+    assert epoch_order(0) == orders[0]
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+import torch
+
+from src.trainers.sliding_window import (
+    SlidingWindowPredictor,
+    blend_window,
+    predict_scene,
+    predict_scenes,
+)
+
+
+class ChannelLogits:
+    """Попиксельная модель-заглушка: логиты — каналы картинки."""
+
+    device = torch.device("cpu")
+
+    def __call__(self, images):
+        return images.float()
+
+
+class NoisyLogits(ChannelLogits):
+    """Добавляет шум, зависящий от положения в тайле: имитирует краевые артефакты."""
+
+    def __call__(self, images):
+        size = images.shape[-1]
+        ramp = torch.linspace(0, 1, size)
+        return images.float() + ramp[None, None, None, :] * 0.01
+
+
+@pytest.mark.parametrize("kind", ["hann", "linear", "uniform"])
+def test_blend_window(kind):
+    window = blend_window(16, 4, kind)
+    assert window.shape == (16, 16)
+    assert window.min() > 0
+    assert window[8, 8] == 1
+    if kind != "uniform":
+        assert window[0, 8] < window[4, 8]
+
+
+@pytest.mark.parametrize("shape", [(37, 50), (10, 29), (16, 16)])
+@pytest.mark.parametrize("overlap", [0, 5])
+def test_sliding_window_matches_full_image(shape, overlap):
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, size=(*shape, 3), dtype=np.uint8)
+    expected = image.argmax(axis=2)
+
+    predictor = SlidingWindowPredictor(
+        ChannelLogits(), tile_size=16, overlap=overlap, tile_batch=3
+    )
+    output = np.full(shape, 255, dtype=np.uint8)
+    stats = predictor.predict(image, output)
+    np.testing.assert_array_equal(output, expected)
+    assert stats["band_mb"] < 1
+
+
+def test_predict_scene_streams_to_npy(tmp_path):
+    rng = np.random.default_rng(1)
+    scene = rng.integers(0, 256, size=(45, 33, 3), dtype=np.uint8)
+    scene_path = tmp_path / "scene.npy"
+    np.save(scene_path, scene)
+
+    predictor = SlidingWindowPredictor(NoisyLogits(), tile_size=16, overlap=6)
+    stats = predict_scene(predictor, scene_path, tmp_path / "mask.npy")
+
+    mask = np.load(tmp_path / "mask.npy")
+    assert mask.shape == (45, 33) and mask.dtype == np.uint8
+    assert stats["tiles"] == 4 * 3
+    # Шум меньше разницы целых значений каналов — совпадает везде, кроме ничьих
+    ties = np.sort(scene, axis=2)[..., -1] == np.sort(scene, axis=2)[..., -2]
+    np.testing.assert_array_equal(mask[~ties], scene.argmax(axis=2)[~ties])
+
+
+def test_predict_scenes_accepts_npy_directory(tmp_path):
+    scenes = tmp_path / "scenes"
+    scenes.mkdir()
+    rng = np.random.default_rng(2)
+    scene = rng.integers(0, 256, size=(20, 18, 3), dtype=np.uint8)
+    np.save(scenes / "scene.npy", scene)
+
+    predictor = SlidingWindowPredictor(ChannelLogits(), tile_size=16, overlap=4)
+    out_dir = tmp_path / "masks"
+    out_dir.mkdir()
+    results = list(predict_scenes(predictor, str(scenes), out_dir))
+
+    assert [path.name for path, _ in results] == ["scene.npy"]
+    np.testing.assert_array_equal(np.load(out_dir / "scene.npy"), scene.argmax(axis=2))
+
+
+def test_predict_scene_converts_image_via_temporary_npy(tmp_path):
+    from PIL import Image
+
+    rng = np.random.default_rng(3)
+    scene = rng.integers(0, 256, size=(30, 21, 3), dtype=np.uint8)
+    Image.fromarray(scene).save(tmp_path / "scene.png")
+    limit = Image.MAX_IMAGE_PIXELS
+
+    predictor = SlidingWindowPredictor(ChannelLogits(), tile_size=16, overlap=4)
+    predict_scene(predictor, tmp_path / "scene.png", tmp_path / "mask.npy")
+
+    np.testing.assert_array_equal(np.load(tmp_path / "mask.npy"), scene.argmax(axis=2))
+    # Временная .npy-сцена удалена, порог PIL восстановлен
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["mask.npy", "scene.png"]
+    assert Image.MAX_IMAGE_PIXELS == limit
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.data.tiled_dataset import TiledFloodNetDataset, tile_offsets
+
+
+@pytest.mark.parametrize(
+    "length, tile, stride, expected",
+    [
+        (10, 4, 4, [0, 4, 6]),
+        (8, 4, 4, [0, 4]),
+        (10, 4, 3, [0, 3, 6]),
+        (3, 4, 4, [0]),
+    ],
+)
+def test_tile_offsets(length, tile, stride, expected):
+    assert tile_offsets(length, tile, stride) == expected
+
+
+def test_windows_cover_every_pixel(floodnet_dir, tmp_path):
+    dataset = TiledFloodNetDataset(
+        str(floodnet_dir), "train", tile_size=16, overlap=4, index_dir=str(tmp_path)
+    )
+    masks = {
+        item: np.array(Image.open(floodnet_dir / "train" / "mask" / f"{item}.png"))
+        for item in dataset.items
+    }
+    covered = {item: np.zeros_like(mask, dtype=bool) for item, mask in masks.items()}
+
+    for i in range(len(dataset)):
+        scene_idx, y, x = dataset.windows[i]
+        item = dataset.items[scene_idx]
+        image, mask = dataset[i]
+        assert image.shape == (3, 16, 16)
+        assert np.array_equal(mask.numpy(), masks[item][y : y + 16, x : x + 16])
+        covered[item][y : y + 16, x : x + 16] = True
+
+    assert all(c.all() for c in covered.values())
@@ -0,0 +1,50 @@
+import pytest
+import torch
+from torch import nn
+
+from src.models.tta import TTA_TRANSFORMS, SequentialTTAModel, TTAModel, tta_views
+
+
+class CountingModel(nn.Module):
+    """Несимметричная свёртка: TTA действительно меняет логиты."""
+
+    def __init__(self):
+        super().__init__()
+        torch.manual_seed(0)
+        self.conv = nn.Conv2d(3, 4, kernel_size=3, padding=1)
+        self.batch_sizes = []
+
+    def forward(self, images):
+        self.batch_sizes.append(images.shape[0])
+        return self.conv(images.float())
+
+
+@pytest.mark.parametrize("name", list(TTA_TRANSFORMS))
+def test_transform_inverse_roundtrip(name):
+    forward, inverse = TTA_TRANSFORMS[name]
+    x = torch.rand(2, 4, 5, 5)
+    torch.testing.assert_close(inverse(forward(x)), x)
+
+
+def test_tta_single_forward_matches_sequential():
+    model = CountingModel()
+    images = torch.rand(3, 3, 8, 8)
+    transforms = ["hflip", "vflip", "rot90", "transpose"]
+
+    batched = TTAModel(model, transforms)(images)
+    assert model.batch_sizes == [5 * 3]  # identity + 4 вида, один forward
+
+    expected = SequentialTTAModel(model, transforms)(images)
+    torch.testing.assert_close(batched, expected, rtol=1e-5, atol=1e-5)
+
+    flipped = torch.flip(model(torch.flip(images, dims=(-1,))), dims=(-1,))
+    only_hflip = TTAModel(model, ["hflip"])(images)
+    torch.testing.assert_close(only_hflip, (model(images) + flipped) / 2)
+
+
+def test_tta_validation():
+    assert tta_views(["hflip", "identity", "hflip"]) == ["identity", "hflip"]
+    with pytest.raises(ValueError):
+        tta_views(["shear"])
+    with pytest.raises(ValueError):
+        TTAModel(CountingModel(), ["rot90"])(torch.rand(1, 3, 8, 6))
@@ -0,0 +1,23 @@
+from omegaconf import OmegaConf
+
+from src.trainers.tune_data import loader_grid
+
+
+def test_loader_grid_includes_compact():
+    tune_cfg = OmegaConf.create(
+        {
+            "num_workers": [0, 2],
+            "pin_memory": [False],
+            "prefetch_factor": [2],
+            "persistent_workers": [True],
+            "compact": [False, True],
+        }
+    )
+    grid = loader_grid(tune_cfg)
+    assert len(grid) == 4
+    assert {(s["num_workers"], s["compact"]) for s in grid} == {
+        (0, False),
+        (0, True),
+        (2, False),
+        (2, True),
+    }
@@ -0,0 +1,80 @@
+import pytest
+import torch
+
+from src.models.unet_model import UNet
+
+
+@pytest.mark.parametrize("input_mode", ["pad", "reflect"])
+@pytest.mark.parametrize("size", [(40, 56), (8, 8), (64, 32)])
+def test_native_modes_keep_input_resolution(input_mode, size):
+    model = UNet(num_classes=8, input_mode=input_mode).eval()
+    with torch.no_grad():
+        logits = model(torch.rand(2, 3, *size))
+    assert logits.shape == (2, 8, *size)
+
+
+def test_native_and_legacy_modes_match_at_256():
+    torch.manual_seed(0)
+    legacy = UNet(num_classes=8, input_mode="resize").eval()
+    native = UNet(num_classes=8, input_mode="pad").eval()
+    native.load_state_dict(legacy.state_dict())
+
+    images = torch.randint(0, 256, (1, 3, 256, 256), dtype=torch.uint8)
+    with torch.no_grad():
+        assert torch.allclose(legacy(images), native(images))
+
+
+def test_unknown_input_mode():
+    with pytest.raises(ValueError):
+        UNet(num_classes=8, input_mode="crop")
+
+
+def test_default_architecture_keeps_layer_names():
+    model = UNet(num_classes=8)
+    keys = model.state_dict().keys()
+    assert "enc_conv1.layer.0.weight" in keys
+    assert "bottleneck.layer.3.weight" in keys
+    assert "transpose_conv4.weight" in keys
+    assert model.transpose_conv1.in_channels == 1024
+    assert model.final_conv.in_channels == 64
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        dict(base_channels=8, block_type="depthwise"),
+        dict(base_channels=8, block_type="inverted"),
+        dict(base_channels=8, depth=3, channel_mult=1.5),
+        dict(channels=[6, 10, 14]),
+    ],
+)
+def test_configurable_variants(kwargs):
+    model = UNet(num_classes=8, input_mode="pad", **kwargs).eval()
+    with torch.no_grad():
+        logits = model(torch.rand(1, 3, 36, 20))
+    assert logits.shape == (1, 8, 36, 20)
+
+
+def test_activation_checkpointing_keeps_gradients():
+    torch.manual_seed(0)
+    plain = UNet(num_classes=3, input_mode="pad", base_channels=4, depth=2).train()
+    checkpointed = UNet(num_classes=3, input_mode="pad", base_channels=4, depth=2)
+    checkpointed.load_state_dict(plain.state_dict())
+    checkpointed.train().set_activation_checkpointing(["enc_conv1", "dec_conv2"])
+    assert checkpointed.enc_conv1.use_checkpoint
+    assert not checkpointed.bottleneck.use_checkpoint
+
+    images = torch.rand(2, 3, 16, 16)
+    plain(images).sum().backward()
+    checkpointed(images).sum().backward()
+    for p, q in zip(plain.parameters(), checkpointed.parameters()):
+        torch.testing.assert_close(p.grad, q.grad)
+    # Пересчёт на backward не обновляет running-статистики BN второй раз
+    for a, b in zip(plain.buffers(), checkpointed.buffers()):
+        torch.testing.assert_close(a, b)
+
+
+def test_activation_checkpointing_unknown_block():
+    model = UNet(num_classes=3, base_channels=4, depth=2)
+    with pytest.raises(ValueError):
+        model.set_activation_checkpointing(["enc_conv9"])